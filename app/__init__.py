@@ -1,4 +1,4 @@
-from flask import Flask, send_from_directory, render_template, request
+from flask import Flask, render_template, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
@@ -13,14 +13,19 @@ from .extensions import db, mail
 from .routes import register_routes
 from app.routes.messages import messages_bp
 from app.routes.users import users_bp
+from app.routes.media import media_bp
 from app.models import Notification
 from app.utils.logging_config import setup_logging, log_request
+from app.utils import static_files
 from app.routes.marketplace import marketplace_bp
+from app.services import images, media_uploads, notification_queue, notification_store, payment_queue, product_search, event_bus
+from app import jobs
 
 jwt_blocklist = set()
 
 def create_app(config_class=Config):
-    app = Flask(__name__)
+    # /static is served by the route below, with caching headers
+    app = Flask(__name__, static_folder=None)
     app.config.from_object(config_class)
     
     # Setup logging first
@@ -56,6 +61,13 @@ def create_app(config_class=Config):
     
     app.logger.info('Database and authentication initialized')
 
+    notification_queue.init_app(app)
+    notification_store.init_app(app)
+    payment_queue.init_app(app)
+    images.init_app(app)
+    media_uploads.init_app(app)
+    event_bus.init_app(db)
+
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
         return jwt_payload['jti'] in jwt_blocklist
@@ -106,23 +118,39 @@ def create_app(config_class=Config):
         return render_template('swagger.html')
 
     @app.route('/static/<path:filename>')
-    def static_files(filename):
-        return send_from_directory('app/static', filename)
+    def static(filename):
+        return static_files.send_file_cached(os.path.join(app.root_path, 'static'), filename, 'static',
+                                             immutable=static_files.is_fingerprinted(filename))
 
     @app.route('/uploads/<path:filename>')
     def uploaded_files(filename):
-        return send_from_directory(os.path.join(app.root_path, '..', 'uploads'), filename)
+        # ?size=avatar|card serves a thumbnail of a stored image (see services/images.py)
+        size = request.args.get('size', 'original')
+        if size not in images.SIZES:
+            return {'error': f"size must be one of: {', '.join(images.SIZES)}"}, 400
+        served = images.resolve(filename, size)
+        if not images.is_stored(filename):
+            return static_files.send_file_cached(images.upload_root(), served, 'uploads')
+        if size != 'original' and served == filename:
+            # Thumbnail not made yet: keep caches from holding the original under the thumbnail's URL
+            return static_files.send_file_cached(images.upload_root(), served, 'uploads', max_age=60)
+        return static_files.send_file_cached(images.upload_root(), served, 'uploads', immutable=True)
 
     register_routes(api)
     app.register_blueprint(messages_bp, url_prefix='/api/v1')
     app.register_blueprint(users_bp, url_prefix='/api/v1')
+    app.register_blueprint(media_bp, url_prefix='/api/v1')
     app.register_blueprint(marketplace_bp, url_prefix='/api/marketplace')
     
     app.logger.info('Routes registered successfully')
 
+    jobs.init_app(app)
+    static_files.init_app(app)
+
 
     with app.app_context():
         db.create_all()
+        product_search.create_index()
         app.logger.info('Database tables created/verified')
     
     app.logger.info('Application initialization complete')
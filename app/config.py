@@ -20,6 +20,9 @@ class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
     JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600))
     JWT_REFRESH_TOKEN_EXPIRES = int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', 2592000))
+    # Tokens in URLs end up in access logs: only the SSE /stream endpoints, whose
+    # EventSource clients cannot set headers, also accept ?jwt=<token>
+    JWT_TOKEN_LOCATION = ['headers']
 
     # CORS Configuration
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:5173,http://localhost:3000').split(',')
@@ -29,9 +32,106 @@ class Config:
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB default
     # Accepted file upload types
     ALLOWED_UPLOAD_EXTENSIONS = set(os.getenv('ALLOWED_UPLOAD_EXTENSIONS', 'png,jpg,jpeg,gif,webp').split(','))
+    # Thumbnails of uploaded images (see services/images.py) are made by a background pool
+    IMAGE_QUEUE_ENABLED = os.getenv('IMAGE_QUEUE_ENABLED', 'true').lower() == 'true'
+    IMAGE_QUEUE_WORKERS = int(os.getenv('IMAGE_QUEUE_WORKERS', 2))
+    IMAGE_QUEUE_SIZE = int(os.getenv('IMAGE_QUEUE_SIZE', 1000))
+    IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', 80))
+    # /static and /uploads caching (see utils/static_files.py); content-addressed files are cached for a year
+    STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', 3600))
+    # Behind nginx: internal location that maps <prefix>/static/ and <prefix>/uploads/ to those folders
+    STATIC_ACCEL_PREFIX = os.getenv('STATIC_ACCEL_PREFIX', '')
+    USE_X_SENDFILE = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+    # Post and product images are spooled here and uploaded to Cloudinary by a background queue
+    MEDIA_SPOOL_FOLDER = os.getenv('MEDIA_SPOOL_FOLDER', 'spool')
+    MEDIA_QUEUE_ENABLED = os.getenv('MEDIA_QUEUE_ENABLED', 'true').lower() == 'true'
+    MEDIA_QUEUE_WORKERS = int(os.getenv('MEDIA_QUEUE_WORKERS', 4))
+    MEDIA_QUEUE_SIZE = int(os.getenv('MEDIA_QUEUE_SIZE', 500))
+    MEDIA_QUEUE_LEASE_SECONDS = int(os.getenv('MEDIA_QUEUE_LEASE_SECONDS', 300))
+    MEDIA_QUEUE_POLL_SECONDS = float(os.getenv('MEDIA_QUEUE_POLL_SECONDS', 30))
+    MEDIA_UPLOAD_MAX_ATTEMPTS = int(os.getenv('MEDIA_UPLOAD_MAX_ATTEMPTS', 3))
+
+    # Live updates (Server-Sent Events)
+    SSE_HEARTBEAT_SECONDS = int(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+    # Each open stream holds one of gunicorn's GUNICORN_THREADS threads per
+    # worker (gunicorn.conf.py); cap them per process so half stay free for
+    # ordinary requests
+    SSE_MAX_CONNECTIONS = int(os.getenv('SSE_MAX_CONNECTIONS', max(1, int(os.getenv('GUNICORN_THREADS', 32)) // 2)))
+    # Missed notifications replayed when a client reconnects with Last-Event-ID
+    SSE_RESUME_LIMIT = int(os.getenv('SSE_RESUME_LIMIT', 100))
+
+    # GET /api/v1/metrics answers only `Authorization: Bearer <METRICS_TOKEN>`
+    # (disabled when unset); outbox counts are recomputed at most this often
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    METRICS_OUTBOX_CACHE_SECONDS = int(os.getenv('METRICS_OUTBOX_CACHE_SECONDS', 60))
+
+    # Outbound HTTP clients (shared connection pools per external service)
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))
+    HTTP_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('HTTP_CIRCUIT_FAILURE_THRESHOLD', 5))
+    HTTP_CIRCUIT_RESET_SECONDS = float(os.getenv('HTTP_CIRCUIT_RESET_SECONDS', 30))
+    # Cloudinary calls go through its SDK, which waits forever unless given a
+    # timeout; uploads send whole images, so they get longer than HTTP_READ_TIMEOUT
+    CLOUDINARY_TIMEOUT = float(os.getenv('CLOUDINARY_TIMEOUT', 60))
 
     # Notification Service
     NOTIFICATION_SERVICE_URL = os.getenv('NOTIFICATION_SERVICE_URL', 'http://localhost:5001')
+    # Where notifications are stored: 'local' (API database) or 'remote' (notification microservice)
+    NOTIFICATION_BACKEND = os.getenv('NOTIFICATION_BACKEND', 'local')
+    # Asynchronous delivery through the notification outbox
+    NOTIFICATION_QUEUE_ENABLED = os.getenv('NOTIFICATION_QUEUE_ENABLED', 'true').lower() == 'true'
+    NOTIFICATION_QUEUE_WORKERS = int(os.getenv('NOTIFICATION_QUEUE_WORKERS', 2))
+    NOTIFICATION_QUEUE_SIZE = int(os.getenv('NOTIFICATION_QUEUE_SIZE', 10000))
+    NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', 100))
+    NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', 5))
+    NOTIFICATION_BACKOFF_SECONDS = float(os.getenv('NOTIFICATION_BACKOFF_SECONDS', 2))
+    NOTIFICATION_BACKOFF_MAX_SECONDS = float(os.getenv('NOTIFICATION_BACKOFF_MAX_SECONDS', 300))
+    NOTIFICATION_LEASE_SECONDS = int(os.getenv('NOTIFICATION_LEASE_SECONDS', 60))
+    NOTIFICATION_OUTBOX_POLL_SECONDS = float(os.getenv('NOTIFICATION_OUTBOX_POLL_SECONDS', 15))
+
+    # In-app notifications of the same type and target within this window are
+    # folded into one row ("Alice and 42 others liked your post"); 0 disables
+    NOTIFICATION_COALESCE_WINDOW_SECONDS = int(os.getenv('NOTIFICATION_COALESCE_WINDOW_SECONDS', 86400))
+
+    # Retention: read notifications older than this are purged in batches
+    NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', 30))
+    NOTIFICATION_PURGE_BATCH_SIZE = int(os.getenv('NOTIFICATION_PURGE_BATCH_SIZE', 1000))
+    NOTIFICATION_PURGE_INTERVAL_SECONDS = int(os.getenv('NOTIFICATION_PURGE_INTERVAL_SECONDS', 3600))
+    # Email digests (users opt in with notification_digest = hourly/daily); the job
+    # runs every DIGEST_INTERVAL and emails whoever's period has elapsed
+    NOTIFICATION_DIGEST_INTERVAL_SECONDS = int(os.getenv('NOTIFICATION_DIGEST_INTERVAL_SECONDS', 300))
+    NOTIFICATION_DIGEST_BATCH_SIZE = int(os.getenv('NOTIFICATION_DIGEST_BATCH_SIZE', 200))
+    NOTIFICATION_DIGEST_MAX_ITEMS = int(os.getenv('NOTIFICATION_DIGEST_MAX_ITEMS', 20))
+
+    # Periodic jobs (app/jobs.py). Enable on exactly one process, or run the
+    # jobs from cron with `flask jobs run <name>` instead
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'false').lower() == 'true'
+
+    # Marketplace bulk import (POST /api/marketplace/products/import)
+    PRODUCT_IMPORT_MAX_ROWS = int(os.getenv('PRODUCT_IMPORT_MAX_ROWS', 10000))
+    PRODUCT_IMPORT_CHUNK_SIZE = int(os.getenv('PRODUCT_IMPORT_CHUNK_SIZE', 500))
+
+    # Marketplace: unpaid orders hold their stock for ORDER_RESERVATION_SECONDS
+    # (extended by ORDER_PAYMENT_HOLD_SECONDS when a payment is started)
+    ORDER_RESERVATION_SECONDS = int(os.getenv('ORDER_RESERVATION_SECONDS', 900))
+    ORDER_PAYMENT_HOLD_SECONDS = int(os.getenv('ORDER_PAYMENT_HOLD_SECONDS', 300))
+    ORDER_RESERVATION_SWEEP_SECONDS = int(os.getenv('ORDER_RESERVATION_SWEEP_SECONDS', 60))
+    ORDER_RESERVATION_BATCH_SIZE = int(os.getenv('ORDER_RESERVATION_BATCH_SIZE', 500))
+
+    # M-Pesa: STK pushes are sent by a background queue. Without Daraja
+    # credentials, MPESA_DEMO_MODE marks payments completed instead
+    MPESA_DEMO_MODE = os.getenv('MPESA_DEMO_MODE', 'true').lower() == 'true'
+    MPESA_QUEUE_ENABLED = os.getenv('MPESA_QUEUE_ENABLED', 'true').lower() == 'true'
+    MPESA_QUEUE_WORKERS = int(os.getenv('MPESA_QUEUE_WORKERS', 4))
+    MPESA_QUEUE_SIZE = int(os.getenv('MPESA_QUEUE_SIZE', 1000))
+    MPESA_QUEUE_LEASE_SECONDS = int(os.getenv('MPESA_QUEUE_LEASE_SECONDS', 120))
+    MPESA_QUEUE_POLL_SECONDS = float(os.getenv('MPESA_QUEUE_POLL_SECONDS', 30))
+    # Payments whose callback is overdue are settled by querying Daraja
+    MPESA_RECONCILE_INTERVAL_SECONDS = int(os.getenv('MPESA_RECONCILE_INTERVAL_SECONDS', 300))
+    MPESA_RECONCILE_AFTER_SECONDS = int(os.getenv('MPESA_RECONCILE_AFTER_SECONDS', 180))
+    MPESA_RECONCILE_BATCH_SIZE = int(os.getenv('MPESA_RECONCILE_BATCH_SIZE', 100))
+    MPESA_PAYMENT_TIMEOUT_SECONDS = int(os.getenv('MPESA_PAYMENT_TIMEOUT_SECONDS', 3600))
 
     # Email Configuration
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
@@ -41,6 +141,8 @@ class Config:
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@agrikonnect.com')
+    # Reconnect after this many emails on one SMTP connection (None = never)
+    MAIL_MAX_EMAILS = int(os.getenv('MAIL_MAX_EMAILS')) if os.getenv('MAIL_MAX_EMAILS') else None
 
     # Password Reset
     PASSWORD_RESET_EXPIRES = int(os.getenv('PASSWORD_RESET_EXPIRES', 3600))
@@ -0,0 +1,69 @@
+"""
+Periodic maintenance jobs.
+
+Registered with the in-process scheduler and exposed on the CLI:
+
+    flask jobs list
+    flask jobs run <name>
+"""
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from .services.scheduler import scheduler
+
+jobs_cli = AppGroup('jobs', help='Run periodic maintenance jobs.')
+
+
+@scheduler.job('purge-notifications', 'NOTIFICATION_PURGE_INTERVAL_SECONDS')
+def purge_notifications():
+    """Delete read notifications older than NOTIFICATION_RETENTION_DAYS in bounded batches"""
+    from .models.notification import Notification
+    config = current_app.config
+    cutoff = datetime.utcnow() - timedelta(days=config['NOTIFICATION_RETENTION_DAYS'])
+    deleted = Notification.purge_read(cutoff, config['NOTIFICATION_PURGE_BATCH_SIZE'])
+    return {'deleted': deleted}
+
+
+@scheduler.job('notification-digests', 'NOTIFICATION_DIGEST_INTERVAL_SECONDS')
+def notification_digests():
+    """Email hourly/daily digests of unread notifications over one SMTP connection"""
+    from .services.digest import send_due_digests
+    return send_due_digests()
+
+
+@scheduler.job('expire-reservations', 'ORDER_RESERVATION_SWEEP_SECONDS')
+def expire_reservations():
+    """Expire unpaid orders past their reservation and return their stock"""
+    from .services import inventory
+    expired = inventory.release_expired(batch_size=current_app.config['ORDER_RESERVATION_BATCH_SIZE'])
+    return {'expired': expired}
+
+
+@scheduler.job('reconcile-payments', 'MPESA_RECONCILE_INTERVAL_SECONDS')
+def reconcile_payments():
+    """Settle M-Pesa payments whose callback is overdue by querying Daraja"""
+    from .services.payments import reconcile_pending
+    return reconcile_pending()
+
+
+@jobs_cli.command('list')
+def list_jobs():
+    """List registered jobs and their intervals."""
+    for job in scheduler.jobs.values():
+        interval = current_app.config.get(job.interval_key)
+        click.echo(f'{job.name:<28} every {interval}s  {job.description}')
+
+
+@jobs_cli.command('run')
+@click.argument('name')
+def run_job(name):
+    """Run a job once."""
+    if name not in scheduler.jobs:
+        raise click.BadParameter(f'Unknown job {name!r}', param_hint='name')
+    click.echo(scheduler.run(name))
+
+
+def init_app(app):
+    app.cli.add_command(jobs_cli)
+    scheduler.init_app(app)
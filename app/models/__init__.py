@@ -4,9 +4,13 @@ from .user import User
 from .post import Post
 from .comment import Comment
 from .community import Community
+from .community_message import CommunityMessage
 from .message import Message
 from .notification import Notification
+from .notification_outbox import NotificationOutbox
 from .like import Like
-from .marketplace import Product, Order, Payment
+from .media_upload import MediaUpload
+from .scheduled_job import scheduled_jobs
+from .marketplace import Product, Order, OrderEvent, Payment, PaymentCallback, SalesRollup
 
-__all__ = ['BaseModel', 'User', 'Post', 'Comment', 'Community', 'Message', 'Notification', 'Like', 'followers', 'community_members', 'Product', 'Order', 'Payment']
+__all__ = ['BaseModel', 'User', 'Post', 'Comment', 'Community', 'CommunityMessage', 'Message', 'Notification', 'NotificationOutbox', 'Like', 'MediaUpload', 'followers', 'community_members', 'scheduled_jobs', 'Product', 'Order', 'OrderEvent', 'Payment', 'PaymentCallback', 'SalesRollup']
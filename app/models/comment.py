@@ -32,7 +32,7 @@ class Comment(BaseModel):
                 'first_name': self.author.first_name,
                 'last_name': self.author.last_name,
                 'name': f"{self.author.first_name} {self.author.last_name}".strip(),
-                'profile_image': self.author.profile_image,
+                'profile_image': self.author.avatar_thumbnail,
             } if self.author else None,
         }
 
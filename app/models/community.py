@@ -1,7 +1,16 @@
+from datetime import datetime
 from ..extensions import db
 from .base import BaseModel
 from .follower import community_members
 
+# Communities per category, maintained as communities are created, recategorized
+# and deleted, so unfiltered category facets are read rather than counted.
+# Uncategorized communities are counted under ''
+community_category_counts = db.Table('community_category_counts',
+    db.Column('category', db.String(50), primary_key=True),
+    db.Column('communities_count', db.Integer, nullable=False, default=0)
+)
+
 class Community(BaseModel):
     __tablename__ = 'communities'
 
@@ -9,6 +18,8 @@ class Community(BaseModel):
     description = db.Column(db.Text)
     image_url = db.Column(db.String(255))
     category = db.Column(db.String(50), index=True)
+    members_count = db.Column(db.Integer, default=0, nullable=False, server_default='0', index=True)
+    last_activity_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # Relationships
     members = db.relationship('User', secondary=community_members, backref='communities', lazy='dynamic')
@@ -26,15 +37,180 @@ class Community(BaseModel):
             'name': self.name,
             'description': self.description,
             'image_url': self.image_url,
-            'category': self.category
+            'category': self.category,
+            'last_activity_at': self.last_activity_at.isoformat() if self.last_activity_at else None
         }
         
         if include_counts:
-            data['members_count'] = self.members.count()
+            data['members_count'] = self.members_count or 0
             if current_user_id:
-                data['is_member'] = self.members.filter_by(id=current_user_id).count() > 0
+                data['is_member'] = self.has_member(current_user_id)
         
         return data
 
+    def has_member(self, user_id):
+        """Check membership with a primary key lookup on community_members"""
+        from sqlalchemy import select
+        return db.session.scalar(
+            select(community_members.c.user_id).where(
+                community_members.c.community_id == self.id,
+                community_members.c.user_id == int(user_id)
+            )
+        ) is not None
+
+    @classmethod
+    def add_member(cls, community_id, user_id):
+        """
+        Insert a membership row and bump members_count atomically.
+        Returns the new member count, or None if the user was already a member.
+        """
+        from ..utils.sql import dialect_insert
+
+        inserted = db.session.execute(
+            dialect_insert(community_members)
+            .values(user_id=int(user_id), community_id=community_id, joined_at=datetime.utcnow())
+            .on_conflict_do_nothing()
+        ).rowcount
+        if not inserted:
+            return None
+        return cls._adjust_members_count(community_id, 1)
+
+    @classmethod
+    def remove_member(cls, community_id, user_id):
+        """
+        Delete a membership row and decrement members_count atomically.
+        Returns the new member count, or None if the user was not a member.
+        """
+        deleted = db.session.execute(
+            community_members.delete().where(
+                community_members.c.community_id == community_id,
+                community_members.c.user_id == int(user_id)
+            )
+        ).rowcount
+        if not deleted:
+            return None
+        return cls._adjust_members_count(community_id, -1)
+
+    @classmethod
+    def _adjust_members_count(cls, community_id, delta):
+        from sqlalchemy import update
+        return db.session.execute(
+            update(cls.__table__)
+            .where(cls.__table__.c.id == community_id)
+            .values(
+                members_count=cls.__table__.c.members_count + delta,
+                last_activity_at=datetime.utcnow(),
+                # membership changes are not edits to the community itself
+                updated_at=cls.__table__.c.updated_at
+            )
+            .returning(cls.__table__.c.members_count)
+        ).scalar()
+
+    @classmethod
+    def touch_activity(cls, community_id):
+        """Record activity (e.g. a chat message) for popularity ranking"""
+        from sqlalchemy import update
+        db.session.execute(
+            update(cls.__table__)
+            .where(cls.__table__.c.id == community_id)
+            .values(last_activity_at=datetime.utcnow(), updated_at=cls.__table__.c.updated_at)
+        )
+
+    @classmethod
+    def remove_user(cls, user_id):
+        """
+        Delete all of a user's memberships and decrement members_count of
+        those communities, e.g. before the user is deleted. The caller commits.
+        """
+        from sqlalchemy import update, select
+        table = cls.__table__
+        joined = select(community_members.c.community_id).where(community_members.c.user_id == int(user_id))
+        db.session.execute(
+            update(table)
+            .where(table.c.id.in_(joined.scalar_subquery()))
+            .values(members_count=table.c.members_count - 1, updated_at=table.c.updated_at)
+        )
+        db.session.execute(community_members.delete().where(community_members.c.user_id == int(user_id)))
+
+    @classmethod
+    def category_facets(cls, query=None):
+        """
+        Count communities per category: the maintained counts, or for a
+        search, a GROUP BY over the (unpaginated) matching `query`
+        """
+        from sqlalchemy import func, select
+        if query is None:
+            rows = db.session.execute(
+                select(community_category_counts.c.category, community_category_counts.c.communities_count)
+                .where(community_category_counts.c.communities_count > 0)
+                .order_by(community_category_counts.c.communities_count.desc())
+            ).all()
+            return [{'category': category or None, 'count': count} for category, count in rows]
+        rows = query.with_entities(cls.category, func.count(cls.id)).group_by(cls.category).order_by(
+            func.count(cls.id).desc()
+        ).all()
+        return [{'category': category, 'count': count} for category, count in rows]
+
+    @classmethod
+    def to_dict_many(cls, communities, current_user_id=None):
+        """Serialize a page of communities with the viewer's membership batched"""
+        from sqlalchemy import select
+
+        communities = list(communities)
+        ids = [c.id for c in communities]
+        if not ids:
+            return []
+
+        joined = set()
+        if current_user_id:
+            joined = set(db.session.scalars(
+                select(community_members.c.community_id).where(
+                    community_members.c.user_id == int(current_user_id),
+                    community_members.c.community_id.in_(ids)
+                )
+            ))
+
+        result = []
+        for community in communities:
+            data = community.to_dict(include_counts=False)
+            data['members_count'] = community.members_count or 0
+            if current_user_id:
+                data['is_member'] = community.id in joined
+            result.append(data)
+        return result
+
     def __repr__(self):
         return f'<Community {self.name}>'
+
+
+def _adjust_category_count(connection, category, delta):
+    from ..utils.sql import dialect_insert
+    counts = community_category_counts
+    connection.execute(
+        dialect_insert(counts)
+        .values(category=category or '', communities_count=max(delta, 0))
+        .on_conflict_do_update(
+            index_elements=[counts.c.category],
+            set_={'communities_count': counts.c.communities_count + delta}
+        )
+    )
+
+
+@db.event.listens_for(Community, 'after_insert')
+def _count_inserted(mapper, connection, community):
+    _adjust_category_count(connection, community.category, 1)
+
+
+@db.event.listens_for(Community, 'after_update')
+def _count_recategorized(mapper, connection, community):
+    history = db.inspect(community).attrs.category.history
+    if history.has_changes() and history.deleted:
+        old, new = history.deleted[0], community.category
+        if (old or '') != (new or ''):
+            _adjust_category_count(connection, old, -1)
+            _adjust_category_count(connection, new, 1)
+
+
+@db.event.listens_for(Community, 'after_delete')
+def _count_deleted(mapper, connection, community):
+    _adjust_category_count(connection, community.category, -1)
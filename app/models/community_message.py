@@ -0,0 +1,39 @@
+from ..extensions import db
+from .base import BaseModel
+
+class CommunityMessage(BaseModel):
+    __tablename__ = 'community_messages'
+
+    community_id = db.Column(db.Integer, db.ForeignKey('communities.id', ondelete='CASCADE'), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    content = db.Column(db.Text, nullable=False)
+
+    # Constraints
+    __table_args__ = (
+        db.CheckConstraint("length(content) >= 1", name='community_message_content_not_empty'),
+        db.Index('idx_community_message_timeline', 'community_id', 'created_at', 'id'),
+    )
+
+    def to_dict(self, author=None):
+        return {
+            'id': self.id,
+            'community_id': self.community_id,
+            'content': self.content,
+            'author': {
+                'id': author.id,
+                'name': author.full_name,
+                'profile_image': author.avatar_thumbnail,
+            } if author else {'id': self.author_id, 'name': 'Unknown', 'profile_image': None},
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    @classmethod
+    def to_dict_many(cls, messages):
+        """Serialize messages loading all authors with a single query"""
+        from .user import User
+        author_ids = {m.author_id for m in messages}
+        authors = {u.id: u for u in User.query.filter(User.id.in_(author_ids)).all()} if author_ids else {}
+        return [m.to_dict(authors.get(m.author_id)) for m in messages]
+
+    def __repr__(self):
+        return f'<CommunityMessage {self.id} in {self.community_id}>'
@@ -12,5 +12,6 @@ followers = db.Table('followers',
 community_members = db.Table('community_members',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
     db.Column('community_id', db.Integer, db.ForeignKey('communities.id'), primary_key=True),
-    db.Column('joined_at', db.DateTime, default=datetime.utcnow)
+    db.Column('joined_at', db.DateTime, default=datetime.utcnow),
+    db.Index('idx_community_members_joined', 'community_id', 'joined_at', 'user_id')
 )
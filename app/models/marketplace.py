@@ -18,6 +18,22 @@ class Product(db.Model):
     seller = db.relationship('User', backref='products')
     orders = db.relationship('Order', backref='product', lazy=True)
 
+    # Catalog browsing: each filter + sort combination has an index ending in
+    # (sort key, id) so keyset pages are index range scans
+    __table_args__ = (
+        db.Index('idx_products_created', 'created_at', 'id'),
+        db.Index('idx_products_price', 'price', 'id'),
+        db.Index('idx_products_category_created', 'category', 'created_at', 'id'),
+        db.Index('idx_products_category_price', 'category', 'price', 'id'),
+        db.Index('idx_products_seller_created', 'seller_id', 'created_at', 'id'),
+    )
+
+    def to_dict(self):
+        return {'id': self.id, 'name': self.name, 'description': self.description,
+                'price': self.price, 'quantity': self.quantity, 'unit': self.unit,
+                'category': self.category, 'image_url': self.image_url, 'seller_id': self.seller_id,
+                'created_at': self.created_at.isoformat() if self.created_at else None}
+
 class Order(db.Model):
     __tablename__ = 'orders'
     
@@ -26,18 +42,36 @@ class Order(db.Model):
     buyer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     total_price = db.Column(db.Float, nullable=False)
+    # Changed only through services/order_states.py, which logs each change to order_events
     status = db.Column(db.String(20), default='pending')
     buyer_name = db.Column(db.String(100))
     buyer_phone = db.Column(db.String(20))
     delivery_address = db.Column(db.Text)
+    # Stock is taken when the order is placed and held until this time (see services/inventory.py)
+    reserved_until = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     buyer = db.relationship('User', backref='orders')
-    payment = db.relationship('Payment', backref='order', uselist=False)
+    # Every attempt to pay, oldest first; at most one is in progress at a time
+    payments = db.relationship('Payment', backref='order', order_by='Payment.id', lazy=True)
+
+    __table_args__ = (
+        db.Index('idx_orders_reservation_due', 'status', 'reserved_until'),
+        db.Index('idx_orders_buyer_created', 'buyer_id', 'created_at'),
+        db.Index('idx_orders_product_created', 'product_id', 'created_at', 'id'),
+    )
+
+    def to_dict(self):
+        return {'id': self.id, 'product_id': self.product_id, 'product_name': self.product.name,
+                'quantity': self.quantity, 'total_price': self.total_price, 'status': self.status,
+                'created_at': self.created_at.isoformat()}
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+
+    # Statuses of a payment that is still in progress
+    ACTIVE_STATUSES = ('queued', 'sending', 'pending')
     
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
@@ -48,5 +82,72 @@ class Payment(db.Model):
     status = db.Column(db.String(20), default='pending')
     checkout_request_id = db.Column(db.String(100))
     merchant_request_id = db.Column(db.String(100))
+    failure_reason = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_payments_status_updated', 'status', 'updated_at'),
+        db.Index('idx_payments_order', 'order_id'),
+        # One payment in progress per order, so concurrent initiates can't prompt the buyer twice
+        db.Index('uq_payments_order_active', 'order_id', unique=True,
+                 postgresql_where=db.text("status IN ('queued', 'sending', 'pending')"),
+                 sqlite_where=db.text("status IN ('queued', 'sending', 'pending')")),
+        # Callbacks and reconciliation look payments up by Daraja's id
+        db.Index('uq_payments_checkout_request_id', 'checkout_request_id', unique=True),
+    )
+
+    def to_dict(self):
+        return {'id': self.id, 'order_id': self.order_id, 'amount': self.amount, 'status': self.status,
+                'checkout_request_id': self.checkout_request_id,
+                'mpesa_receipt_number': self.mpesa_receipt_number,
+                'failure_reason': self.failure_reason,
+                'created_at': self.created_at.isoformat() if self.created_at else None}
+
+class PaymentCallback(db.Model):
+    """One row per Daraja callback processed, so provider retries are acknowledged without reprocessing"""
+    __tablename__ = 'payment_callbacks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    checkout_request_id = db.Column(db.String(100), nullable=False, unique=True)
+    result_code = db.Column(db.Integer)
+    payload = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SalesRollup(db.Model):
+    """Paid orders per product per day, maintained when orders are paid (see services/sales.py)"""
+    __tablename__ = 'sales_daily_rollups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    orders_count = db.Column(db.Integer, nullable=False, default=0)
+    units_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'day', name='uq_sales_rollup_product_day'),
+        db.Index('idx_sales_rollup_seller_day', 'seller_id', 'day'),
+    )
+
+class OrderEvent(db.Model):
+    """Append-only log of order status changes, written by services/order_states.py"""
+    __tablename__ = 'order_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id', ondelete='CASCADE'), nullable=False)
+    from_status = db.Column(db.String(20))
+    to_status = db.Column(db.String(20), nullable=False)
+    reason = db.Column(db.String(255))
+    actor_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_order_events_order', 'order_id', 'id'),
+    )
+
+    def to_dict(self):
+        return {'id': self.id, 'order_id': self.order_id, 'from_status': self.from_status,
+                'to_status': self.to_status, 'reason': self.reason, 'actor_id': self.actor_id,
+                'created_at': self.created_at.isoformat() if self.created_at else None}
@@ -0,0 +1,35 @@
+from ..extensions import db
+from .base import BaseModel
+
+class MediaUpload(BaseModel):
+    """An image spooled to local disk and waiting to be uploaded to Cloudinary (see services/media_uploads.py)"""
+    __tablename__ = 'media_uploads'
+
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    folder = db.Column(db.String(100), nullable=False)
+    spool_path = db.Column(db.String(255))
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, uploading, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    url = db.Column(db.String(500))
+    public_id = db.Column(db.String(255))
+    error = db.Column(db.String(255))
+    # The post or product whose image_url is set when the upload completes
+    target_type = db.Column(db.String(20))
+    target_id = db.Column(db.Integer)
+
+    __table_args__ = (
+        db.Index('idx_media_uploads_status_updated', 'status', 'updated_at'),
+    )
+
+    def to_dict(self):
+        return {
+            **super().to_dict(),
+            'status': self.status,
+            'url': self.url,
+            'error': self.error,
+            'target_type': self.target_type,
+            'target_id': self.target_id,
+        }
+
+    def __repr__(self):
+        return f'<MediaUpload {self.id} {self.status}>'
@@ -1,6 +1,17 @@
+from datetime import datetime, timedelta
+from flask import current_app
 from ..extensions import db
 from .base import BaseModel
 
+# Number of most recent actors kept on an aggregated notification
+MAX_LATEST_ACTORS = 3
+
+# Everyone folded into a coalesced notification, so actor_count counts each actor once
+notification_actors = db.Table('notification_actors',
+    db.Column('notification_id', db.Integer, db.ForeignKey('notifications.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('actor_id', db.Integer, primary_key=True)
+)
+
 class Notification(BaseModel):
     __tablename__ = 'notifications'
 
@@ -10,9 +21,22 @@ class Notification(BaseModel):
     message = db.Column(db.Text, nullable=False)
     link = db.Column(db.String(255))
     is_read = db.Column(db.Boolean, default=False, nullable=False)
+    related_id = db.Column(db.Integer)
+    # Coalesced notifications: how many actors were folded in and the latest few
+    actor_count = db.Column(db.Integer, default=1, nullable=False, server_default='1')
+    actors = db.Column(db.JSON)
+    # When the notification was created or last had an actor folded in; lists
+    # and stream replay are ordered by (last_activity_at, id), created_at never changes
+    last_activity_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     user = db.relationship('User', backref='notifications')
 
+    __table_args__ = (
+        db.Index('idx_notification_coalesce', 'user_id', 'type', 'related_id'),
+        db.Index('idx_notification_user_unread', 'user_id', 'is_read', 'last_activity_at'),
+        db.Index('idx_notification_user_activity', 'user_id', 'last_activity_at', 'id'),
+    )
+
     def to_dict(self):
         return {
             **super().to_dict(),
@@ -21,5 +45,242 @@ class Notification(BaseModel):
             'title': self.title,
             'message': self.message,
             'link': self.link,
-            'is_read': self.is_read
+            'is_read': self.is_read,
+            'related_id': self.related_id,
+            'actor_count': self.actor_count or 1,
+            'actors': self.actors or [],
+            'last_activity_at': self.last_activity_at.isoformat() if self.last_activity_at else None
         }
+
+    @property
+    def event_id(self):
+        """SSE event id: a (last_activity_at, id) cursor, so an updated coalesced notification is replayed too"""
+        from ..utils.pagination import encode_cursor
+        return encode_cursor(self.last_activity_at, self.id)
+
+    @classmethod
+    def create(cls, **fields):
+        """Add a notification to the session, bumping the recipient's counter if unread"""
+        notification = cls(**fields)
+        db.session.add(notification)
+        db.session.flush()
+        cls._publish(notification)
+        if not fields.get('is_read'):
+            cls._adjust_unread(fields['user_id'], 1)
+        return notification
+
+    @classmethod
+    def create_many(cls, rows):
+        """
+        Insert unread notifications with one multi-row INSERT and bump each
+        recipient's counter with one UPDATE, for fan-out to many users.
+        The caller commits.
+        """
+        from collections import Counter
+        from sqlalchemy import insert, update
+        from .user import User
+        from ..services.event_bus import publish_on_commit
+        if not rows:
+            return []
+
+        table = cls.__table__
+        inserted = db.session.execute(
+            insert(table).returning(*table.c),
+            [{**row, 'is_read': False} for row in rows]
+        ).mappings().all()
+        for row in inserted:
+            notification = cls(**row)
+            publish_on_commit(db.session, f'user:{row["user_id"]}', {
+                'event': 'notification',
+                'id': notification.event_id,
+                'data': notification.to_dict()
+            })
+
+        # Group recipients by how many notifications they received so each group is one UPDATE
+        by_delta = {}
+        for user_id, delta in Counter(row['user_id'] for row in inserted).items():
+            by_delta.setdefault(delta, []).append(user_id)
+        users = User.__table__
+        for delta, user_ids in by_delta.items():
+            counts = db.session.execute(
+                update(users)
+                .where(users.c.id.in_(user_ids))
+                .values(
+                    unread_notifications_count=users.c.unread_notifications_count + delta,
+                    updated_at=users.c.updated_at
+                )
+                .returning(users.c.id, users.c.unread_notifications_count)
+            ).all()
+            for user_id, count in counts:
+                publish_on_commit(db.session, f'user:{user_id}', {'event': 'unread_count', 'data': {'count': count or 0}})
+        return [row['id'] for row in inserted]
+
+    @classmethod
+    def mark_read(cls, notification_id, user_id):
+        """Mark one of the user's notifications read; returns False if it does not exist"""
+        from sqlalchemy import update
+        changed = db.session.execute(
+            update(cls).where(cls.id == notification_id, cls.user_id == user_id, cls.is_read == False)
+            .values(is_read=True).execution_options(synchronize_session=False)
+        ).rowcount
+        if changed:
+            cls._adjust_unread(user_id, -1)
+            return True
+        return db.session.query(cls.id).filter_by(id=notification_id, user_id=user_id).scalar() is not None
+
+    @classmethod
+    def mark_all_read(cls, user_id):
+        from sqlalchemy import update
+        changed = db.session.execute(
+            update(cls).where(cls.user_id == user_id, cls.is_read == False)
+            .values(is_read=True).execution_options(synchronize_session=False)
+        ).rowcount
+        if changed:
+            cls._adjust_unread(user_id, -changed)
+        return changed
+
+    @classmethod
+    def delete_for_user(cls, notification_id, user_id):
+        """Delete one of the user's notifications; returns False if it does not exist"""
+        from sqlalchemy import delete
+        deleted = db.session.execute(
+            delete(cls).where(cls.id == notification_id, cls.user_id == user_id)
+            .returning(cls.is_read).execution_options(synchronize_session=False)
+        ).scalars().all()
+        if not deleted:
+            return False
+        # Not left to ON DELETE CASCADE, which SQLite does not enforce by default
+        db.session.execute(delete(notification_actors).where(notification_actors.c.notification_id == notification_id))
+        if not deleted[0]:
+            cls._adjust_unread(user_id, -1)
+        return True
+
+    @classmethod
+    def purge_read(cls, cutoff, batch_size=1000):
+        """
+        Delete read notifications created before `cutoff`, across all users,
+        committing every `batch_size` rows to keep locks and transactions short.
+        Returns the number of rows deleted.
+        """
+        from sqlalchemy import select, delete
+        total = 0
+        while True:
+            ids = db.session.scalars(
+                select(cls.id).where(cls.is_read == True, cls.created_at < cutoff).limit(batch_size)
+            ).all()
+            if not ids:
+                break
+            db.session.execute(delete(notification_actors).where(notification_actors.c.notification_id.in_(ids)))
+            db.session.execute(
+                delete(cls).where(cls.id.in_(ids)).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            total += len(ids)
+            if len(ids) < batch_size:
+                break
+        return total
+
+    @classmethod
+    def unread_count(cls, user_id):
+        """Read the maintained counter (a primary key lookup, no COUNT(*))"""
+        from .user import User
+        return db.session.query(User.unread_notifications_count).filter(User.id == user_id).scalar() or 0
+
+    @staticmethod
+    def _adjust_unread(user_id, delta):
+        from sqlalchemy import update
+        from .user import User
+        from ..services.event_bus import publish_on_commit
+        count = db.session.execute(
+            update(User.__table__)
+            .where(User.__table__.c.id == user_id)
+            .values(
+                unread_notifications_count=User.__table__.c.unread_notifications_count + delta,
+                updated_at=User.__table__.c.updated_at
+            )
+            .returning(User.__table__.c.unread_notifications_count)
+        ).scalar()
+        publish_on_commit(db.session, f'user:{user_id}', {'event': 'unread_count', 'data': {'count': count or 0}})
+        return count
+
+    @staticmethod
+    def _publish(notification):
+        """Push the notification to the recipient's live streams once committed"""
+        from ..services.event_bus import publish_on_commit
+        publish_on_commit(db.session, f'user:{notification.user_id}', {
+            'event': 'notification',
+            'id': notification.event_id,
+            'data': notification.to_dict()
+        })
+
+    @staticmethod
+    def _format_message(actors, actor_count, action):
+        name = actors[0]['name'] if actors else 'Someone'
+        others = actor_count - 1
+        if others <= 0:
+            return f'{name} {action}'
+        return f"{name} and {others} {'other' if others == 1 else 'others'} {action}"
+
+    @classmethod
+    def create_or_coalesce(cls, user_id, type, title, action, actor, related_id=None, link=None):
+        """
+        Add a notification to the session, folding it into an unread notification
+        of the same type and related_id created within NOTIFICATION_COALESCE_WINDOW_SECONDS
+        (e.g. "Alice and 42 others liked your post"). `actor` is a dict with id and name.
+        Returns the new or updated notification; the caller commits.
+        """
+        from ..utils.sql import dialect_insert
+
+        window = current_app.config.get('NOTIFICATION_COALESCE_WINDOW_SECONDS', 0)
+        now = datetime.utcnow()
+
+        existing = None
+        if window and related_id is not None:
+            existing = cls.query.filter(
+                cls.user_id == user_id,
+                cls.type == type,
+                cls.related_id == related_id,
+                cls.is_read == False,
+                cls.last_activity_at >= now - timedelta(seconds=window)
+            ).order_by(cls.last_activity_at.desc()).with_for_update().first()
+
+        if existing is None:
+            notification = cls(
+                user_id=user_id,
+                type=type,
+                title=title,
+                message=cls._format_message([actor], 1, action),
+                link=link,
+                related_id=related_id,
+                actor_count=1,
+                actors=[actor],
+                last_activity_at=now
+            )
+            db.session.add(notification)
+            db.session.flush()
+            if related_id is not None:
+                db.session.execute(
+                    dialect_insert(notification_actors)
+                    .values(notification_id=notification.id, actor_id=actor['id'])
+                    .on_conflict_do_nothing()
+                )
+            cls._publish(notification)
+            cls._adjust_unread(user_id, 1)
+            return notification
+
+        # Repeat actions by the same person are not counted twice, even once
+        # they have dropped out of the latest few actors
+        new_actor = db.session.execute(
+            dialect_insert(notification_actors)
+            .values(notification_id=existing.id, actor_id=actor['id'])
+            .on_conflict_do_nothing()
+        ).rowcount
+        if new_actor:
+            existing.actor_count = (existing.actor_count or 1) + 1
+        actors = [a for a in (existing.actors or []) if a.get('id') != actor.get('id')]
+        existing.actors = [actor] + actors[:MAX_LATEST_ACTORS - 1]
+        existing.message = cls._format_message(existing.actors, existing.actor_count, action)
+        existing.last_activity_at = now
+        db.session.flush()
+        cls._publish(existing)
+        return existing
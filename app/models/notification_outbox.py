@@ -0,0 +1,20 @@
+from datetime import datetime
+from ..extensions import db
+from .base import BaseModel
+
+class NotificationOutbox(BaseModel):
+    """Durable record of notifications waiting to be delivered to the notification service"""
+    __tablename__ = 'notification_outbox'
+
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('idx_notification_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<NotificationOutbox {self.id} {self.status}>'
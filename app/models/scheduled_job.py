@@ -0,0 +1,11 @@
+from ..extensions import db
+
+# One row per periodic job (app/jobs.py). A scheduler runs a job only after
+# moving its next_run_at forward while it is due, so with the scheduler
+# enabled in several processes each run still happens in just one of them
+scheduled_jobs = db.Table('scheduled_jobs',
+    db.Column('name', db.String(50), primary_key=True),
+    db.Column('next_run_at', db.DateTime, nullable=False),
+    db.Column('claimed_by', db.String(100)),
+    db.Column('claimed_at', db.DateTime)
+)
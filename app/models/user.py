@@ -18,6 +18,13 @@ class User(BaseModel):
     profile_image = db.Column(db.String(255))
     is_active = db.Column(db.Boolean, default=True, nullable=False,
                           server_default='true')
+    # Maintained by Notification.create / mark_read / mark_all_read / delete_for_user
+    unread_notifications_count = db.Column(db.Integer, default=0, nullable=False,
+                                           server_default='0')
+    # Email digest of unread notifications: 'off', 'hourly' or 'daily'
+    notification_digest = db.Column(db.String(10), default='off', nullable=False,
+                                    server_default='off', index=True)
+    last_digest_at = db.Column(db.DateTime, nullable=True)
 
     # Password reset fields
     password_reset_token = db.Column(db.String(255), nullable=True)
@@ -29,6 +36,7 @@ class User(BaseModel):
         db.CheckConstraint("length(first_name) >= 1", name='first_name_not_empty'),
         db.CheckConstraint("length(last_name) >= 1", name='last_name_not_empty'),
         db.CheckConstraint("length(email) >= 3", name='email_min_length'),
+        db.CheckConstraint("notification_digest IN ('off', 'hourly', 'daily')", name='valid_notification_digest'),
     )
 
     # Relationships
@@ -128,7 +136,7 @@ class User(BaseModel):
         return {
             'id': self.id,
             'name': self.full_name,
-            'avatar_url': self.profile_image,
+            'avatar_url': self.avatar_thumbnail,
             'title': 'Agricultural Expert',
             'location': self.location,
             'specialties': [self.specialty] if self.specialty else [],
@@ -139,10 +147,76 @@ class User(BaseModel):
             'bio': self.bio
         }
 
+    def to_summary_dict(self):
+        """Lightweight representation for member lists and other large listings"""
+        return {
+            'id': self.id,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'name': self.full_name,
+            'role': self.role,
+            'location': self.location,
+            'profile_image': self.avatar_thumbnail,
+        }
+
+    @property
+    def avatar_thumbnail(self):
+        """Profile image at avatar size, for listings that show many users"""
+        from ..services.images import variant_url
+        return variant_url(self.profile_image, 'avatar')
+
+    @classmethod
+    def batch_stats(cls, user_ids, current_user_id=None):
+        """
+        Compute follower/post counts (and whether the viewer follows each user)
+        for a set of users with one grouped query per statistic
+        """
+        from sqlalchemy import select, func
+        from .post import Post
+
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+
+        followers_counts = dict(db.session.execute(
+            select(followers.c.followed_id, func.count())
+            .where(followers.c.followed_id.in_(user_ids))
+            .group_by(followers.c.followed_id)
+        ).all())
+        posts_counts = dict(db.session.execute(
+            select(Post.author_id, func.count(Post.id))
+            .where(Post.author_id.in_(user_ids))
+            .group_by(Post.author_id)
+        ).all())
+        followed = set()
+        if current_user_id:
+            followed = set(db.session.scalars(
+                select(followers.c.followed_id).where(
+                    followers.c.follower_id == int(current_user_id),
+                    followers.c.followed_id.in_(user_ids)
+                )
+            ))
+
+        stats = {}
+        for user_id in user_ids:
+            stats[user_id] = {
+                'followers_count': followers_counts.get(user_id, 0),
+                'posts_count': posts_counts.get(user_id, 0),
+            }
+            if current_user_id:
+                stats[user_id]['is_following'] = user_id in followed
+        return stats
+
     @property
     def full_name(self):
         """Return the user's full name"""
         return f"{self.first_name} {self.last_name}"
 
+    def delete(self):
+        """Delete the user, first leaving their communities so members_count stays right"""
+        from .community import Community
+        Community.remove_user(self.id)
+        super().delete()
+
     def __repr__(self):
         return f'<User {self.email}>'
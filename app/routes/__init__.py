@@ -33,6 +33,25 @@ def register_routes(api: Api):
                 }
             }
 
+    @general_ns.route('/metrics')
+    class Metrics(Resource):
+        def get(self):
+            """Background queue, outbound HTTP and notification outbox metrics for this worker (needs METRICS_TOKEN)"""
+            import hmac
+            from flask import current_app, request
+            from ..services.background import queue_stats
+            from ..services.http_client import client_stats
+            from ..services.notification_queue import outbox_stats
+            token = current_app.config['METRICS_TOKEN']
+            supplied = request.headers.get('Authorization', '')
+            if not token or not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+                return {'error': 'Forbidden', 'message': 'Access denied'}, 403
+            return {
+                'queues': queue_stats(),
+                'http_clients': client_stats(),
+                'notification_outbox': outbox_stats()
+            }
+
     # Register namespaces
     api.add_namespace(general_ns, path='/api/v1')
     api.add_namespace(auth_ns, path='/api/v1/auth')
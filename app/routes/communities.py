@@ -1,9 +1,16 @@
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask import request
+from flask import request, current_app
+from datetime import datetime
 from ..models.community import Community
+from ..models.community_message import CommunityMessage
+from ..models.follower import community_members
 from ..models.user import User
 from ..extensions import db
+from ..utils.pagination import encode_cursor, decode_cursor, get_limit
+from ..utils.sql import contains_pattern
+from ..utils.sse import sse_response
+from ..services.event_bus import event_bus, TooManySubscribers
 from ..utils.validation import (
     validate_required_fields,
     validate_string_length,
@@ -22,6 +29,7 @@ community_model = community_ns.model('Community', {
     'category': fields.String,
     'members_count': fields.Integer,
     'is_member': fields.Boolean,
+    'last_activity_at': fields.String,
     'created_at': fields.String,
     'updated_at': fields.String
 })
@@ -33,27 +41,57 @@ community_input = community_ns.model('CommunityInput', {
     'category': fields.String
 })
 
+COMMUNITY_SORTS = {
+    'newest': (Community.created_at.desc(), Community.id.desc()),
+    'popular': (Community.members_count.desc(), Community.id.desc()),
+    'active': (Community.last_activity_at.desc(), Community.id.desc()),
+}
+
 @community_ns.route('')
 class CommunityList(Resource):
-    @community_ns.doc('list_communities')
+    @community_ns.doc('list_communities', params={
+        'page': 'Page number (default: 1)',
+        'per_page': 'Items per page (default: 20, max: 100)',
+        'category': 'Filter by category',
+        'q': 'Search community name and description',
+        'sort': 'newest (default), popular (most members) or active (most recent activity)'
+    })
     @jwt_required(optional=True)
     def get(self):
-        """Get all communities"""
+        """Discover communities with filtering, search, category facets and ranking"""
         try:
             current_user_id = get_jwt_identity()
             page = request.args.get('page', 1, type=int)
             per_page = min(request.args.get('per_page', 20, type=int), 100)
+            category = sanitize_string(request.args.get('category'), 50)
+            search = sanitize_string(request.args.get('q'), 100)
+            sort = request.args.get('sort', 'newest')
             
             if page < 1:
                 return {'error': 'Page must be >= 1'}, 400
+            if sort not in COMMUNITY_SORTS:
+                return {'error': f"Sort must be one of: {', '.join(COMMUNITY_SORTS)}"}, 400
+            
+            query = Community.query
+            if search:
+                # Backed by trigram indexes on PostgreSQL (see migration d7f9b1c3e5a6)
+                pattern = contains_pattern(search)
+                query = query.filter(db.or_(Community.name.ilike(pattern, escape='\\'),
+                                            Community.description.ilike(pattern, escape='\\')))
+            
+            # Facets reflect the search but not the selected category; without
+            # a search they are the maintained per-category counts
+            facets = Community.category_facets(query if search else None)
+            if category:
+                query = query.filter(Community.category == category)
             
-            # Paginate communities
-            paginated = Community.query.order_by(Community.created_at.desc()).paginate(
+            paginated = query.order_by(*COMMUNITY_SORTS[sort]).paginate(
                 page=page, per_page=per_page, error_out=False
             )
             
             return {
-                'communities': [community.to_dict(current_user_id, include_counts=True) for community in paginated.items],
+                'communities': Community.to_dict_many(paginated.items, current_user_id),
+                'facets': {'category': facets},
                 'total': paginated.total,
                 'pages': paginated.pages,
                 'current_page': page
@@ -163,84 +201,149 @@ class CommunityJoin(Resource):
     def post(self, id):
         """Join a community"""
         current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
         community = Community.query.get(id)
         
         if not community:
             community_ns.abort(404, 'Community not found')
         
-        if current_user in community.members:
+        members_count = Community.add_member(community.id, current_user_id)
+        if members_count is None:
+            db.session.rollback()
             community_ns.abort(400, 'Already a member of this community')
-        
-        community.members.append(current_user)
         db.session.commit()
         
-        return {'message': 'Successfully joined community', 'is_member': True}, 200
+        return {'message': 'Successfully joined community', 'is_member': True, 'members_count': members_count}, 200
     
     @community_ns.doc('leave_community')
     @jwt_required()
     def delete(self, id):
         """Leave a community"""
         current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
         community = Community.query.get(id)
         
         if not community:
             community_ns.abort(404, 'Community not found')
         
-        if current_user not in community.members:
+        members_count = Community.remove_member(community.id, current_user_id)
+        if members_count is None:
+            db.session.rollback()
             community_ns.abort(400, 'Not a member of this community')
-        
-        community.members.remove(current_user)
         db.session.commit()
         
-        return {'message': 'Successfully left community', 'is_member': False}, 200
+        return {'message': 'Successfully left community', 'is_member': False, 'members_count': members_count}, 200
 
 @community_ns.route('/<int:id>/members')
 class CommunityMembers(Resource):
-    @community_ns.doc('get_community_members')
+    @community_ns.doc('get_community_members', params={
+        'limit': 'Members per page (default: 20, max: 100)',
+        'cursor': 'Cursor returned as next_cursor by the previous page'
+    })
     @jwt_required(optional=True)
     def get(self, id):
-        """Get community members"""
+        """Get community members ordered by join date"""
         community = Community.query.get(id)
         if not community:
             community_ns.abort(404, 'Community not found')
         
         current_user_id = get_jwt_identity()
-        members = list(community.members)
-        return [member.to_dict(include_stats=True, current_user_id=current_user_id) for member in members]
+        limit = get_limit(request.args)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor, datetime, int)
+        if cursor and after is None:
+            return {'error': 'Invalid cursor'}, 400
+        
+        joined_at = community_members.c.joined_at
+        query = db.session.query(User, joined_at).join(
+            community_members, community_members.c.user_id == User.id
+        ).filter(community_members.c.community_id == id)
+        if after:
+            query = query.filter(db.or_(
+                joined_at > after[0],
+                db.and_(joined_at == after[0], User.id > after[1])
+            ))
+        rows = query.order_by(joined_at.asc(), User.id.asc()).limit(limit + 1).all()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        stats = User.batch_stats([user.id for user, _ in rows], current_user_id)
+        
+        members = []
+        for user, member_joined_at in rows:
+            members.append({
+                **user.to_summary_dict(),
+                **stats[user.id],
+                'joined_at': member_joined_at.isoformat() if member_joined_at else None,
+            })
+        
+        next_cursor = None
+        if has_more:
+            last_user, last_joined_at = rows[-1]
+            next_cursor = encode_cursor(last_joined_at, last_user.id)
+        
+        return {
+            'members': members,
+            'members_count': community.members_count,
+            'next_cursor': next_cursor
+        }
 
 @community_ns.route('/<int:id>/messages')
 class CommunityMessages(Resource):
+    @community_ns.doc('get_community_messages', params={
+        'limit': 'Messages to return (default: 50, max: 100)',
+        'before': 'Cursor: return messages older than this one',
+        'after': 'Cursor: return messages newer than this one'
+    })
     @jwt_required()
     def get(self, id):
-        """Get community chat messages"""
+        """Get community chat messages (latest first page, oldest-to-newest order)"""
         try:
-            from ..models import Comment, User
+            limit = get_limit(request.args, default=50)
+            before = request.args.get('before')
+            after = request.args.get('after')
             
-            messages = Comment.query.filter_by(community_id=id).order_by(Comment.created_at.asc()).limit(100).all()
+            query = CommunityMessage.query.filter_by(community_id=id)
+            if after:
+                position = decode_cursor(after, datetime, int)
+                if position is None:
+                    return {'error': 'Invalid cursor'}, 400
+                query = query.filter(db.or_(
+                    CommunityMessage.created_at > position[0],
+                    db.and_(CommunityMessage.created_at == position[0], CommunityMessage.id > position[1])
+                ))
+                messages = query.order_by(
+                    CommunityMessage.created_at.asc(), CommunityMessage.id.asc()
+                ).limit(limit + 1).all()
+                has_more = len(messages) > limit
+                messages = messages[:limit]
+            else:
+                if before:
+                    position = decode_cursor(before, datetime, int)
+                    if position is None:
+                        return {'error': 'Invalid cursor'}, 400
+                    query = query.filter(db.or_(
+                        CommunityMessage.created_at < position[0],
+                        db.and_(CommunityMessage.created_at == position[0], CommunityMessage.id < position[1])
+                    ))
+                messages = query.order_by(
+                    CommunityMessage.created_at.desc(), CommunityMessage.id.desc()
+                ).limit(limit + 1).all()
+                has_more = len(messages) > limit
+                messages = list(reversed(messages[:limit]))
             
-            result = []
-            for m in messages:
-                author = User.query.get(m.author_id)
-                result.append({
-                    'id': m.id, 
-                    'content': m.content, 
-                    'author': {'name': author.full_name if author else 'Unknown'}, 
-                    'created_at': m.created_at.isoformat()
-                })
-            
-            return {'messages': result}
+            return {
+                'messages': CommunityMessage.to_dict_many(messages),
+                'has_more': has_more,
+                'before': encode_cursor(messages[0].created_at, messages[0].id) if messages else before,
+                'after': encode_cursor(messages[-1].created_at, messages[-1].id) if messages else after
+            }
         except Exception as e:
-            import traceback
-            traceback.print_exc()
-            return {'error': str(e)}, 500
+            current_app.logger.exception('Failed to fetch community messages')
+            return {'error': 'Failed to fetch messages'}, 500
     
     @jwt_required()
     def post(self, id):
         """Send a message to community chat"""
         try:
-            from ..models import Comment, User
             user_id = int(get_jwt_identity())
             data = request.get_json()
             
@@ -254,23 +357,47 @@ class CommunityMessages(Resource):
             if not is_valid:
                 return {'error': error}, 400
             
-            message = Comment(
+            if not db.session.query(Community.id).filter_by(id=id).scalar():
+                return {'error': 'Community not found'}, 404
+            
+            message = CommunityMessage(
                 content=content,
                 author_id=user_id,
                 community_id=id
             )
             db.session.add(message)
+            Community.touch_activity(id)
             db.session.commit()
             
-            author = User.query.get(user_id)
-            return {
-                'id': message.id, 
-                'content': message.content, 
-                'author': {'name': author.full_name if author else 'Unknown'}, 
-                'created_at': message.created_at.isoformat()
-            }, 201
+            result = message.to_dict(User.query.get(user_id))
+            event_bus.publish(f'community:{id}', {'event': 'message', 'id': message.id, 'data': result})
+            return result, 201
         except Exception as e:
             db.session.rollback()
-            import traceback
-            traceback.print_exc()
-            return {'error': str(e)}, 500
+            current_app.logger.exception('Failed to send community message')
+            return {'error': 'Failed to send message'}, 500
+
+@community_ns.route('/<int:id>/messages/stream')
+class CommunityMessageStream(Resource):
+    @community_ns.doc('stream_community_messages', params={
+        'jwt': 'Access token (EventSource cannot send an Authorization header)'
+    })
+    @jwt_required(locations=['headers', 'query_string'])
+    def get(self, id):
+        """Stream new community chat messages to members as Server-Sent Events"""
+        community = db.session.get(Community, id)
+        if community is None:
+            community_ns.abort(404, 'Community not found')
+        if not community.has_member(get_jwt_identity()):
+            return {'error': 'Join the community to follow its chat'}, 403
+        
+        try:
+            subscription = event_bus.subscribe(
+                f'community:{id}', max_subscribers=current_app.config['SSE_MAX_CONNECTIONS']
+            )
+        except TooManySubscribers:
+            return {'error': 'Too many live connections, retry later'}, 503, {'Retry-After': '30'}
+        
+        # Do not hold a pooled connection for the lifetime of the stream
+        db.session.close()
+        return sse_response(subscription, heartbeat=current_app.config['SSE_HEARTBEAT_SECONDS'])
@@ -1,40 +1,189 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.extensions import db
 from app.models.marketplace import Product, Order, Payment
-from app.services.mpesa_service import MpesaService
-from app.services.cloudinary_service import CloudinaryService
+from app.services.payment_queue import enqueue_payment
+from app.services import catalog, inventory, media_uploads, order_states, payments, product_search, sales
+from app.utils.pagination import encode_cursor, decode_cursor, get_limit
+from datetime import date, datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, contains_eager
 
 marketplace_bp = Blueprint('marketplace', __name__)
 
+# sort name -> (sort column, cursor value type, descending)
+PRODUCT_SORTS = {
+    'newest': (Product.created_at, datetime, True),
+    'oldest': (Product.created_at, datetime, False),
+    'price_asc': (Product.price, float, False),
+    'price_desc': (Product.price, float, True),
+}
+
 @marketplace_bp.route('/products', methods=['GET'])
 def get_products():
-    products = Product.query.filter(Product.quantity > 0).all()
-    return jsonify({'products': [{'id': p.id, 'name': p.name, 'description': p.description, 
-                                   'price': p.price, 'quantity': p.quantity, 'unit': p.unit,
-                                   'category': p.category, 'image_url': p.image_url, 'seller_id': p.seller_id} for p in products]})
+    """
+    In-stock products, keyset-paginated.
+    Filters: category, seller_id, min_price, max_price. Sort: newest (default),
+    oldest, price_asc, price_desc. Pass next_cursor back as `cursor`.
+    """
+    sort = request.args.get('sort', 'newest')
+    if sort not in PRODUCT_SORTS:
+        return jsonify({'error': f"Sort must be one of: {', '.join(PRODUCT_SORTS)}"}), 400
+    column, value_type, descending = PRODUCT_SORTS[sort]
+
+    query = Product.query.filter(Product.quantity > 0)
+    if request.args.get('category'):
+        query = query.filter(Product.category == request.args['category'])
+    try:
+        seller_id = request.args.get('seller_id', type=int)
+        min_price = float(request.args['min_price']) if request.args.get('min_price') else None
+        max_price = float(request.args['max_price']) if request.args.get('max_price') else None
+    except ValueError:
+        return jsonify({'error': 'min_price and max_price must be numbers'}), 400
+    if seller_id:
+        query = query.filter(Product.seller_id == seller_id)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+
+    cursor = request.args.get('cursor')
+    position = decode_cursor(cursor, value_type, int)
+    if cursor and position is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    if position:
+        value, last_id = position
+        if descending:
+            query = query.filter(db.or_(column < value, db.and_(column == value, Product.id < last_id)))
+        else:
+            query = query.filter(db.or_(column > value, db.and_(column == value, Product.id > last_id)))
+
+    if descending:
+        query = query.order_by(column.desc(), Product.id.desc())
+    else:
+        query = query.order_by(column.asc(), Product.id.asc())
+
+    limit = get_limit(request.args)
+    products = query.limit(limit + 1).all()
+    has_more = len(products) > limit
+    products = products[:limit]
+    next_cursor = None
+    if has_more:
+        last = products[-1]
+        next_cursor = encode_cursor(getattr(last, column.key), last.id)
+
+    return jsonify({'products': [p.to_dict() for p in products], 'next_cursor': next_cursor})
 
 @marketplace_bp.route('/products', methods=['POST'])
 @jwt_required()
 def create_product():
+    """Pass `media_id` from /upload-image to have the image set once its upload finishes"""
     user_id = get_jwt_identity()
     data = request.json
+    media = None
+    if data.get('media_id') is not None:
+        media = media_uploads.get_unattached(data['media_id'], int(user_id))
+        if media is None:
+            return jsonify({'error': 'Unknown or already used media_id'}), 400
     product = Product(name=data['name'], description=data.get('description'), 
                      price=data['price'], quantity=data['quantity'], unit=data.get('unit'),
                      category=data.get('category'), image_url=data.get('image_url'), seller_id=user_id)
     db.session.add(product)
+    db.session.flush()
+    product_search.index_products([product.id])
+    if media:
+        media_uploads.attach(media.id, 'product', product.id)
     db.session.commit()
     return jsonify({'message': 'Product created', 'id': product.id}), 201
 
+@marketplace_bp.route('/products/search', methods=['GET'])
+def search_products():
+    """
+    Full-text search over in-stock products' name, category, unit and
+    description, best match first, with category and price facets.
+    Filters: category, seller_id, min_price, max_price. Paged with page/per_page.
+    """
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    page = request.args.get('page', 1, type=int)
+    if page < 1:
+        return jsonify({'error': 'Page must be >= 1'}), 400
+    try:
+        min_price = float(request.args['min_price']) if request.args.get('min_price') else None
+        max_price = float(request.args['max_price']) if request.args.get('max_price') else None
+    except ValueError:
+        return jsonify({'error': 'min_price and max_price must be numbers'}), 400
+
+    per_page = get_limit(request.args)
+    result = product_search.search(
+        q,
+        category=request.args.get('category'),
+        seller_id=request.args.get('seller_id', type=int),
+        min_price=min_price,
+        max_price=max_price,
+        page=page,
+        per_page=per_page
+    )
+    result['pages'] = -(-result['total'] // per_page)
+    result['current_page'] = page
+    return jsonify(result)
+
+@marketplace_bp.route('/products/import', methods=['POST'])
+@jwt_required()
+def import_products():
+    """
+    Create many products in one request from a CSV (text/csv, with a header row)
+    or NDJSON (application/x-ndjson) body, read as a stream. Valid rows are
+    inserted with chunked multi-row inserts in one transaction; the response
+    reports the new id or the validation error for every row.
+    """
+    user_id = int(get_jwt_identity())
+    config = current_app.config
+    try:
+        report = catalog.import_products(
+            user_id,
+            catalog.iter_rows(request.stream, request.mimetype),
+            chunk_size=config['PRODUCT_IMPORT_CHUNK_SIZE'],
+            max_rows=config['PRODUCT_IMPORT_MAX_ROWS']
+        )
+        db.session.commit()
+    except catalog.ImportTooLarge as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 413
+    except catalog.CatalogImportError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Product import failed')
+        return jsonify({'error': 'Failed to import products'}), 500
+    return jsonify(report), 201
+
+@marketplace_bp.route('/products/export', methods=['GET'])
+@jwt_required()
+def export_products():
+    """Stream the current user's catalog as CSV (default) or NDJSON (?format=ndjson)"""
+    user_id = int(get_jwt_identity())
+    fmt = request.args.get('format', 'csv')
+    if fmt not in catalog.FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(catalog.FORMATS)}"}), 400
+    return Response(
+        stream_with_context(catalog.export_products(user_id, fmt)),
+        mimetype=catalog.FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename=products.{fmt}'}
+    )
+
 @marketplace_bp.route('/products/<int:product_id>', methods=['DELETE'])
 @jwt_required()
 def delete_product(product_id):
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     product = Product.query.get_or_404(product_id)
     
     if product.seller_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    product_search.remove_products([product.id])
     db.session.delete(product)
     db.session.commit()
     return jsonify({'message': 'Product deleted'})
@@ -42,9 +191,7 @@ def delete_product(product_id):
 @marketplace_bp.route('/products/<int:product_id>', methods=['GET'])
 def get_product(product_id):
     product = Product.query.get_or_404(product_id)
-    return jsonify({'id': product.id, 'name': product.name, 'description': product.description,
-                   'price': product.price, 'quantity': product.quantity, 'unit': product.unit,
-                   'category': product.category, 'image_url': product.image_url, 'seller_id': product.seller_id})
+    return jsonify(product.to_dict())
 
 @marketplace_bp.route('/upload-image', methods=['POST'])
 @jwt_required()
@@ -56,12 +203,16 @@ def upload_product_image():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    try:
-        cloudinary = CloudinaryService()
-        image_url = cloudinary.upload_image(file)
-        return jsonify({'image_url': image_url})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    if '.' not in file.filename or \
+            file.filename.rsplit('.', 1)[1].lower() not in current_app.config['ALLOWED_UPLOAD_EXTENSIONS']:
+        return jsonify({'error': 'Invalid image file type'}), 400
+    
+    # Uploaded to Cloudinary in the background: pass media_id when creating the
+    # product, or poll GET /api/v1/media/<id> for the URL
+    media = media_uploads.spool(file, int(get_jwt_identity()), 'agrikonnect/products')
+    db.session.commit()
+    media_uploads.enqueue_upload(media.id)
+    return jsonify({'media_id': media.id, 'status': 'queued'}), 202
 
 @marketplace_bp.route('/orders', methods=['POST'])
 @jwt_required()
@@ -71,71 +222,188 @@ def create_order():
     product = Product.query.get_or_404(data['product_id'])
     
     quantity = int(data['quantity'])
-    if product.quantity < quantity:
-        return jsonify({'error': 'Insufficient quantity'}), 400
+    if quantity < 1:
+        return jsonify({'error': 'Quantity must be at least 1'}), 400
+    # Take the units now; a conditional UPDATE so concurrent buyers cannot oversell
+    if not inventory.reserve(product.id, quantity):
+        # Units may only be held by lapsed reservations the sweep has not reached yet
+        if not (inventory.release_expired(product_id=product.id) and inventory.reserve(product.id, quantity)):
+            db.session.rollback()
+            return jsonify({'error': 'Insufficient quantity'}), 400
     
     total = product.price * quantity
     order = Order(product_id=product.id, buyer_id=user_id, quantity=quantity,
                  total_price=total, buyer_name=data.get('buyer_name'), 
-                 buyer_phone=data['buyer_phone'], delivery_address=data.get('delivery_address'))
+                 buyer_phone=data['buyer_phone'], delivery_address=data.get('delivery_address'),
+                 reserved_until=inventory.reservation_deadline())
     db.session.add(order)
+    db.session.flush()
+    order_states.record(order.id, None, 'pending', reason='Order placed', actor_id=int(user_id))
     db.session.commit()
-    return jsonify({'message': 'Order created', 'order_id': order.id, 'total': total}), 201
+    return jsonify({'message': 'Order created', 'order_id': order.id, 'total': total,
+                    'reserved_until': order.reserved_until.isoformat()}), 201
 
 @marketplace_bp.route('/payments/initiate', methods=['POST'])
 @jwt_required()
 def initiate_payment():
+    """
+    Queue an STK push for the order and return the payment id immediately;
+    poll GET /payments/<id> (or wait for the order to be paid) for the outcome.
+    """
+    user_id = int(get_jwt_identity())
     data = request.json
     order = Order.query.get_or_404(data['order_id'])
+    if order.buyer_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
     
-    if order.status == 'paid':
+    if order.status in order_states.PAID_STATUSES:
         return jsonify({'error': 'Order already paid'}), 400
+    if order.status != 'pending':
+        return jsonify({'error': f'Order is {order.status}, place a new order'}), 409
     
-    mpesa = MpesaService()
-    result = mpesa.stk_push(order.buyer_phone, order.total_price, order.id)
+    active = _active_payment(order.id)
+    if active:
+        return _payment_in_progress(active)
     
-    if result.get('ResponseCode') == '0':
-        payment = Payment(order_id=order.id, amount=order.total_price, phone_number=order.buyer_phone,
-                         checkout_request_id=result.get('CheckoutRequestID'),
-                         merchant_request_id=result.get('MerchantRequestID'))
-        db.session.add(payment)
-        db.session.commit()
-        return jsonify({'message': 'Payment initiated', 'checkout_request_id': result.get('CheckoutRequestID')})
-    else:
-        order.status = 'paid'
-        order.product.quantity -= order.quantity
-        payment = Payment(order_id=order.id, amount=order.total_price, phone_number=order.buyer_phone, status='completed')
-        db.session.add(payment)
-        db.session.commit()
-        return jsonify({'message': 'Order marked as paid (demo mode)', 'order_id': order.id})
+    payment = Payment(order_id=order.id, amount=order.total_price, phone_number=order.buyer_phone,
+                     status='queued')
+    db.session.add(payment)
+    try:
+        # uq_payments_order_active admits one payment in progress per order
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        active = _active_payment(order.id)
+        if active is None:
+            raise
+        return _payment_in_progress(active)
+    # Keep the stock held while the buyer answers the STK prompt
+    inventory.extend(order.id, current_app.config['ORDER_PAYMENT_HOLD_SECONDS'])
+    db.session.commit()
+    enqueue_payment(payment.id)
+    return jsonify({'message': 'Payment initiated', 'payment_id': payment.id, 'status': 'queued'}), 202
+
+def _active_payment(order_id):
+    return Payment.query.filter(
+        Payment.order_id == order_id, Payment.status.in_(Payment.ACTIVE_STATUSES)
+    ).first()
+
+def _payment_in_progress(payment):
+    return jsonify({'message': 'Payment already in progress', 'payment_id': payment.id,
+                    'status': payment.status}), 202
+
+@marketplace_bp.route('/payments/<int:payment_id>', methods=['GET'])
+@jwt_required()
+def get_payment(payment_id):
+    user_id = int(get_jwt_identity())
+    payment = Payment.query.get_or_404(payment_id)
+    if payment.order.buyer_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify({**payment.to_dict(), 'order_status': payment.order.status})
 
 @marketplace_bp.route('/payments/callback', methods=['POST'])
 def payment_callback():
-    data = request.json
+    data = request.get_json(silent=True) or {}
     result = data.get('Body', {}).get('stkCallback', {})
-    checkout_request_id = result.get('CheckoutRequestID')
-    
-    payment = Payment.query.filter_by(checkout_request_id=checkout_request_id).first()
-    if not payment:
-        return jsonify({'message': 'Payment not found'}), 404
-    
-    if result.get('ResultCode') == 0:
-        payment.status = 'completed'
-        payment.mpesa_receipt_number = result.get('CallbackMetadata', {}).get('Item', [{}])[0].get('Value')
-        payment.order.status = 'paid'
-        payment.order.product.quantity -= payment.order.quantity
-    else:
-        payment.status = 'failed'
-        payment.order.status = 'cancelled'
-    
-    db.session.commit()
-    return jsonify({'message': 'Callback processed'})
+    status, message = payments.process_callback(result)
+    return jsonify({'message': message}), status
 
 @marketplace_bp.route('/my-orders', methods=['GET'])
 @jwt_required()
 def get_my_orders():
     user_id = get_jwt_identity()
-    orders = Order.query.filter_by(buyer_id=user_id).all()
-    return jsonify({'orders': [{'id': o.id, 'product_name': o.product.name, 'quantity': o.quantity,
-                                'total_price': o.total_price, 'status': o.status, 
-                                'created_at': o.created_at.isoformat()} for o in orders]})
+    orders = Order.query.options(joinedload(Order.product)).filter_by(buyer_id=user_id) \
+        .order_by(Order.created_at.desc()).all()
+    return jsonify({'orders': [o.to_dict() for o in orders]})
+
+@marketplace_bp.route('/orders/<int:order_id>/events', methods=['GET'])
+@jwt_required()
+def get_order_events(order_id):
+    """Status history of an order, oldest first, for its buyer or seller"""
+    user_id = int(get_jwt_identity())
+    order = Order.query.options(joinedload(Order.product)).get_or_404(order_id)
+    if user_id not in (order.buyer_id, order.product.seller_id):
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify({'order': order.to_dict(), 'events': [e.to_dict() for e in order_states.history(order.id)]})
+
+@marketplace_bp.route('/seller/orders/status', methods=['PUT'])
+@jwt_required()
+def update_seller_orders_status():
+    """
+    Mark paid orders shipped, or shipped orders delivered, in one batch:
+    {"order_ids": [...], "status": "shipped" | "delivered"}. Orders that are
+    not the seller's or cannot make that move are reported as skipped.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    status = data.get('status')
+    order_ids = data.get('order_ids')
+    if status not in order_states.FULFILMENT_STATUSES:
+        return jsonify({'error': f"Status must be one of: {', '.join(order_states.FULFILMENT_STATUSES)}"}), 400
+    if not isinstance(order_ids, list) or not order_ids or len(order_ids) > 500 \
+            or not all(isinstance(i, int) for i in order_ids):
+        return jsonify({'error': 'order_ids must be a list of 1 to 500 order ids'}), 400
+
+    own_products = db.select(Product.id).where(Product.seller_id == user_id)
+    moved = order_states.transition(
+        status, Order.id.in_(order_ids), Order.product_id.in_(own_products),
+        reason=f'Marked {status} by seller', actor_id=user_id
+    )
+    db.session.commit()
+    updated = sorted(row.id for row in moved)
+    return jsonify({'status': status, 'updated': updated,
+                    'skipped': sorted(set(order_ids) - set(updated))})
+
+@marketplace_bp.route('/seller/orders', methods=['GET'])
+@jwt_required()
+def get_seller_orders():
+    """Orders received for the current user's products, newest first (keyset-paginated)"""
+    user_id = int(get_jwt_identity())
+    query = Order.query.join(Product, Product.id == Order.product_id) \
+        .options(contains_eager(Order.product)).filter(Product.seller_id == user_id)
+    if request.args.get('status'):
+        if request.args['status'] not in order_states.STATUSES:
+            return jsonify({'error': f"Status must be one of: {', '.join(order_states.STATUSES)}"}), 400
+        query = query.filter(Order.status == request.args['status'])
+
+    cursor = request.args.get('cursor')
+    position = decode_cursor(cursor, datetime, int)
+    if cursor and position is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    if position:
+        query = query.filter(db.or_(
+            Order.created_at < position[0],
+            db.and_(Order.created_at == position[0], Order.id < position[1])
+        ))
+
+    limit = get_limit(request.args)
+    orders = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    return jsonify({
+        'orders': [{**o.to_dict(), 'buyer_name': o.buyer_name, 'buyer_phone': o.buyer_phone,
+                    'delivery_address': o.delivery_address} for o in orders],
+        'next_cursor': encode_cursor(orders[-1].created_at, orders[-1].id) if has_more else None
+    })
+
+@marketplace_bp.route('/seller/sales', methods=['GET'])
+@jwt_required()
+def get_seller_sales():
+    """Revenue per day and per product from the sales rollups (`from`/`to` dates, default last 30 days)"""
+    user_id = int(get_jwt_identity())
+    try:
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else datetime.utcnow().date()
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'from and to must be dates (YYYY-MM-DD)'}), 400
+    if start > end or (end - start).days > 366:
+        return jsonify({'error': 'Date range must be between 1 and 367 days'}), 400
+    return jsonify(sales.seller_sales(user_id, start, end))
+
+@marketplace_bp.route('/seller/stock', methods=['GET'])
+@jwt_required()
+def get_seller_stock():
+    """Stock levels for the current user's products, lowest first"""
+    user_id = int(get_jwt_identity())
+    low_stock = request.args.get('low_stock', 5, type=int)
+    return jsonify({'products': sales.seller_stock(user_id, low_stock)})
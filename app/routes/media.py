@@ -0,0 +1,14 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models.media_upload import MediaUpload
+
+media_bp = Blueprint('media', __name__)
+
+@media_bp.route('/media/<int:media_id>', methods=['GET'])
+@jwt_required()
+def get_media(media_id):
+    """Status of a background image upload; `url` is set once it is done"""
+    media = MediaUpload.query.get_or_404(media_id)
+    if media.owner_id != int(get_jwt_identity()):
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(media.to_dict())
@@ -65,7 +65,7 @@ class Inbox(Resource):
                     'first_name': other_user.first_name,
                     'last_name': other_user.last_name,
                     'role': other_user.role,
-                    'profile_image': other_user.profile_image,
+                    'profile_image': other_user.avatar_thumbnail,
                     'last_message': msg.content,
                     'last_message_time': msg.created_at.isoformat()
                 })
@@ -129,18 +129,10 @@ def legacy_send_message():
         db.session.commit()
         
         # Create notification
-        from app.models.notification import Notification
+        from app.services.notification_service import NotificationService
         sender = User.query.get(user_id)
         if sender:
-            notification = Notification(
-                user_id=receiver_id,
-                type='message',
-                title='New Message',
-                message=f'{sender.first_name} {sender.last_name} sent you a message',
-                link=f'/messages/{user_id}'
-            )
-            db.session.add(notification)
-            db.session.commit()
+            NotificationService.notify_message(receiver_id, user_id, f'{sender.first_name} {sender.last_name}')
 
         return jsonify(message.to_dict()), 201
     except Exception as e:
@@ -179,7 +171,7 @@ def legacy_inbox():
                     'first_name': other_user.first_name,
                     'last_name': other_user.last_name,
                     'role': other_user.role,
-                    'profile_image': other_user.profile_image,
+                    'profile_image': other_user.avatar_thumbnail,
                     'last_message': msg.content,
                     'last_message_time': msg.created_at.isoformat()
                 })
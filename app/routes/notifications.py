@@ -1,44 +1,55 @@
 from flask_restx import Namespace, Resource
-from flask import request
+from flask import request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime
 from ..extensions import db
+from ..utils.pagination import get_limit
+from ..utils.sse import format_sse, sse_response
+from ..services.event_bus import event_bus, TooManySubscribers
+from ..services.notification_store import get_notification_store, NotificationStoreError
 
 notification_ns = Namespace('notifications', description='Notification operations')
 
 @notification_ns.route('')
 class NotificationList(Resource):
+    @notification_ns.doc('list_notifications', params={
+        'limit': 'Notifications per page (default: 20, max: 100)',
+        'cursor': 'Cursor returned as next_cursor by the previous page',
+        'unread_only': 'true to return only unread notifications',
+        'page': 'No longer supported beyond page 1: use cursor'
+    })
     @jwt_required()
     def get(self):
-        """Get notifications for current user"""
-        from ..models.notification import Notification
+        """Get notifications for current user, newest first"""
         user_id = int(get_jwt_identity())
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        unread_only = request.args.get('unread_only', 'false')
-        
-        query = Notification.query.filter_by(user_id=user_id)
-        if unread_only == 'true':
-            query = query.filter_by(is_read=False)
-        
-        notifications = query.order_by(Notification.created_at.desc()).limit(per_page).offset((page - 1) * per_page).all()
-        total = query.count()
-        unread_count = Notification.query.filter_by(user_id=user_id, is_read=False).count()
-        
-        return {
-            'notifications': [n.to_dict() for n in notifications],
-            'total': total,
-            'unread_count': unread_count
-        }, 200
+        if request.args.get('page', '1') != '1':
+            # Offset paging was replaced by cursors; don't answer page=2 with page 1
+            return {'error': 'page is no longer supported; pass the previous response\'s next_cursor as cursor'}, 400
+        try:
+            return get_notification_store().list(
+                user_id,
+                limit=get_limit(request.args),
+                cursor=request.args.get('cursor'),
+                unread_only=request.args.get('unread_only', 'false') == 'true'
+            ), 200
+        except ValueError:
+            return {'error': 'Invalid cursor'}, 400
+        except NotificationStoreError:
+            current_app.logger.exception('Failed to fetch notifications')
+            return {'error': 'Notifications are temporarily unavailable'}, 503
 
 @notification_ns.route('/<int:notification_id>/read')
 class NotificationRead(Resource):
     @jwt_required()
     def put(self, notification_id):
         """Mark notification as read"""
-        from ..models.notification import Notification
-        notification = Notification.query.get_or_404(notification_id)
-        notification.is_read = True
-        db.session.commit()
+        user_id = int(get_jwt_identity())
+        try:
+            found = get_notification_store().mark_read(user_id, notification_id)
+        except NotificationStoreError:
+            return {'error': 'Notifications are temporarily unavailable'}, 503
+        if not found:
+            notification_ns.abort(404, 'Notification not found')
         return {'message': 'Marked as read'}, 200
 
 @notification_ns.route('/read-all')
@@ -46,10 +57,11 @@ class NotificationReadAll(Resource):
     @jwt_required()
     def put(self):
         """Mark all notifications as read"""
-        from ..models.notification import Notification
         user_id = int(get_jwt_identity())
-        Notification.query.filter_by(user_id=user_id, is_read=False).update({'is_read': True})
-        db.session.commit()
+        try:
+            get_notification_store().mark_all_read(user_id)
+        except NotificationStoreError:
+            return {'error': 'Notifications are temporarily unavailable'}, 503
         return {'message': 'All notifications marked as read'}, 200
 
 @notification_ns.route('/unread-count')
@@ -57,21 +69,94 @@ class NotificationUnreadCount(Resource):
     @jwt_required(optional=True)
     def get(self):
         """Get unread notification count (returns 0 if unauthenticated)"""
-        from ..models.notification import Notification
         user_identity = get_jwt_identity()
         if not user_identity:
             return {'count': 0}, 200
-        user_id = int(user_identity)
-        count = Notification.query.filter_by(user_id=user_id, is_read=False).count()
-        return {'count': count}, 200
+        try:
+            return {'count': get_notification_store().unread_count(int(user_identity))}, 200
+        except NotificationStoreError:
+            return {'error': 'Notifications are temporarily unavailable'}, 503
 
 @notification_ns.route('/<int:notification_id>')
 class NotificationDelete(Resource):
     @jwt_required()
     def delete(self, notification_id):
         """Delete a notification"""
-        from ..models.notification import Notification
-        notification = Notification.query.get_or_404(notification_id)
-        db.session.delete(notification)
-        db.session.commit()
+        user_id = int(get_jwt_identity())
+        try:
+            found = get_notification_store().delete(user_id, notification_id)
+        except NotificationStoreError:
+            return {'error': 'Notifications are temporarily unavailable'}, 503
+        if not found:
+            notification_ns.abort(404, 'Notification not found')
         return {'message': 'Notification deleted'}, 200
+
+@notification_ns.route('/preferences')
+class NotificationPreferences(Resource):
+    @jwt_required()
+    def get(self):
+        """Get the current user's notification email preferences"""
+        from ..models import User
+        user = User.query.get_or_404(int(get_jwt_identity()))
+        return {'digest': user.notification_digest, 'last_digest_at': user.last_digest_at.isoformat() if user.last_digest_at else None}, 200
+
+    @notification_ns.doc('update_notification_preferences', params={
+        'digest': "Email digest frequency: 'off', 'hourly' or 'daily' (JSON body)"
+    })
+    @jwt_required()
+    def put(self):
+        """Update the current user's notification email preferences"""
+        from ..models import User
+        from ..services.digest import DIGEST_PERIODS
+        data = request.get_json(silent=True) or {}
+        digest = data.get('digest')
+        if digest not in ('off', *DIGEST_PERIODS):
+            return {'error': f"digest must be one of: off, {', '.join(DIGEST_PERIODS)}"}, 400
+        user = User.query.get_or_404(int(get_jwt_identity()))
+        if digest != user.notification_digest:
+            user.notification_digest = digest
+            # Start the first period now rather than mailing the whole backlog
+            user.last_digest_at = datetime.utcnow()
+            db.session.commit()
+        return {'digest': user.notification_digest}, 200
+
+@notification_ns.route('/stream')
+class NotificationStream(Resource):
+    @notification_ns.doc('stream_notifications', params={
+        'jwt': 'Access token (EventSource cannot send an Authorization header)',
+        'last_event_id': 'Resume after this event id (alternative to the Last-Event-ID header)'
+    })
+    @jwt_required(locations=['headers', 'query_string'])
+    def get(self):
+        """
+        Stream new notifications and unread-count changes as Server-Sent Events.
+        Live events are published by the local backend only.
+        """
+        user_id = int(get_jwt_identity())
+        config = current_app.config
+        store = get_notification_store()
+        
+        try:
+            # Subscribe before reading the backlog so nothing is missed in between
+            subscription = event_bus.subscribe(f'user:{user_id}', max_subscribers=config['SSE_MAX_CONNECTIONS'])
+        except TooManySubscribers:
+            return {'error': 'Too many live connections, retry later'}, 503, {'Retry-After': '30'}
+        
+        initial = []
+        try:
+            last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+            if last_event_id:
+                missed = store.replay(user_id, last_event_id, config['SSE_RESUME_LIMIT'])
+                initial.extend(format_sse(n, 'notification', event_id) for event_id, n in missed)
+            try:
+                initial.append(format_sse({'count': store.unread_count(user_id)}, 'unread_count'))
+            except NotificationStoreError:
+                current_app.logger.warning('Unread count unavailable for notification stream')
+        except Exception:
+            # The stream never starts, so free the connection slot here
+            subscription.close()
+            raise
+        
+        # Do not hold a pooled connection for the lifetime of the stream
+        db.session.close()
+        return sse_response(subscription, heartbeat=config['SSE_HEARTBEAT_SECONDS'], initial=initial)
@@ -10,7 +10,8 @@ from ..utils.validation import (
     sanitize_string,
     validate_url
 )
-from ..services.cloudinary_service import CloudinaryService
+from ..services import media_uploads
+from ..services.notification_service import NotificationService
 from werkzeug.utils import secure_filename
 import os
 
@@ -121,9 +122,10 @@ class PostList(Resource):
             if not is_valid:
                 return {'error': error}, 400
 
-            # Handle image file upload if present
+            # An uploaded image is sent to Cloudinary in the background and set on the post when done
             image_url = data.get('image_url')
             image_file = request.files.get('image') or request.files.get('file')
+            media = None
             if image_file:
                 filename = secure_filename(image_file.filename)
                 if '.' in filename:
@@ -134,12 +136,8 @@ class PostList(Resource):
                 if ext not in allowed:
                     return {'error': 'Invalid image file type'}, 400
 
-                try:
-                    cloudinary = CloudinaryService()
-                    image_url = cloudinary.upload_image(image_file, folder='agrikonnect/posts')
-                except Exception as e:
-                    current_app.logger.exception('Cloudinary upload failed')
-                    return {'error': 'Failed to upload image'}, 500
+                media = media_uploads.spool(image_file, int(current_user_id), 'agrikonnect/posts')
+                image_url = None
 
             if image_url:
                 image_url = sanitize_string(image_url, 500)
@@ -155,9 +153,17 @@ class PostList(Resource):
             )
 
             db.session.add(post)
+            db.session.flush()
+            if media:
+                media_uploads.attach(media.id, 'post', post.id)
             db.session.commit()
+            if media:
+                media_uploads.enqueue_upload(media.id)
 
-            return {'message': 'Post created', 'post': post.to_dict()}, 201
+            response = {'message': 'Post created', 'post': post.to_dict()}
+            if media:
+                response['media'] = {'id': media.id, 'status': media.status}
+            return response, 201
         except Exception as e:
             db.session.rollback()
             current_app.logger.exception('Failed to create post')
@@ -285,21 +291,14 @@ class PostComments(Resource):
             )
             
             db.session.add(comment)
+            db.session.commit()
             
-            # Create notification if not commenting on own post
+            # Notify the author unless commenting on own post
             if post.author_id != int(current_user_id):
-                from ..models import Notification
                 user = User.query.get(current_user_id)
-                notification = Notification(
-                    user_id=post.author_id,
-                    title='New Comment',
-                    message=f"{user.first_name} {user.last_name} commented on your post",
-                    type='comment',
-                    related_id=post_id
+                NotificationService.notify_comment(
+                    post.author_id, user.id, user.full_name, post_id, user.profile_image
                 )
-                db.session.add(notification)
-            
-            db.session.commit()
             
             # Refresh to load the author relationship
             db.session.refresh(comment)
@@ -316,7 +315,7 @@ class PostLike(Resource):
     def post(self, post_id):
         """Like a post"""
         try:
-            from ..models import Like, Notification
+            from ..models import Like
             current_user_id = int(get_jwt_identity())
             
             post = Post.query.get(post_id)
@@ -331,20 +330,14 @@ class PostLike(Resource):
             # Create like
             like = Like(post_id=post_id, user_id=current_user_id)
             db.session.add(like)
+            db.session.commit()
             
-            # Create notification if not liking own post
+            # Notify the author unless liking own post
             if post.author_id != current_user_id:
                 user = User.query.get(current_user_id)
-                notification = Notification(
-                    user_id=post.author_id,
-                    title='New Like',
-                    message=f"{user.first_name} {user.last_name} liked your post",
-                    type='like',
-                    related_id=post_id
+                NotificationService.notify_post_like(
+                    post.author_id, user.id, user.full_name, post_id, user.profile_image
                 )
-                db.session.add(notification)
-            
-            db.session.commit()
             return {'message': 'Post liked', 'liked': True, 'likeCount': len(post.likes)}, 200
         except Exception as e:
             db.session.rollback()
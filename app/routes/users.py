@@ -2,16 +2,16 @@ from flask import request, Blueprint, jsonify
 from flask_restx import Namespace, Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.security import check_password_hash, generate_password_hash
-from werkzeug.utils import secure_filename
 from app.models.user import User
+from app.models.community import Community
 from app.extensions import db
+from app.services import images
 from app.utils.validation import (
     validate_password,
     validate_string_length,
     sanitize_string,
     validate_required_fields
 )
-import os
 
 user_ns = Namespace('users', description='User operations')
 users_bp = Blueprint('users', __name__)
@@ -158,10 +158,11 @@ class UserPhotoUpload(Resource):
             if size > 5 * 1024 * 1024:
                 return {'error': 'File too large. Maximum size: 5MB'}, 400
             
-            filename = secure_filename(f"{id}_{request.form.get('type', 'profile')}_{file.filename}")
-            os.makedirs('uploads', exist_ok=True)
-            file.save(os.path.join('uploads', filename))
-            url = f"/uploads/{filename}"
+            # Stored by content hash; avatar and card thumbnails are made in the background
+            try:
+                url = images.store(file.read())
+            except images.InvalidImage as e:
+                return {'error': str(e)}, 400
             
             photo_type = request.form.get('type', 'profile')
             if photo_type == 'profile':
@@ -219,4 +220,4 @@ class UserCommunities(Resource):
         current_user_id = get_jwt_identity()
         # `communities` is a backref on the User model
         communities = list(getattr(user, 'communities', []))
-        return [c.to_dict(current_user_id, include_counts=True) for c in communities]
+        return Community.to_dict_many(communities, current_user_id)
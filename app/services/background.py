@@ -0,0 +1,218 @@
+"""
+Bounded in-process work queues drained by background worker threads.
+
+Each queue batches submitted items, hands them to a handler inside an
+application context, optionally retries failures with exponential backoff,
+and keeps simple counters that are exposed through the metrics endpoint.
+"""
+import logging
+import queue
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class BackgroundQueue:
+    def __init__(self, name, handler, workers=2, maxsize=1000, batch_size=1,
+                 batch_wait=0.2, max_attempts=1, backoff_base=1.0, backoff_max=60.0,
+                 poll=None, poll_interval=30.0):
+        """
+        `handler(items)` processes a list of up to `batch_size` items. It may
+        raise to fail the whole batch or return an iterable of the items that
+        failed. Failed items are retried up to `max_attempts` times in total.
+        `poll()`, if given, runs every `poll_interval` seconds and may return
+        items to enqueue (e.g. rows recovered from a durable outbox).
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.app = None
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._started = False
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'processed': 0,
+            'retried': 0,
+            'failed': 0,
+            'rejected': 0,
+            'batches': 0,
+        }
+        # Exception class only: details go to the log, not the metrics endpoint
+        self._last_error = None
+
+        with _registry_lock:
+            _registry[name] = self
+
+    def init_app(self, app, start=False):
+        """
+        Bind the queue to `app`. With `start`, the workers and poller start
+        now rather than on the first submit(), so work left in a durable
+        store by a previous process is picked up at boot.
+        """
+        self.app = app
+        if start:
+            self.start()
+
+    def configure(self, maxsize=None, **options):
+        """
+        Adjust tuning options (workers, batch_size, ...). A running queue is
+        stopped first, e.g. when another app is created in the same process;
+        init_app(start=True) starts it again.
+        """
+        if self._started:
+            self.stop()
+        for key, value in options.items():
+            if not hasattr(self, key):
+                raise AttributeError(f'Unknown option {key!r}')
+            setattr(self, key, value)
+        if maxsize is not None:
+            self._queue = queue.Queue(maxsize=maxsize)
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'{self.name}-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            if self.poll is not None:
+                thread = threading.Thread(target=self._poll_loop, name=f'{self.name}-poller', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def ensure_started(self):
+        if not self._started:
+            self.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        with self._lock:
+            self._threads = []
+            self._started = False
+
+    def submit(self, item):
+        """Enqueue an item without blocking; returns False if the queue is full"""
+        return self._put(item, attempt=1)
+
+    def submit_many(self, items):
+        return sum(1 for item in items if self.submit(item))
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        data.update({
+            'queue_depth': self._queue.qsize(),
+            'workers': self.workers,
+            'running': self._started,
+            'last_error': self._last_error,
+        })
+        return data
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _put(self, item, attempt):
+        self.ensure_started()
+        try:
+            self._queue.put_nowait((item, attempt))
+        except queue.Full:
+            self._count('rejected')
+            return False
+        if attempt == 1:
+            self._count('submitted')
+        return True
+
+    def _next_batch(self):
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                with self._app_context():
+                    failed = self.handler(items)
+                failed = list(failed or [])
+            except Exception as e:
+                logger.exception('%s: batch of %d failed', self.name, len(items))
+                self._last_error = type(e).__name__
+                failed = items
+            self._count('batches')
+            self._count('processed', len(items) - len(failed))
+
+            for item, attempt in batch:
+                if item in failed:
+                    self._retry(item, attempt)
+
+    def _retry(self, item, attempt):
+        if attempt >= self.max_attempts:
+            self._count('failed')
+            return
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        delay *= random.uniform(0.5, 1.0)
+        self._count('retried')
+        timer = threading.Timer(delay, self._put, args=(item, attempt + 1))
+        timer.daemon = True
+        timer.start()
+
+    def _poll_loop(self):
+        # The first poll also runs after poll_interval, once the app is set up
+        while not self._stopping.wait(self.poll_interval):
+            try:
+                with self._app_context():
+                    items = self.poll() or []
+                for item in items:
+                    self.submit(item)
+            except Exception as e:
+                logger.exception('%s: poll failed', self.name)
+                self._last_error = type(e).__name__
+
+    def _app_context(self):
+        if self.app is None:
+            raise RuntimeError(f'Background queue {self.name!r} is not bound to an app')
+        return self.app.app_context()
+
+
+def queue_stats():
+    """Stats for every background queue in this process"""
+    with _registry_lock:
+        queues = list(_registry.values())
+    return {q.name: q.stats() for q in queues}
@@ -0,0 +1,168 @@
+"""
+Bulk product import and export.
+
+Imports read a CSV or NDJSON request body as a stream, validate each row and
+insert valid rows with chunked multi-row INSERTs in one transaction, so a
+co-op can list hundreds of products in a single request. Exports stream a
+seller's catalog in keyset-ordered batches, so memory use does not grow
+with the catalog.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import insert, select
+from ..extensions import db
+from ..models.marketplace import Product
+from . import product_search
+
+IMPORT_FIELDS = ('name', 'description', 'price', 'quantity', 'unit', 'category', 'image_url')
+EXPORT_FIELDS = ('id',) + IMPORT_FIELDS + ('created_at',)
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class CatalogImportError(ValueError):
+    """The request body as a whole cannot be read"""
+
+
+class ImportTooLarge(CatalogImportError):
+    """More rows than the configured maximum"""
+
+
+def iter_rows(stream, mimetype):
+    """Yield product dicts (or None for unparseable lines) from a CSV or NDJSON byte stream"""
+    if mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+        return
+    if mimetype not in ('text/csv', 'application/csv'):
+        raise CatalogImportError('Send text/csv or application/x-ndjson')
+
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    if not reader.fieldnames or 'name' not in reader.fieldnames:
+        raise CatalogImportError(f"CSV header must include: {', '.join(IMPORT_FIELDS)}")
+    for row in reader:
+        yield {key: (value.strip() if isinstance(value, str) else value)
+               for key, value in row.items() if key in IMPORT_FIELDS}
+
+
+def validate_product(item, seller_id, now):
+    """Return (row, None) for a valid product or (None, error)"""
+    if not isinstance(item, dict):
+        return None, 'Row must be an object'
+    name = str(item.get('name') or '').strip()
+    if not name:
+        return None, 'name is required'
+    if len(name) > 100:
+        return None, 'name must be at most 100 characters'
+    try:
+        price = float(item.get('price'))
+        quantity = int(item.get('quantity'))
+    except (TypeError, ValueError):
+        return None, 'price must be a number and quantity an integer'
+    if price < 0 or quantity < 0:
+        return None, 'price and quantity must not be negative'
+    for field, limit in (('unit', 20), ('category', 50), ('image_url', 255)):
+        if item.get(field) and len(str(item[field])) > limit:
+            return None, f'{field} must be at most {limit} characters'
+    return {
+        'name': name,
+        'description': item.get('description') or None,
+        'price': price,
+        'quantity': quantity,
+        'unit': item.get('unit') or None,
+        'category': item.get('category') or None,
+        'image_url': item.get('image_url') or None,
+        'seller_id': seller_id,
+        'created_at': now,
+    }, None
+
+
+def _insert_chunk(rows):
+    """
+    Insert rows with one multi-row INSERT ... RETURNING id, and add them to
+    the search index. The ids are in the order of `rows`.
+    """
+    if not rows:
+        return []
+    ids = db.session.execute(
+        insert(Product).returning(Product.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    product_search.index_products(ids)
+    return ids
+
+
+def import_products(seller_id, items, chunk_size=500, max_rows=10000):
+    """
+    Validate and insert products for a seller. Returns a report with the new
+    id or the validation error for every row (numbered from 1); the caller
+    commits. Raises ImportTooLarge if there are more than `max_rows` rows.
+    """
+    now = datetime.utcnow()
+    results = []
+    chunk, chunk_indexes = [], []
+    for index, item in enumerate(items):
+        if index >= max_rows:
+            raise ImportTooLarge(f'Import exceeds {max_rows} rows')
+        row, error = validate_product(item, seller_id, now)
+        if error:
+            results.append({'row': index + 1, 'id': None, 'error': error})
+            continue
+        results.append({'row': index + 1, 'id': None})
+        chunk.append(row)
+        chunk_indexes.append(index)
+        if len(chunk) >= chunk_size:
+            for i, new_id in zip(chunk_indexes, _insert_chunk(chunk)):
+                results[i]['id'] = new_id
+            chunk, chunk_indexes = [], []
+    for i, new_id in zip(chunk_indexes, _insert_chunk(chunk)):
+        results[i]['id'] = new_id
+
+    created = sum(1 for r in results if r['id'] is not None)
+    return {'created': created, 'failed': len(results) - created, 'results': results}
+
+
+def export_products(seller_id, fmt, batch_size=500):
+    """Yield a seller's catalog as CSV or NDJSON text chunks, one batch of products at a time"""
+    columns = [getattr(Product, field) for field in EXPORT_FIELDS]
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        yield buffer.getvalue()
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(*columns)
+            .where(Product.seller_id == seller_id, Product.id > last_id)
+            .order_by(Product.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows(
+                [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+            )
+            yield buffer.getvalue()
+        else:
+            yield ''.join(
+                json.dumps({field: value.isoformat() if isinstance(value, datetime) else value
+                            for field, value in zip(EXPORT_FIELDS, row)}) + '\n'
+                for row in rows
+            )
+        if len(rows) < batch_size:
+            return
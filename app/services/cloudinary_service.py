@@ -1,34 +1,71 @@
 import cloudinary
+import cloudinary.exceptions
 import cloudinary.uploader
 import os
+import threading
+from flask import current_app
+from .http_client import get_client
+
+_config_lock = threading.Lock()
+_configured = False
+
+def _configure():
+    """Apply Cloudinary credentials once per process"""
+    global _configured
+    if _configured:
+        return
+    with _config_lock:
+        if not _configured:
+            cloudinary.config(
+                cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
+                api_key=os.getenv('CLOUDINARY_API_KEY'),
+                api_secret=os.getenv('CLOUDINARY_API_SECRET'),
+                # Points uploads at another Cloudinary-compatible server (e.g. app/utils/fake_cloudinary.py)
+                upload_prefix=os.getenv('CLOUDINARY_UPLOAD_PREFIX')
+            )
+            _configured = True
+
+def _is_outage(error):
+    """
+    The SDK raises a bare Error for network failures, unparseable responses
+    and unmapped 5xx statuses, and GeneralError for HTTP 500; client errors
+    (BadRequest for an invalid image, NotFound, ...) are other subclasses
+    and do not open the circuit.
+    """
+    return type(error) in (cloudinary.exceptions.Error, cloudinary.exceptions.GeneralError)
 
 class CloudinaryService:
     def __init__(self):
-        cloudinary.config(
-            cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
-            api_key=os.getenv('CLOUDINARY_API_KEY'),
-            api_secret=os.getenv('CLOUDINARY_API_SECRET')
-        )
+        _configure()
+        # The SDK keeps its own connection pool; the shared client adds
+        # circuit breaking and latency metrics around its calls
+        self.client = get_client('cloudinary', is_failure=_is_outage)
+        self.timeout = current_app.config['CLOUDINARY_TIMEOUT']
     
     def upload_image(self, file, folder='agrikonnect/products'):
         """Upload image to Cloudinary and return URL"""
+        return self.upload(file, folder)['secure_url']
+
+    def upload(self, file, folder='agrikonnect/products'):
+        """Upload image (a file object or path) to Cloudinary and return the upload result"""
         try:
-            result = cloudinary.uploader.upload(
+            return self.client.call(
+                cloudinary.uploader.upload,
                 file,
                 folder=folder,
                 resource_type='image',
+                timeout=self.timeout,
                 transformation=[
                     {'width': 800, 'height': 600, 'crop': 'limit'},
                     {'quality': 'auto'}
                 ]
             )
-            return result['secure_url']
         except Exception as e:
             raise Exception(f'Cloudinary upload failed: {str(e)}')
     
     def delete_image(self, public_id):
         """Delete image from Cloudinary"""
         try:
-            cloudinary.uploader.destroy(public_id)
+            self.client.call(cloudinary.uploader.destroy, public_id, timeout=self.timeout)
         except Exception as e:
             raise Exception(f'Cloudinary delete failed: {str(e)}')
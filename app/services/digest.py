@@ -0,0 +1,149 @@
+"""
+Email digests of unread notifications.
+
+Users who opt in (User.notification_digest = 'hourly' or 'daily') get one
+email per period listing the notifications that arrived since their last
+digest, instead of nothing at all. Every digest in a run is sent over a
+single SMTP connection (mail.connect()), opened only once there is a digest
+to send, and recipients are loaded and marked in batches so a run costs a
+few queries per NOTIFICATION_DIGEST_BATCH_SIZE users. Only the
+NOTIFICATION_DIGEST_MAX_ITEMS newest notifications per user are loaded; the
+total comes from the maintained unread counter.
+"""
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from markupsafe import escape
+from sqlalchemy import update, select, func, case
+from ..extensions import db, mail
+
+DIGEST_PERIODS = {
+    'hourly': timedelta(hours=1),
+    'daily': timedelta(days=1),
+}
+
+
+def send_due_digests(now=None):
+    """
+    Send a digest to every opted-in user whose period has elapsed and who has
+    unread notifications. Returns counts of users checked and emails sent.
+    """
+    from ..models import User, Notification
+
+    config = current_app.config
+    if config['NOTIFICATION_BACKEND'] != 'local':
+        return {'skipped': 'notifications are stored by the notification service'}
+
+    now = now or datetime.utcnow()
+    batch_size = config['NOTIFICATION_DIGEST_BATCH_SIZE']
+    due = db.or_(*(
+        db.and_(
+            User.notification_digest == frequency,
+            db.or_(User.last_digest_at.is_(None), User.last_digest_at <= now - period)
+        ) for frequency, period in DIGEST_PERIODS.items()
+    ))
+    # The maintained counter lets users with nothing unread be skipped without touching notifications
+    query = User.query.filter(due, User.is_active == True, User.unread_notifications_count > 0)
+
+    checked = sent = failed = 0
+    last_id = 0
+    with ExitStack() as stack:
+        connection = None
+        while True:
+            users = query.filter(User.id > last_id).order_by(User.id).limit(batch_size).all()
+            if not users:
+                break
+            last_id = users[-1].id
+            checked += len(users)
+
+            since = {
+                user.id: user.last_digest_at or now - DIGEST_PERIODS[user.notification_digest]
+                for user in users
+            }
+            pending = {user.id: [] for user in users}
+            # Number each user's new notifications, newest first, and keep the first MAX_ITEMS
+            ranked = select(
+                Notification.id,
+                func.row_number().over(
+                    partition_by=Notification.user_id,
+                    order_by=(Notification.last_activity_at.desc(), Notification.id.desc())
+                ).label('position')
+            ).where(
+                Notification.user_id.in_(list(since)),
+                Notification.is_read == False,
+                Notification.last_activity_at > case(since, value=Notification.user_id),
+                Notification.last_activity_at <= now
+            ).subquery()
+            rows = Notification.query.join(ranked, Notification.id == ranked.c.id) \
+                .filter(ranked.c.position <= config['NOTIFICATION_DIGEST_MAX_ITEMS']) \
+                .order_by(Notification.user_id, ranked.c.position).all()
+            for notification in rows:
+                pending[notification.user_id].append(notification)
+
+            done = []
+            for user in users:
+                if pending[user.id]:
+                    if connection is None:
+                        # Most runs have nothing to send: don't touch SMTP until one does
+                        connection = stack.enter_context(mail.connect())
+                    try:
+                        connection.send(_build_digest(user, pending[user.id]))
+                        sent += 1
+                    except Exception:
+                        # Leave last_digest_at alone so the next run retries this user
+                        failed += 1
+                        current_app.logger.exception('Failed to send notification digest to user %s', user.id)
+                        continue
+                done.append(user.id)
+
+            if done:
+                users_table = User.__table__
+                db.session.execute(
+                    update(users_table)
+                    .where(users_table.c.id.in_(done))
+                    .values(last_digest_at=now, updated_at=users_table.c.updated_at)
+                )
+            db.session.commit()
+
+    return {'checked': checked, 'sent': sent, 'failed': failed}
+
+
+def _build_digest(user, notifications):
+    config = current_app.config
+    frontend_url = config.get('FRONTEND_URL', 'http://localhost:5173')
+    shown = notifications[:config['NOTIFICATION_DIGEST_MAX_ITEMS']]
+    count = max(user.unread_notifications_count or 0, len(shown))
+    more = count - len(shown)
+
+    msg = Message(
+        subject=f"Agrikonnect - {count} unread notification{'s' if count != 1 else ''}",
+        sender=config.get('MAIL_DEFAULT_SENDER'),
+        recipients=[user.email]
+    )
+    lines = [f"- {n.message} ({frontend_url}{n.link or '/notifications'})" for n in shown]
+    items = ''.join(
+        f'<li><a href="{escape(frontend_url + (n.link or "/notifications"))}">{escape(n.message)}</a></li>'
+        for n in shown
+    )
+    if more:
+        lines.append(f'...and {more} more unread')
+        items += f'<li>...and {more} more unread</li>'
+
+    msg.body = '\n'.join([
+        f'Hello {user.first_name},',
+        '',
+        'Here is what you missed on Agrikonnect:',
+        *lines,
+        '',
+        f'See all notifications: {frontend_url}/notifications',
+    ])
+    msg.html = f"""
+    <h2>Your Agrikonnect digest</h2>
+    <p>Hello {escape(user.first_name)},</p>
+    <p>Here is what you missed:</p>
+    <ul>{items}</ul>
+    <p><a href="{escape(frontend_url)}/notifications">See all notifications</a></p>
+    <p>You can change how often you get these emails in your notification settings.</p>
+    """
+    return msg
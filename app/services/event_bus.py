@@ -0,0 +1,110 @@
+"""
+In-process publish/subscribe used to push live events (SSE) to clients
+connected to this worker.
+"""
+import queue
+import threading
+from collections import defaultdict
+
+from sqlalchemy import event
+
+
+class TooManySubscribers(Exception):
+    """Raised when this worker already holds its maximum number of live streams"""
+
+
+class Subscription:
+    """A subscriber's bounded mailbox on a single channel"""
+
+    def __init__(self, bus, channel, max_queue_size):
+        self.bus = bus
+        self.channel = channel
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            # Slow consumer: drop rather than block the publisher
+            self.dropped += 1
+            return False
+
+    def get(self, timeout=None):
+        """Return the next event, or None if nothing arrived within `timeout`"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    def __init__(self, max_queue_size=100):
+        self.max_queue_size = max_queue_size
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channel, max_subscribers=None):
+        """
+        Open a subscription on `channel`. If `max_subscribers` is given and this
+        process already has that many subscriptions, raise TooManySubscribers.
+        """
+        subscription = Subscription(self, channel, self.max_queue_size)
+        with self._lock:
+            if max_subscribers is not None:
+                total = sum(len(s) for s in self._subscribers.values())
+                if total >= max_subscribers:
+                    raise TooManySubscribers(f'{total} live streams open on this worker')
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, event):
+        """Deliver an event to every subscriber of `channel`; returns the number reached"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        return sum(1 for s in subscribers if s.put(event))
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+
+event_bus = EventBus()
+
+
+def publish_on_commit(session, channel, event_data):
+    """
+    Queue an event to be published once `session` commits; it is discarded
+    if the transaction rolls back, so clients never see uncommitted data.
+    """
+    session.info.setdefault('pending_events', []).append((channel, event_data))
+
+
+def _publish_pending(session):
+    for channel, event_data in session.info.pop('pending_events', []):
+        event_bus.publish(channel, event_data)
+
+
+def _discard_pending(session):
+    session.info.pop('pending_events', None)
+
+
+def init_app(db):
+    """Hook commit/rollback of the app's scoped session to publish queued events"""
+    if not event.contains(db.session, 'after_commit', _publish_pending):
+        event.listen(db.session, 'after_commit', _publish_pending)
+        event.listen(db.session, 'after_rollback', _discard_pending)
@@ -0,0 +1,183 @@
+"""
+Shared outbound HTTP clients.
+
+One ServiceClient per external target and process: a requests.Session with
+a keep-alive connection pool, default timeouts, a consecutive-failure
+circuit breaker and latency counters exposed through the metrics endpoint.
+"""
+import os
+import threading
+import time
+
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a target whose circuit breaker is open"""
+
+
+def is_transport_error(error):
+    """Default for ServiceClient.call: only network failures count against the circuit"""
+    return isinstance(error, (requests.RequestException, OSError))
+
+
+class ServiceClient:
+    def __init__(self, name, base_url='', timeout=(3.05, 10), pool_size=20,
+                 failure_threshold=5, reset_timeout=30.0, is_failure=is_transport_error):
+        """
+        `is_failure(error)` decides whether an exception raised by call()
+        means the target is failing (transport errors, 5xx) rather than that
+        the request was bad (e.g. a 4xx for a user's invalid upload).
+        """
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._stats = {'requests': 0, 'errors': 0, 'rejected': 0,
+                       'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0}
+
+    # Circuit breaker -----------------------------------------------------
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def _before_call(self):
+        with self._lock:
+            state = self._state()
+            if state == 'open' or (state == 'half_open' and self._trial_in_flight):
+                self._stats['rejected'] += 1
+                raise CircuitOpenError(f'{self.name} is unavailable (circuit open)')
+            if state == 'half_open':
+                self._trial_in_flight = True
+
+    def _after_call(self, started, ok):
+        elapsed_ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            self._trial_in_flight = False
+            stats = self._stats
+            stats['requests'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['last_ms'] = elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            if ok:
+                self._consecutive_failures = 0
+                self._opened_at = None
+                return
+            stats['errors'] += 1
+            self._consecutive_failures += 1
+            if self._opened_at is not None or self._consecutive_failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    # Calls -------------------------------------------------------------------
+
+    def request(self, method, path_or_url, **kwargs):
+        """
+        Send a request through the pooled session. Connection errors and 5xx
+        responses count as failures for the circuit breaker.
+        """
+        url = path_or_url if path_or_url.startswith('http') else f'{self.base_url}{path_or_url}'
+        kwargs.setdefault('timeout', self.timeout)
+        self._before_call()
+        started = time.monotonic()
+        ok = False
+        try:
+            response = self.session.request(method, url, **kwargs)
+            ok = response.status_code < 500
+            return response
+        except Exception as e:
+            ok = not isinstance(e, requests.RequestException)
+            raise
+        finally:
+            # Always runs, so a half-open trial is never left in flight
+            self._after_call(started, ok=ok)
+
+    def get(self, path_or_url, **kwargs):
+        return self.request('GET', path_or_url, **kwargs)
+
+    def post(self, path_or_url, **kwargs):
+        return self.request('POST', path_or_url, **kwargs)
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run a third-party SDK call under this target's circuit breaker and
+        metrics. Exceptions count as failures only if is_failure() says so.
+        """
+        self._before_call()
+        started = time.monotonic()
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        except Exception as e:
+            ok = not self.is_failure(e)
+            raise
+        finally:
+            self._after_call(started, ok=ok)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['state'] = self._state()
+        data['avg_ms'] = round(data['total_ms'] / data['requests'], 2) if data['requests'] else 0.0
+        for key in ('total_ms', 'max_ms', 'last_ms'):
+            data[key] = round(data[key], 2)
+        return data
+
+
+_clients = {}
+_clients_pid = os.getpid()
+_clients_lock = threading.Lock()
+
+
+def get_client(name, base_url='', **options):
+    """
+    Return the process-wide client for `name`, creating it on first use.
+    Defaults come from the HTTP_* settings of the current app.
+    """
+    global _clients_pid
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            # Forked worker: never share sockets with the parent process
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(name)
+        if client is None:
+            if has_app_context():
+                config = current_app.config
+                options.setdefault('timeout', (config['HTTP_CONNECT_TIMEOUT'], config['HTTP_READ_TIMEOUT']))
+                options.setdefault('pool_size', config['HTTP_POOL_SIZE'])
+                options.setdefault('failure_threshold', config['HTTP_CIRCUIT_FAILURE_THRESHOLD'])
+                options.setdefault('reset_timeout', config['HTTP_CIRCUIT_RESET_SECONDS'])
+            client = ServiceClient(name, base_url, **options)
+            _clients[name] = client
+        return client
+
+
+def client_stats():
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {c.name: c.stats() for c in clients}
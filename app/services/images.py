@@ -0,0 +1,176 @@
+"""
+Local image storage.
+
+Uploaded images are stored content-addressed under UPLOAD_FOLDER/images:
+the file name is the SHA-256 of the bytes, so the same picture uploaded
+twice is stored once and a stored file never changes. Fixed-size variants
+(VARIANTS) are written next to the original by a background worker pool,
+and /uploads/... serves the variant asked for with ?size=, falling back to
+the original until the variant exists.
+
+Listings that show many small images (avatars in feeds, comments, message
+lists) link to a variant with variant_url() instead of the full upload.
+"""
+import hashlib
+import io
+import os
+import re
+import tempfile
+from flask import current_app
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .background import BackgroundQueue
+
+# name -> (width, height, crop to fill); variants are WebP
+VARIANTS = {
+    'avatar': (128, 128, True),
+    'card': (640, 640, False),
+}
+SIZES = ('original',) + tuple(VARIANTS)
+# Pillow format -> stored extension
+FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+IMAGES_DIR = 'images'
+_stored_name = re.compile(r'^images/[0-9a-f]{2}/([0-9a-f]{64})\.(jpg|png|gif|webp)$')
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def upload_root():
+    """Absolute path of UPLOAD_FOLDER (relative paths are taken from the project root)"""
+    return os.path.abspath(os.path.join(current_app.root_path, '..', current_app.config['UPLOAD_FOLDER']))
+
+
+def _variant_name(filename, size):
+    """Relative path of a stored image's variant, or None if `filename` is not a stored image"""
+    match = _stored_name.match(filename)
+    if match is None or size not in VARIANTS:
+        return None
+    return f'{os.path.dirname(filename)}/{match.group(1)}_{size}.webp'
+
+
+def is_stored(filename):
+    """Whether an /uploads/ path is a content-addressed original (so never changes)"""
+    return bool(_stored_name.match(filename))
+
+
+def variant_url(url, size):
+    """URL of an image at `size`; URLs that are not stored uploads (e.g. Cloudinary) are returned as they are"""
+    if url and url.startswith('/uploads/') and _variant_name(url[len('/uploads/'):], size):
+        return f'{url}?size={size}'
+    return url
+
+
+def resolve(filename, size):
+    """
+    File to send for /uploads/<filename>?size=<size>: the variant when it
+    exists, else the original (queueing the variant to be made)
+    """
+    variant = _variant_name(filename, size)
+    if variant is None:
+        return filename
+    if os.path.exists(os.path.join(upload_root(), variant)):
+        return variant
+    if os.path.exists(os.path.join(upload_root(), filename)):
+        enqueue_variants(filename)
+    return filename
+
+
+def _write_atomic(path, data):
+    """Write to a temporary file and rename it into place, so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def store(data):
+    """
+    Store image bytes and return their /uploads/ URL. Raises InvalidImage if
+    the bytes are not a JPEG, PNG, GIF or WebP image.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+            image_format = image.format
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        raise InvalidImage('File is not a valid image')
+    if image_format not in FORMATS:
+        raise InvalidImage(f"Unsupported image format. Allowed: {', '.join(sorted(FORMATS.values()))}")
+
+    digest = hashlib.sha256(data).hexdigest()
+    filename = f'{IMAGES_DIR}/{digest[:2]}/{digest}.{FORMATS[image_format]}'
+    path = os.path.join(upload_root(), filename)
+    # Same content, same name: a re-upload is already stored
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    enqueue_variants(filename)
+    return f'/uploads/{filename}'
+
+
+def make_variants(filename):
+    """Write any missing variants of a stored image; returns the sizes written"""
+    root = upload_root()
+    missing = {size: _variant_name(filename, size) for size in VARIANTS}
+    missing = {size: name for size, name in missing.items()
+               if name and not os.path.exists(os.path.join(root, name))}
+    if not missing:
+        return []
+
+    quality = current_app.config['IMAGE_VARIANT_QUALITY']
+    with Image.open(os.path.join(root, filename)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        for size, name in missing.items():
+            width, height, crop = VARIANTS[size]
+            if crop:
+                variant = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            else:
+                variant = image.copy()
+                variant.thumbnail((width, height), Image.LANCZOS)
+            buffer = io.BytesIO()
+            variant.save(buffer, 'WEBP', quality=quality, method=4)
+            _write_atomic(os.path.join(root, name), buffer.getvalue())
+    return list(missing)
+
+
+def _make_variants_batch(filenames):
+    failed = []
+    for filename in set(filenames):
+        try:
+            make_variants(filename)
+        except Exception:
+            current_app.logger.exception('Failed to make image variants for %s', filename)
+            failed.append(filename)
+    return failed
+
+
+image_queue = BackgroundQueue('images', handler=_make_variants_batch)
+
+
+def init_app(app):
+    config = app.config
+    image_queue.configure(
+        maxsize=config['IMAGE_QUEUE_SIZE'],
+        workers=config['IMAGE_QUEUE_WORKERS'],
+        batch_size=4,
+        max_attempts=2
+    )
+    image_queue.init_app(app)
+
+
+def enqueue_variants(filename):
+    """Make a stored image's variants in the background"""
+    if not current_app.config['IMAGE_QUEUE_ENABLED']:
+        # Synchronous fallback (scripts, debugging)
+        make_variants(filename)
+        return
+    # A full queue only delays variants: the original is served and the next request re-queues them
+    image_queue.submit(filename)
@@ -0,0 +1,161 @@
+"""
+Inventory reservations for marketplace orders.
+
+Placing an order takes its units out of Product.quantity immediately with a
+conditional UPDATE (quantity = quantity - n WHERE quantity >= n), so two
+buyers can never both get the last unit and no stock count is read, changed
+in Python and written back. The order holds that stock until
+Order.reserved_until; unpaid orders past that point are expired by the
+expire-reservations job and their units put back, or sooner when an order
+for the product finds too little stock. Failed payments release
+immediately.
+
+A pending order holds stock exactly while reserved_until is set; releasing
+clears it, and paid orders keep the stock for good.
+Status changes go through order_states.transition(), single-statement
+UPDATEs guarded by the order's current status, so duplicate callbacks and
+the expiry job can race safely. Callers commit.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update, select
+from ..extensions import db
+from ..models.marketplace import Product, Order
+from . import order_states
+from .sales import record_sale
+
+products = Product.__table__
+orders = Order.__table__
+
+
+def reserve(product_id, quantity):
+    """Atomically take `quantity` units from stock; returns False if not enough are left"""
+    result = db.session.execute(
+        update(products)
+        .where(products.c.id == product_id, products.c.quantity >= quantity)
+        .values(quantity=products.c.quantity - quantity)
+    )
+    return result.rowcount == 1
+
+
+def restock(quantities):
+    """Put units back: `quantities` maps product_id -> units"""
+    # A fixed lock order keeps concurrent batches from deadlocking each other
+    for product_id, quantity in sorted(quantities.items()):
+        db.session.execute(
+            update(products)
+            .where(products.c.id == product_id)
+            .values(quantity=products.c.quantity + quantity)
+        )
+
+
+def reservation_deadline(seconds=None, now=None):
+    seconds = current_app.config['ORDER_RESERVATION_SECONDS'] if seconds is None else seconds
+    return (now or datetime.utcnow()) + timedelta(seconds=seconds)
+
+
+def extend(order_id, seconds):
+    """Hold a pending order's stock for at least `seconds` more (e.g. while an STK push is answered)"""
+    deadline = reservation_deadline(seconds)
+    return db.session.execute(
+        update(orders)
+        .where(orders.c.id == order_id, orders.c.status == 'pending',
+               orders.c.reserved_until.isnot(None), orders.c.reserved_until < deadline)
+        .values(reserved_until=deadline)
+    ).rowcount == 1
+
+
+def confirm(order_id):
+    """
+    Mark an order paid, keeping the stock it holds. If its reservation has
+    already lapsed (or it never had one), stock is taken again. Returns False
+    when that is no longer possible; the order is left unchanged. Every order
+    becomes paid here, so this is also where the seller's sales rollup is updated.
+    """
+    held = order_states.transition(
+        'paid', orders.c.id == order_id, orders.c.reserved_until.isnot(None),
+        from_statuses=('pending',), reason='Payment received'
+    )
+    if held:
+        record_sale(order_id)
+        return True
+
+    order = db.session.execute(
+        select(orders.c.status, orders.c.product_id, orders.c.quantity).where(orders.c.id == order_id)
+    ).first()
+    if order is None:
+        return False
+    if order.status in order_states.PAID_STATUSES:
+        return True
+    if not order_states.can_transition(order.status, 'paid') or not reserve(order.product_id, order.quantity):
+        return False
+    repaid = order_states.transition(
+        'paid', orders.c.id == order_id, values={'reserved_until': datetime.utcnow()},
+        reason='Payment received after the reservation lapsed'
+    )
+    if repaid:
+        record_sale(order_id)
+        return True
+    # Another transition got there first: give the units back
+    restock({order.product_id: order.quantity})
+    status = db.session.scalar(select(orders.c.status).where(orders.c.id == order_id))
+    return status in order_states.PAID_STATUSES
+
+
+def release(order_id, status='cancelled', reason=None):
+    """Move a pending order to `status` and return any stock it holds; False if it was not pending"""
+    held = order_states.transition(
+        status, orders.c.id == order_id, orders.c.reserved_until.isnot(None),
+        from_statuses=('pending',), values={'reserved_until': None},
+        returning=(orders.c.product_id, orders.c.quantity), reason=reason
+    )
+    if held:
+        restock({held[0].product_id: held[0].quantity})
+        return True
+    # Orders placed before reservations existed hold no stock
+    return bool(order_states.transition(
+        status, orders.c.id == order_id, orders.c.reserved_until.is_(None),
+        from_statuses=('pending',), reason=reason
+    ))
+
+
+def release_expired(now=None, batch_size=500, product_id=None):
+    """
+    Expire pending orders whose reservation has run out and return their units,
+    one batch per transaction; then expire unreserved pending orders (placed
+    before reservations existed) older than ORDER_RESERVATION_SECONDS.
+    Only orders for `product_id` if given. Returns the number of orders expired.
+    """
+    now = now or datetime.utcnow()
+    stale = now - timedelta(seconds=current_app.config['ORDER_RESERVATION_SECONDS'])
+    scope = () if product_id is None else (orders.c.product_id == product_id,)
+    total = 0
+    for due, holds_stock, reason in (
+        ((orders.c.reserved_until <= now, *scope), True, 'Reservation expired'),
+        ((orders.c.reserved_until.is_(None), orders.c.created_at <= stale, *scope), False, 'Unpaid order expired'),
+    ):
+        while True:
+            batch = db.session.scalars(
+                select(orders.c.id)
+                .where(orders.c.status == 'pending', *due)
+                .order_by(orders.c.reserved_until, orders.c.id)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            expired = order_states.transition(
+                'expired', orders.c.id.in_(batch), *due, from_statuses=('pending',),
+                values={'reserved_until': None}, returning=(orders.c.product_id, orders.c.quantity),
+                reason=reason
+            )
+            if holds_stock:
+                quantities = defaultdict(int)
+                for _, product_id, quantity in expired:
+                    quantities[product_id] += quantity
+                restock(quantities)
+            db.session.commit()
+            total += len(expired)
+            if len(batch) < batch_size:
+                break
+    return total
@@ -0,0 +1,194 @@
+"""
+Background image uploads to Cloudinary.
+
+Routes that accept an image spool it to MEDIA_SPOOL_FOLDER, record a
+MediaUpload in status 'queued' and return its id at once; a background
+queue uploads the file off the request thread and, when it completes, sets
+image_url on the post or product the upload is attached to (unless one was
+set meanwhile). An upload is claimed with a status-guarded UPDATE
+(queued -> uploading), so it is never sent twice at the same time. Failed
+uploads go back to 'queued' until MEDIA_UPLOAD_MAX_ATTEMPTS is reached, and
+a poller re-enqueues uploads left queued (full queue, restarted process) or
+stuck uploading (worker died) for longer than MEDIA_QUEUE_LEASE_SECONDS.
+
+Statuses: queued -> uploading -> done | failed
+"""
+import os
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from werkzeug.utils import secure_filename
+from ..extensions import db
+from ..models.media_upload import MediaUpload
+from ..models.post import Post
+from ..models.marketplace import Product
+from .background import BackgroundQueue
+
+uploads = MediaUpload.__table__
+
+# target_type -> model whose image_url an upload fills in
+TARGETS = {'post': Post, 'product': Product}
+
+
+class UploadFailed(Exception):
+    pass
+
+
+def spool_root():
+    """Absolute path of MEDIA_SPOOL_FOLDER (relative paths are taken from the project root)"""
+    return os.path.abspath(os.path.join(current_app.root_path, '..', current_app.config['MEDIA_SPOOL_FOLDER']))
+
+
+def spool(file, owner_id, folder):
+    """
+    Save an uploaded file to the spool and record it. The caller commits and
+    then calls enqueue_upload().
+    """
+    extension = os.path.splitext(secure_filename(file.filename or ''))[1].lower()
+    root = spool_root()
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, f'{uuid.uuid4().hex}{extension}')
+    # Copies the request stream to disk in chunks
+    file.save(path)
+    media = MediaUpload(owner_id=owner_id, folder=folder, spool_path=path)
+    db.session.add(media)
+    db.session.flush()
+    return media
+
+
+def get_unattached(media_id, owner_id):
+    """An upload of `owner_id`'s not yet attached to anything, or None"""
+    return MediaUpload.query.filter_by(id=media_id, owner_id=owner_id, target_type=None) \
+        .filter(MediaUpload.status != 'failed').first()
+
+
+def _set_image(target_type, target_id, url):
+    model = TARGETS[target_type]
+    db.session.execute(
+        update(model).where(model.id == target_id, model.image_url.is_(None)).values(image_url=url)
+    )
+
+
+def attach(media_id, target_type, target_id):
+    """
+    Have an upload fill in a post's or product's image_url; done at once if
+    the upload has already finished. The caller commits.
+    """
+    if target_type not in TARGETS:
+        raise ValueError(f'Unknown upload target: {target_type}')
+    # One UPDATE, so it serializes with the worker's completion UPDATE on the
+    # same row: whichever runs second sees the other's change
+    row = db.session.execute(
+        update(uploads)
+        .where(uploads.c.id == media_id)
+        .values(target_type=target_type, target_id=target_id)
+        .returning(uploads.c.status, uploads.c.url)
+    ).first()
+    if row is not None and row.status == 'done':
+        _set_image(target_type, target_id, row.url)
+
+
+def _remove_spool(path):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def upload(media_id):
+    """Upload one queued file; raises UploadFailed if it failed and will be retried"""
+    from .cloudinary_service import CloudinaryService
+
+    claimed = db.session.execute(
+        update(uploads)
+        .where(uploads.c.id == media_id, uploads.c.status == 'queued')
+        .values(status='uploading', attempts=uploads.c.attempts + 1, updated_at=datetime.utcnow())
+        .returning(uploads.c.spool_path, uploads.c.folder, uploads.c.attempts)
+    ).first()
+    db.session.commit()
+    if claimed is None:
+        return
+
+    try:
+        result = CloudinaryService().upload(claimed.spool_path, folder=claimed.folder)
+    except Exception as e:
+        retry = claimed.attempts < current_app.config['MEDIA_UPLOAD_MAX_ATTEMPTS']
+        db.session.execute(
+            update(uploads).where(uploads.c.id == media_id, uploads.c.status == 'uploading')
+            .values(status='queued' if retry else 'failed', error=str(e)[:255])
+        )
+        db.session.commit()
+        if retry:
+            raise UploadFailed(str(e))
+        current_app.logger.warning('Upload %s failed after %s attempts: %s', media_id, claimed.attempts, e)
+        _remove_spool(claimed.spool_path)
+        return
+
+    done = db.session.execute(
+        update(uploads).where(uploads.c.id == media_id, uploads.c.status == 'uploading')
+        .values(status='done', url=result['secure_url'], public_id=result.get('public_id'),
+                spool_path=None, error=None)
+        .returning(uploads.c.target_type, uploads.c.target_id)
+    ).first()
+    if done is not None and done.target_type:
+        _set_image(done.target_type, done.target_id, result['secure_url'])
+    db.session.commit()
+    _remove_spool(claimed.spool_path)
+
+
+def _upload_batch(media_ids):
+    failed = []
+    for media_id in media_ids:
+        try:
+            upload(media_id)
+        except UploadFailed:
+            failed.append(media_id)
+    return failed
+
+
+def _claim_stale():
+    """Re-enqueue uploads left queued, or stuck uploading, longer than the lease"""
+    config = current_app.config
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=config['MEDIA_QUEUE_LEASE_SECONDS'])
+    stale = select(uploads.c.id).where(
+        uploads.c.status.in_(('queued', 'uploading')), uploads.c.updated_at <= cutoff
+    ).limit(config['MEDIA_QUEUE_SIZE'] // 2 or 1)
+    claimed = db.session.execute(
+        update(uploads)
+        .where(uploads.c.id.in_(stale.scalar_subquery()), uploads.c.status.in_(('queued', 'uploading')))
+        .values(status='queued', updated_at=now)
+        .returning(uploads.c.id)
+    ).scalars().all()
+    db.session.commit()
+    return claimed
+
+
+media_queue = BackgroundQueue('media', handler=_upload_batch, poll=_claim_stale)
+
+
+def init_app(app):
+    config = app.config
+    media_queue.configure(
+        maxsize=config['MEDIA_QUEUE_SIZE'],
+        workers=config['MEDIA_QUEUE_WORKERS'],
+        max_attempts=config['MEDIA_UPLOAD_MAX_ATTEMPTS'],
+        poll_interval=config['MEDIA_QUEUE_POLL_SECONDS']
+    )
+    # Start the poller now: uploads left queued or uploading by a previous process are retried
+    media_queue.init_app(app, start=config['MEDIA_QUEUE_ENABLED'])
+
+
+def enqueue_upload(media_id):
+    """Schedule the upload of a committed, queued MediaUpload"""
+    if not current_app.config['MEDIA_QUEUE_ENABLED']:
+        # Synchronous fallback (scripts, debugging); retries come from the poller
+        try:
+            upload(media_id)
+        except UploadFailed:
+            pass
+        return
+    # If the queue is full the poller picks the upload up after the lease
+    media_queue.submit(media_id)
@@ -1,7 +1,21 @@
-import requests
 import base64
 from datetime import datetime
 import os
+import threading
+import time
+from .http_client import get_client
+
+# Refresh the OAuth token this many seconds before Daraja says it expires
+TOKEN_EXPIRY_MARGIN = 60
+
+_token_cache = {}
+_token_lock = threading.Lock()
+
+
+def clear_token_cache():
+    with _token_lock:
+        _token_cache.clear()
+
 
 class MpesaService:
     def __init__(self):
@@ -11,28 +25,50 @@ class MpesaService:
         self.passkey = os.getenv('MPESA_PASSKEY')
         self.callback_url = os.getenv('MPESA_CALLBACK_URL')
         env = os.getenv('MPESA_ENVIRONMENT', 'sandbox')
-        self.base_url = 'https://sandbox.safaricom.co.ke' if env == 'sandbox' else 'https://api.safaricom.co.ke'
+        default_url = 'https://sandbox.safaricom.co.ke' if env == 'sandbox' else 'https://api.safaricom.co.ke'
+        # MPESA_BASE_URL points the service at another Daraja-compatible server (e.g. app/utils/fake_daraja.py)
+        self.base_url = os.getenv('MPESA_BASE_URL', default_url)
+        self.client = get_client('mpesa', self.base_url)
 
-    def get_token(self):
-        url = f'{self.base_url}/oauth/v1/generate?grant_type=client_credentials'
-        auth = base64.b64encode(f'{self.consumer_key}:{self.consumer_secret}'.encode()).decode()
-        headers = {'Authorization': f'Basic {auth}'}
-        try:
-            response = requests.get(url, headers=headers)
-            return response.json().get('access_token')
-        except:
-            return None
+    @property
+    def configured(self):
+        return bool(self.consumer_key and self.consumer_secret)
+
+    def get_token(self, refresh=False):
+        """
+        OAuth access token, cached per process until shortly before the
+        `expires_in` Daraja returns, so checkouts do not pay for a token round trip
+        """
+        key = (self.base_url, self.consumer_key)
+        with _token_lock:
+            cached = _token_cache.get(key)
+            if cached and not refresh and cached[1] > time.monotonic():
+                return cached[0]
+
+            url = '/oauth/v1/generate?grant_type=client_credentials'
+            auth = base64.b64encode(f'{self.consumer_key}:{self.consumer_secret}'.encode()).decode()
+            headers = {'Authorization': f'Basic {auth}'}
+            try:
+                data = self.client.get(url, headers=headers).json()
+            except Exception:
+                return None
+            token = data.get('access_token')
+            if not token:
+                return None
+            expires_in = int(data.get('expires_in') or 0)
+            if expires_in > TOKEN_EXPIRY_MARGIN:
+                _token_cache[key] = (token, time.monotonic() + expires_in - TOKEN_EXPIRY_MARGIN)
+            return token
 
     def stk_push(self, phone, amount, order_id):
         token = self.get_token()
         if not token:
             return {'success': False, 'message': 'Failed to get token'}
-        
+
         timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
         password = base64.b64encode(f'{self.shortcode}{self.passkey}{timestamp}'.encode()).decode()
-        
-        url = f'{self.base_url}/mpesa/stkpush/v1/processrequest'
-        headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+
+        url = '/mpesa/stkpush/v1/processrequest'
         payload = {
             'BusinessShortCode': self.shortcode,
             'Password': password,
@@ -46,9 +82,39 @@ class MpesaService:
             'AccountReference': f'Order{order_id}',
             'TransactionDesc': f'Payment for Order {order_id}'
         }
-        
+
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.client.post(url, json=payload, headers=self._headers(token))
+            if response.status_code == 401:
+                # Token revoked or expired early: the request was rejected, so it is safe to resend once
+                token = self.get_token(refresh=True)
+                if not token:
+                    return {'success': False, 'message': 'Failed to get token'}
+                response = self.client.post(url, json=payload, headers=self._headers(token))
             return response.json()
-        except:
+        except Exception:
             return {'success': False, 'message': 'STK Push failed'}
+
+    def stk_query(self, checkout_request_id):
+        """Ask Daraja for the outcome of an STK push (used when its callback never arrived)"""
+        token = self.get_token()
+        if not token:
+            return {'success': False, 'message': 'Failed to get token'}
+
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        password = base64.b64encode(f'{self.shortcode}{self.passkey}{timestamp}'.encode()).decode()
+        payload = {
+            'BusinessShortCode': self.shortcode,
+            'Password': password,
+            'Timestamp': timestamp,
+            'CheckoutRequestID': checkout_request_id
+        }
+        try:
+            response = self.client.post('/mpesa/stkpushquery/v1/query', json=payload, headers=self._headers(token))
+            return response.json()
+        except Exception:
+            return {'success': False, 'message': 'STK Query failed'}
+
+    @staticmethod
+    def _headers(token):
+        return {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
@@ -0,0 +1,131 @@
+"""
+Asynchronous delivery of notifications to the notification microservice.
+
+Notifications are first written to the notification_outbox table, then
+their ids are handed to a background queue that delivers them in batches.
+Failed deliveries are rescheduled in the outbox with exponential backoff,
+and a poller re-enqueues rows that are due (retries, or rows left behind by
+a crashed worker once their lease has expired).
+"""
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import insert, select, update, func
+from ..extensions import db
+from ..models.notification_outbox import NotificationOutbox
+from .background import BackgroundQueue
+
+
+def _deliver_batch(outbox_ids):
+    from .notification_service import NotificationService
+
+    config = current_app.config
+    rows = NotificationOutbox.query.filter(
+        NotificationOutbox.id.in_(outbox_ids),
+        NotificationOutbox.status == 'pending'
+    ).all()
+    if not rows:
+        return []
+    errors = NotificationService.deliver_many([row.payload for row in rows])
+    now = datetime.utcnow()
+    for row, error in zip(rows, errors):
+        if error is None:
+            db.session.delete(row)
+            continue
+        row.attempts += 1
+        row.last_error = error
+        if row.attempts >= config['NOTIFICATION_MAX_ATTEMPTS']:
+            row.status = 'failed'
+        else:
+            delay = min(
+                config['NOTIFICATION_BACKOFF_MAX_SECONDS'],
+                config['NOTIFICATION_BACKOFF_SECONDS'] * 2 ** (row.attempts - 1)
+            )
+            row.next_attempt_at = now + timedelta(seconds=delay)
+    db.session.commit()
+    # Retries are scheduled through the outbox, not the in-memory queue
+    return []
+
+
+def _claim_due():
+    """Lease due outbox rows to this process and return their ids"""
+    config = current_app.config
+    now = datetime.utcnow()
+    due = select(NotificationOutbox.id).where(
+        NotificationOutbox.status == 'pending',
+        NotificationOutbox.next_attempt_at <= now
+    ).order_by(NotificationOutbox.next_attempt_at).limit(config['NOTIFICATION_QUEUE_SIZE'] // 2 or 1)
+    claimed = db.session.execute(
+        update(NotificationOutbox)
+        .where(NotificationOutbox.id.in_(due.scalar_subquery()), NotificationOutbox.next_attempt_at <= now)
+        .values(next_attempt_at=now + timedelta(seconds=config['NOTIFICATION_LEASE_SECONDS']))
+        .returning(NotificationOutbox.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.session.commit()
+    return claimed
+
+
+notification_queue = BackgroundQueue('notifications', handler=_deliver_batch, poll=_claim_due)
+
+# (monotonic time, counts) of the last outbox_stats() query
+_outbox_stats = None
+
+
+def init_app(app):
+    config = app.config
+    notification_queue.configure(
+        maxsize=config['NOTIFICATION_QUEUE_SIZE'],
+        workers=config['NOTIFICATION_QUEUE_WORKERS'],
+        batch_size=config['NOTIFICATION_BATCH_SIZE'],
+        poll_interval=config['NOTIFICATION_OUTBOX_POLL_SECONDS']
+    )
+    # Start the poller now: outbox rows left by a previous process are claimed again
+    notification_queue.init_app(app, start=config['NOTIFICATION_QUEUE_ENABLED'])
+
+
+def enqueue_notifications(payloads):
+    """
+    Persist notification payloads to the outbox and schedule their delivery.
+    Returns the outbox ids. Rows that do not fit in the in-memory queue are
+    picked up by the poller once their lease expires.
+    """
+    payloads = list(payloads)
+    if not payloads:
+        return []
+
+    config = current_app.config
+    now = datetime.utcnow()
+    lease_until = now + timedelta(seconds=config['NOTIFICATION_LEASE_SECONDS'])
+    ids = db.session.execute(
+        insert(NotificationOutbox).returning(NotificationOutbox.id),
+        [{
+            'payload': payload,
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt_at': lease_until,
+            'created_at': now,
+            'updated_at': now,
+        } for payload in payloads]
+    ).scalars().all()
+    db.session.commit()
+
+    if not config['NOTIFICATION_QUEUE_ENABLED']:
+        # Synchronous fallback (scripts, debugging): deliver in-line
+        _deliver_batch(ids)
+        return ids
+
+    notification_queue.submit_many(ids)
+    return ids
+
+
+def outbox_stats():
+    """Outbox row counts by status, recomputed at most every METRICS_OUTBOX_CACHE_SECONDS"""
+    global _outbox_stats
+    now = time.monotonic()
+    if _outbox_stats is None or now - _outbox_stats[0] >= current_app.config['METRICS_OUTBOX_CACHE_SECONDS']:
+        rows = db.session.execute(
+            select(NotificationOutbox.status, func.count()).group_by(NotificationOutbox.status)
+        ).all()
+        _outbox_stats = (now, {status: count for status, count in rows})
+    return _outbox_stats[1]
@@ -1,10 +1,43 @@
-import requests
 import os
 from typing import Optional
+from flask import current_app
+from ..extensions import db
+from .http_client import get_client
+from .images import variant_url
 
 NOTIFICATION_SERVICE_URL = os.getenv('NOTIFICATION_SERVICE_URL', 'http://localhost:5001')
 
 class NotificationService:
+    @staticmethod
+    def build_payload(
+        user_id: int,
+        notification_type: str,
+        title: str,
+        message: str,
+        link: Optional[str] = None,
+        actor_id: Optional[int] = None,
+        actor_name: Optional[str] = None,
+        actor_avatar: Optional[str] = None,
+        related_id: Optional[int] = None,
+        action: Optional[str] = None
+    ):
+        """
+        `related_id` and `action` let the local backend fold repeated actions on
+        the same object into one notification ("X and 3 others liked your post")
+        """
+        return {
+            'user_id': user_id,
+            'type': notification_type,
+            'title': title,
+            'message': message,
+            'link': link,
+            'actor_id': actor_id,
+            'actor_name': actor_name,
+            'actor_avatar': variant_url(actor_avatar, 'avatar'),
+            'related_id': related_id,
+            'action': action
+        }
+
     @staticmethod
     def send_notification(
         user_id: int,
@@ -14,44 +47,72 @@ class NotificationService:
         link: Optional[str] = None,
         actor_id: Optional[int] = None,
         actor_name: Optional[str] = None,
-        actor_avatar: Optional[str] = None
+        actor_avatar: Optional[str] = None,
+        related_id: Optional[int] = None,
+        action: Optional[str] = None
     ):
-        """Send notification to notification microservice"""
+        """Store a notification in the configured backend (NOTIFICATION_BACKEND)"""
+        return NotificationService.send_many([NotificationService.build_payload(
+            user_id, notification_type, title, message, link, actor_id, actor_name, actor_avatar,
+            related_id, action
+        )])
+
+    @staticmethod
+    def send_many(payloads: list):
+        """
+        Store several notifications with one write: a bulk insert for the local
+        backend, a single outbox insert for the remote one. Commits the session.
+        """
+        from .notification_store import get_notification_store
         try:
-            response = requests.post(
-                f'{NOTIFICATION_SERVICE_URL}/api/notifications',
-                json={
-                    'user_id': user_id,
-                    'type': notification_type,
-                    'title': title,
-                    'message': message,
-                    'link': link,
-                    'actor_id': actor_id,
-                    'actor_name': actor_name,
-                    'actor_avatar': actor_avatar
-                },
-                timeout=5
-            )
-            return response.status_code == 201
-        except Exception as e:
-            print(f"Failed to send notification: {e}")
+            return get_notification_store().add_many(payloads) > 0
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Failed to store notifications')
             return False
-    
+
+    @staticmethod
+    def deliver_many(payloads: list):
+        """
+        Deliver payloads to the microservice batch endpoint in one request.
+        Returns a list aligned with `payloads`: None for each delivered item,
+        otherwise an error string.
+        """
+        client = get_client(
+            'notifications', current_app.config.get('NOTIFICATION_SERVICE_URL', NOTIFICATION_SERVICE_URL)
+        )
+        try:
+            response = client.post('/api/notifications/batch', json=payloads)
+            if response.status_code != 201:
+                return [f'HTTP {response.status_code}'] * len(payloads)
+            errors = [None] * len(payloads)
+            for result in response.json().get('results', []):
+                if result.get('id') is None:
+                    errors[result['index']] = result.get('error', 'Rejected')
+            return errors
+        except Exception as e:
+            return [str(e)] * len(payloads)
+
     @staticmethod
-    def notify_post_like(post_author_id: int, liker_id: int, liker_name: str, post_id: int):
+    def notify_post_like(post_author_id: int, liker_id: int, liker_name: str, post_id: int,
+                         liker_avatar: Optional[str] = None):
         """Notify when someone likes a post"""
         return NotificationService.send_notification(
             user_id=post_author_id,
-            notification_type='post_like',
+            notification_type='like',
             title='New Like',
             message=f'{liker_name} liked your post',
             link=f'/posts/{post_id}',
             actor_id=liker_id,
-            actor_name=liker_name
+            actor_name=liker_name,
+            actor_avatar=liker_avatar,
+            related_id=post_id,
+            action='liked your post'
         )
     
     @staticmethod
-    def notify_comment(post_author_id: int, commenter_id: int, commenter_name: str, post_id: int):
+    def notify_comment(post_author_id: int, commenter_id: int, commenter_name: str, post_id: int,
+                       commenter_avatar: Optional[str] = None):
         """Notify when someone comments on a post"""
         return NotificationService.send_notification(
             user_id=post_author_id,
@@ -60,7 +121,10 @@ class NotificationService:
             message=f'{commenter_name} commented on your post',
             link=f'/posts/{post_id}',
             actor_id=commenter_id,
-            actor_name=commenter_name
+            actor_name=commenter_name,
+            actor_avatar=commenter_avatar,
+            related_id=post_id,
+            action='commented on your post'
         )
     
     @staticmethod
@@ -103,11 +167,26 @@ class NotificationService:
     @staticmethod
     def notify_community_post(community_id: int, member_ids: list, author_name: str, post_id: int):
         """Notify community members of new post"""
-        for member_id in member_ids:
-            NotificationService.send_notification(
+        return NotificationService.send_many([
+            NotificationService.build_payload(
                 user_id=member_id,
                 notification_type='community_post',
                 title='New Community Post',
                 message=f'{author_name} posted in your community',
-                link=f'/posts/{post_id}'
-            )
+                link=f'/posts/{post_id}',
+                related_id=post_id
+            ) for member_id in member_ids
+        ])
+
+    @staticmethod
+    def notify_message(receiver_id: int, sender_id: int, sender_name: str):
+        """Notify when someone sends a direct message"""
+        return NotificationService.send_notification(
+            user_id=receiver_id,
+            notification_type='message',
+            title='New Message',
+            message=f'{sender_name} sent you a message',
+            link=f'/messages/{sender_id}',
+            actor_id=sender_id,
+            actor_name=sender_name
+        )
@@ -0,0 +1,262 @@
+"""
+Notification storage behind one interface.
+
+NOTIFICATION_BACKEND selects where notifications live:
+
+- ``local``: the API's own ``notifications`` table (coalescing, maintained
+  unread counter, live SSE events)
+- ``remote``: the notification microservice; writes go through the durable
+  outbox and are delivered in batches, reads are proxied over HTTP
+
+Routes and NotificationService only talk to get_notification_store(), so a
+notification is written to exactly one backend.
+"""
+from datetime import datetime
+from flask import current_app
+from ..extensions import db
+from ..utils.pagination import encode_cursor, decode_cursor
+from .http_client import get_client
+
+
+class NotificationStoreError(Exception):
+    """The selected backend could not complete the operation"""
+
+
+class NotificationStore:
+    """
+    Payloads are dicts with user_id, type, title, message and optional link,
+    related_id, actor_id, actor_name, actor_avatar. A payload with an
+    `action` (e.g. 'liked your post') may be coalesced with similar ones
+    when the backend supports it. Write methods commit.
+    """
+
+    def add(self, payload):
+        return self.add_many([payload])
+
+    def add_many(self, payloads):
+        raise NotImplementedError
+
+    def list(self, user_id, limit=20, cursor=None, unread_only=False):
+        """Return {'notifications': [...], 'next_cursor': str|None, 'unread_count': int}"""
+        raise NotImplementedError
+
+    def replay(self, user_id, last_event_id, limit):
+        """
+        (event id, notification) pairs published after the SSE event
+        `last_event_id`, oldest first, for resuming live streams
+        """
+        return []
+
+    def unread_count(self, user_id):
+        raise NotImplementedError
+
+    def mark_read(self, user_id, notification_id):
+        raise NotImplementedError
+
+    def mark_all_read(self, user_id):
+        raise NotImplementedError
+
+    def delete(self, user_id, notification_id):
+        raise NotImplementedError
+
+
+class LocalNotificationStore(NotificationStore):
+    @staticmethod
+    def _actor(payload):
+        if not payload.get('actor_id'):
+            return None
+        return {
+            'id': payload['actor_id'],
+            'name': payload.get('actor_name'),
+            'profile_image': payload.get('actor_avatar'),
+        }
+
+    def add_many(self, payloads):
+        from ..models.notification import Notification
+
+        payloads = list(payloads)
+        if len(payloads) == 1:
+            payload = payloads[0]
+            actor = self._actor(payload)
+            if payload.get('action') and actor:
+                Notification.create_or_coalesce(
+                    user_id=payload['user_id'],
+                    type=payload['type'],
+                    title=payload['title'],
+                    action=payload['action'],
+                    actor=actor,
+                    related_id=payload.get('related_id'),
+                    link=payload.get('link')
+                )
+            else:
+                Notification.create(
+                    user_id=payload['user_id'],
+                    type=payload['type'],
+                    title=payload['title'],
+                    message=payload['message'],
+                    link=payload.get('link'),
+                    related_id=payload.get('related_id'),
+                    actors=[actor] if actor else None
+                )
+        elif payloads:
+            Notification.create_many([{
+                'user_id': p['user_id'],
+                'type': p['type'],
+                'title': p['title'],
+                'message': p['message'],
+                'link': p.get('link'),
+                'related_id': p.get('related_id'),
+                'actors': [self._actor(p)] if self._actor(p) else None,
+            } for p in payloads])
+        db.session.commit()
+        return len(payloads)
+
+    def list(self, user_id, limit=20, cursor=None, unread_only=False):
+        from ..models.notification import Notification
+
+        before = decode_cursor(cursor, datetime, int)
+        if cursor and before is None:
+            raise ValueError('Invalid cursor')
+
+        query = Notification.query.filter_by(user_id=user_id)
+        if unread_only:
+            query = query.filter_by(is_read=False)
+        if before:
+            query = query.filter(db.or_(
+                Notification.last_activity_at < before[0],
+                db.and_(Notification.last_activity_at == before[0], Notification.id < before[1])
+            ))
+
+        # Most recent activity first: a coalesced notification moves back to
+        # the top (and is pushed to live streams) when someone else is folded in
+        notifications = query.order_by(
+            Notification.last_activity_at.desc(), Notification.id.desc()
+        ).limit(limit + 1).all()
+        has_more = len(notifications) > limit
+        notifications = notifications[:limit]
+
+        return {
+            'notifications': [n.to_dict() for n in notifications],
+            'next_cursor': encode_cursor(notifications[-1].last_activity_at, notifications[-1].id) if has_more else None,
+            'unread_count': Notification.unread_count(user_id)
+        }
+
+    def replay(self, user_id, last_event_id, limit):
+        from ..models.notification import Notification
+        query = Notification.query.filter(Notification.user_id == user_id)
+        after = decode_cursor(last_event_id, datetime, int)
+        if after:
+            query = query.filter(db.or_(
+                Notification.last_activity_at > after[0],
+                db.and_(Notification.last_activity_at == after[0], Notification.id > after[1])
+            ))
+        elif last_event_id.isdigit():
+            # Event ids were plain notification ids before coalescing kept created_at
+            query = query.filter(Notification.id > int(last_event_id))
+        else:
+            return []
+        missed = query.order_by(Notification.last_activity_at.asc(), Notification.id.asc()).limit(limit).all()
+        return [(n.event_id, n.to_dict()) for n in missed]
+
+    def unread_count(self, user_id):
+        from ..models.notification import Notification
+        return Notification.unread_count(user_id)
+
+    def mark_read(self, user_id, notification_id):
+        from ..models.notification import Notification
+        found = Notification.mark_read(notification_id, user_id)
+        db.session.commit()
+        return found
+
+    def mark_all_read(self, user_id):
+        from ..models.notification import Notification
+        changed = Notification.mark_all_read(user_id)
+        db.session.commit()
+        return changed
+
+    def delete(self, user_id, notification_id):
+        from ..models.notification import Notification
+        found = Notification.delete_for_user(notification_id, user_id)
+        db.session.commit()
+        return found
+
+
+class RemoteNotificationStore(NotificationStore):
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    @property
+    def client(self):
+        return get_client('notifications', self.base_url)
+
+    def _request(self, method, path, **kwargs):
+        try:
+            response = self.client.request(method, path, **kwargs)
+        except Exception as e:
+            raise NotificationStoreError(str(e))
+        if response.status_code == 404:
+            return None
+        if response.status_code == 400:
+            raise ValueError(response.json().get('error', 'Bad request'))
+        if response.status_code >= 400:
+            raise NotificationStoreError(f'Notification service returned HTTP {response.status_code}')
+        return response.json()
+
+    @staticmethod
+    def _normalize(item):
+        """Map the microservice representation onto the in-app one"""
+        actor = item.pop('actor', None)
+        item.setdefault('related_id', None)
+        item['actor_count'] = 1
+        item['actors'] = [{
+            'id': actor['id'],
+            'name': actor.get('name'),
+            'profile_image': actor.get('avatar'),
+        }] if actor else []
+        return item
+
+    def add_many(self, payloads):
+        from .notification_queue import enqueue_notifications
+        return len(enqueue_notifications(payloads))
+
+    def list(self, user_id, limit=20, cursor=None, unread_only=False):
+        params = {'per_page': limit, 'unread_only': 'true' if unread_only else 'false'}
+        if cursor:
+            params['cursor'] = cursor
+        data = self._request('GET', f'/api/notifications/{user_id}', params=params) or {}
+        return {
+            'notifications': [self._normalize(n) for n in data.get('notifications', [])],
+            'next_cursor': data.get('next_cursor'),
+            'unread_count': data.get('unread_count', 0)
+        }
+
+    def unread_count(self, user_id):
+        data = self._request('GET', f'/api/notifications/{user_id}/unread-count')
+        return (data or {}).get('count', 0)
+
+    def mark_read(self, user_id, notification_id):
+        data = self._request('PUT', f'/api/notifications/{notification_id}/read', params={'user_id': user_id})
+        return data is not None
+
+    def mark_all_read(self, user_id):
+        data = self._request('PUT', f'/api/notifications/{user_id}/read-all')
+        return (data or {}).get('updated', 0)
+
+    def delete(self, user_id, notification_id):
+        data = self._request('DELETE', f'/api/notifications/{notification_id}', params={'user_id': user_id})
+        return data is not None
+
+
+def init_app(app):
+    backend = app.config['NOTIFICATION_BACKEND']
+    if backend == 'local':
+        store = LocalNotificationStore()
+    elif backend == 'remote':
+        store = RemoteNotificationStore(app.config['NOTIFICATION_SERVICE_URL'])
+    else:
+        raise ValueError(f"NOTIFICATION_BACKEND must be 'local' or 'remote', not {backend!r}")
+    app.extensions['notification_store'] = store
+
+
+def get_notification_store():
+    return current_app.extensions['notification_store']
@@ -0,0 +1,86 @@
+"""
+Order status state machine.
+
+    pending -> paid -> shipped -> delivered
+    pending -> cancelled (payment failed) | expired (reservation ran out)
+    expired -> paid (payment arrived late and the stock could be taken again)
+
+Every status change goes through transition(): one UPDATE per status the
+target can be reached from, guarded by that status and covering any number
+of orders, plus one multi-row INSERT into order_events recording each move.
+A move the state machine does not allow simply matches no rows, so
+concurrent callers (callbacks, the expiry job, sellers) cannot apply a
+change twice or skip a state. Callers commit.
+"""
+from datetime import datetime
+from sqlalchemy import insert, update
+from ..extensions import db
+from ..models.marketplace import Order, OrderEvent
+
+TRANSITIONS = {
+    'pending': ('paid', 'cancelled', 'expired'),
+    'paid': ('shipped',),
+    'shipped': ('delivered',),
+    'delivered': (),
+    'cancelled': (),
+    'expired': ('paid',),
+}
+STATUSES = tuple(TRANSITIONS)
+# The order has been paid for, whatever has happened to it since
+PAID_STATUSES = ('paid', 'shipped', 'delivered')
+# Statuses a seller sets by hand
+FULFILMENT_STATUSES = ('shipped', 'delivered')
+
+orders = Order.__table__
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def can_transition(from_status, to_status):
+    return to_status in TRANSITIONS.get(from_status, ())
+
+
+def sources(to_status):
+    """Statuses an order can move to `to_status` from"""
+    if to_status not in TRANSITIONS:
+        raise InvalidTransition(f'Unknown order status: {to_status}')
+    return [status for status, targets in TRANSITIONS.items() if to_status in targets]
+
+
+def transition(to_status, *criteria, from_statuses=None, values=None, returning=(), reason=None, actor_id=None):
+    """
+    Move every order matching `criteria` whose status allows it to `to_status`
+    (optionally only from `from_statuses`), setting any extra column `values`.
+    Returns one row per order moved, with its id and the `returning` columns.
+    """
+    allowed = [status for status in sources(to_status) if from_statuses is None or status in from_statuses]
+    now = datetime.utcnow()
+    moved, events = [], []
+    for from_status in allowed:
+        rows = db.session.execute(
+            update(orders)
+            .where(orders.c.status == from_status, *criteria)
+            .values(status=to_status, **(values or {}))
+            .returning(orders.c.id, *returning)
+        ).all()
+        moved.extend(rows)
+        events.extend(
+            {'order_id': row.id, 'from_status': from_status, 'to_status': to_status,
+             'reason': reason, 'actor_id': actor_id, 'created_at': now}
+            for row in rows
+        )
+    if events:
+        db.session.execute(insert(OrderEvent), events)
+    return moved
+
+
+def record(order_id, from_status, to_status, reason=None, actor_id=None):
+    """Log a status an order was given outside transition(), e.g. when it is placed"""
+    db.session.add(OrderEvent(order_id=order_id, from_status=from_status, to_status=to_status,
+                              reason=reason, actor_id=actor_id))
+
+
+def history(order_id):
+    return OrderEvent.query.filter_by(order_id=order_id).order_by(OrderEvent.id).all()
@@ -0,0 +1,111 @@
+"""
+Asynchronous M-Pesa STK pushes.
+
+initiate_payment stores a Payment in status 'queued' and returns its id at
+once; a background queue sends the STK push off the request thread. A
+payment is claimed with a status-guarded UPDATE (queued -> sending) before
+the push, so the same payment is never pushed twice, and a poller
+re-enqueues payments left 'queued' (full queue, restarted process) once
+they are older than MPESA_QUEUE_LEASE_SECONDS.
+
+Statuses: queued -> sending -> pending (awaiting the Daraja callback) ->
+completed | failed.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from ..extensions import db
+from ..models.marketplace import Payment
+from .background import BackgroundQueue
+
+payments = Payment.__table__
+
+
+def _push_batch(payment_ids):
+    for payment_id in payment_ids:
+        _push(payment_id)
+    # A push that may have reached Safaricom is never retried automatically:
+    # that would prompt the buyer twice. Failed payments can be re-initiated.
+    return []
+
+
+def _push(payment_id):
+    from . import inventory
+    from .mpesa_service import MpesaService
+
+    claimed = db.session.execute(
+        update(payments)
+        .where(payments.c.id == payment_id, payments.c.status == 'queued')
+        .values(status='sending')
+        .returning(payments.c.order_id, payments.c.amount, payments.c.phone_number)
+    ).first()
+    db.session.commit()
+    if claimed is None:
+        return
+
+    mpesa = MpesaService()
+    if not mpesa.configured and current_app.config['MPESA_DEMO_MODE']:
+        # No Daraja credentials: accept the payment so the marketplace can be demoed
+        if inventory.confirm(claimed.order_id):
+            values = {'status': 'completed', 'transaction_date': datetime.utcnow()}
+        else:
+            values = {'status': 'failed', 'failure_reason': 'Insufficient quantity'}
+    else:
+        result = mpesa.stk_push(claimed.phone_number, claimed.amount, claimed.order_id)
+        if result.get('ResponseCode') == '0':
+            values = {
+                'status': 'pending',
+                'checkout_request_id': result.get('CheckoutRequestID'),
+                'merchant_request_id': result.get('MerchantRequestID'),
+            }
+        else:
+            reason = (result.get('errorMessage') or result.get('ResponseDescription')
+                      or result.get('message') or 'STK push rejected')
+            values = {'status': 'failed', 'failure_reason': str(reason)[:255]}
+            current_app.logger.warning('STK push for payment %s failed: %s', payment_id, reason)
+
+    db.session.execute(
+        update(payments).where(payments.c.id == payment_id, payments.c.status == 'sending').values(**values)
+    )
+    db.session.commit()
+
+
+def _claim_stale():
+    """Re-enqueue payments that have waited in 'queued' longer than the lease"""
+    now = datetime.utcnow()
+    lease = timedelta(seconds=current_app.config['MPESA_QUEUE_LEASE_SECONDS'])
+    stale = select(payments.c.id).where(
+        payments.c.status == 'queued', payments.c.updated_at <= now - lease
+    ).limit(current_app.config['MPESA_QUEUE_SIZE'] // 2 or 1)
+    claimed = db.session.execute(
+        update(payments)
+        .where(payments.c.id.in_(stale.scalar_subquery()), payments.c.status == 'queued')
+        .values(updated_at=now)
+        .returning(payments.c.id)
+    ).scalars().all()
+    db.session.commit()
+    return claimed
+
+
+payment_queue = BackgroundQueue('mpesa', handler=_push_batch, poll=_claim_stale)
+
+
+def init_app(app):
+    config = app.config
+    payment_queue.configure(
+        maxsize=config['MPESA_QUEUE_SIZE'],
+        workers=config['MPESA_QUEUE_WORKERS'],
+        poll_interval=config['MPESA_QUEUE_POLL_SECONDS']
+    )
+    # Start the poller now: payments left queued by a previous process are pushed
+    payment_queue.init_app(app, start=config['MPESA_QUEUE_ENABLED'])
+
+
+def enqueue_payment(payment_id):
+    """Schedule the STK push for a committed, queued payment"""
+    if not current_app.config['MPESA_QUEUE_ENABLED']:
+        # Synchronous fallback (scripts, debugging)
+        _push(payment_id)
+        return
+    # If the queue is full the poller picks the payment up after the lease
+    payment_queue.submit(payment_id)
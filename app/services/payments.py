@@ -0,0 +1,139 @@
+"""
+Settling M-Pesa payments from Daraja results.
+
+A result can arrive as a callback, possibly retried by the provider and
+possibly out of order, or from the reconcile-payments job, which queries
+Daraja for payments whose callback never came. Both paths go through
+settle(). Only a payment still awaiting its result changes: that is a
+status-guarded UPDATE, so a result is applied at most once and stock is
+never confirmed or released twice. Callbacks are also recorded in
+payment_callbacks, keyed by CheckoutRequestID, so duplicates are
+acknowledged without touching payments at all.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from ..extensions import db
+from ..models.marketplace import Payment, PaymentCallback
+from ..utils.sql import dialect_insert
+from . import inventory
+
+payments = Payment.__table__
+
+
+def settle(payment_id, result_code, receipt=None, description=None):
+    """
+    Apply a Daraja result code to a payment awaiting it and confirm or release
+    the order's stock. Returns False if the payment was already settled.
+    """
+    if result_code == 0:
+        values = {'status': 'completed', 'mpesa_receipt_number': receipt, 'transaction_date': datetime.utcnow()}
+    else:
+        values = {'status': 'failed', 'failure_reason': (description or f'ResultCode {result_code}')[:255]}
+    row = db.session.execute(
+        update(payments)
+        .where(payments.c.id == payment_id, payments.c.status.in_(('sending', 'pending')))
+        .values(**values)
+        .returning(payments.c.order_id)
+    ).first()
+    if row is None:
+        return False
+
+    if result_code != 0:
+        inventory.release(row.order_id, status='cancelled', reason=values['failure_reason'])
+    elif not inventory.confirm(row.order_id):
+        # Paid after the reservation lapsed and the stock was sold to someone else
+        current_app.logger.error('Order %s paid but out of stock; refund required', row.order_id)
+        inventory.release(row.order_id, status='cancelled', reason='Paid but out of stock; refund required')
+    return True
+
+
+def process_callback(callback):
+    """
+    Handle a Daraja stkCallback body. Returns (http_status, message).
+    The callback record and the settlement commit together, so a callback that
+    fails half-way is processed again when the provider retries it.
+    """
+    checkout_request_id = callback.get('CheckoutRequestID')
+    if not checkout_request_id:
+        return 400, 'Missing CheckoutRequestID'
+
+    payment_id = db.session.query(Payment.id).filter_by(checkout_request_id=checkout_request_id).scalar()
+    if payment_id is None:
+        return 404, 'Payment not found'
+
+    try:
+        result_code = int(callback.get('ResultCode'))
+    except (TypeError, ValueError):
+        return 400, 'Invalid ResultCode'
+
+    recorded = db.session.execute(
+        dialect_insert(PaymentCallback.__table__)
+        .values(checkout_request_id=checkout_request_id, result_code=result_code,
+                payload=callback, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=['checkout_request_id'])
+        .returning(PaymentCallback.__table__.c.id)
+    ).first()
+    if recorded is None:
+        db.session.rollback()
+        return 200, 'Callback already processed'
+
+    items = {item.get('Name'): item.get('Value')
+             for item in callback.get('CallbackMetadata', {}).get('Item', [])}
+    settle(payment_id, result_code, receipt=items.get('MpesaReceiptNumber'),
+           description=callback.get('ResultDesc'))
+    db.session.commit()
+    return 200, 'Callback processed'
+
+
+def reconcile_pending(now=None):
+    """
+    Settle payments whose callback is overdue by querying Daraja, a batch at a
+    time. Payments stuck in 'sending' (worker died mid-push) have no
+    CheckoutRequestID to query and are failed; unanswered pushes are failed
+    after MPESA_PAYMENT_TIMEOUT_SECONDS. The batch stops early while the
+    Daraja circuit breaker is open.
+    """
+    from .mpesa_service import MpesaService
+
+    config = current_app.config
+    now = now or datetime.utcnow()
+    overdue = now - timedelta(seconds=config['MPESA_RECONCILE_AFTER_SECONDS'])
+    timeout = now - timedelta(seconds=config['MPESA_PAYMENT_TIMEOUT_SECONDS'])
+    stats = {'checked': 0, 'settled': 0, 'waiting': 0, 'deferred': 0}
+
+    stuck = Payment.query.filter(
+        Payment.status == 'sending', Payment.updated_at <= now - timedelta(seconds=config['MPESA_QUEUE_LEASE_SECONDS'])
+    ).limit(config['MPESA_RECONCILE_BATCH_SIZE']).all()
+    for payment in stuck:
+        stats['settled'] += settle(payment.id, -1, description='STK push outcome unknown')
+    db.session.commit()
+
+    due = Payment.query.filter(
+        Payment.status == 'pending', Payment.updated_at <= overdue
+    ).order_by(Payment.updated_at).limit(config['MPESA_RECONCILE_BATCH_SIZE']).all()
+    if not due:
+        return stats
+
+    mpesa = MpesaService()
+    for index, payment in enumerate(due):
+        if mpesa.client.state == 'open':
+            # Daraja is failing: don't spend the scheduler thread waiting on timeouts
+            stats['deferred'] = len(due) - index
+            current_app.logger.warning('M-Pesa circuit open, %s overdue payments left for the next run', len(due) - index)
+            break
+        stats['checked'] += 1
+        result = mpesa.stk_query(payment.checkout_request_id)
+        if result.get('ResultCode') is not None:
+            stats['settled'] += settle(payment.id, int(result['ResultCode']), description=result.get('ResultDesc'))
+        elif payment.created_at and payment.created_at <= timeout:
+            stats['settled'] += settle(payment.id, -1, description='No result from M-Pesa before timeout')
+        else:
+            # Still being processed (or Daraja unreachable): look again next run
+            stats['waiting'] += 1
+            db.session.execute(
+                update(payments).where(payments.c.id == payment.id, payments.c.status == 'pending')
+                .values(updated_at=now)
+            )
+        db.session.commit()
+    return stats
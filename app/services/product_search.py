@@ -0,0 +1,214 @@
+"""
+Full-text product search.
+
+Product name, category, unit and description are indexed in a
+`product_search` table: an FTS5 virtual table (rowid = product id) on SQLite,
+a weighted tsvector with a GIN index on PostgreSQL. Neither can be declared as
+a model, so the table is created by create_index() (and the migration), and
+kept in sync by the routes that add and remove products, in the same
+transaction, via index_products() and remove_products().
+
+search() returns one ranked page with the total, and category and price
+facets, from the same match.
+"""
+import re
+import sqlalchemy as sa
+from sqlalchemy import func, select
+from ..extensions import db
+from ..models.marketplace import Product
+
+# Price facet bucket lower bounds (KES); the last bucket is open-ended
+PRICE_BUCKETS = (0, 100, 500, 1000, 5000)
+MAX_TERMS = 8
+
+# bm25() column weights, in the FTS5 column order below
+_FTS5_WEIGHTS = '10.0, 4.0, 2.0, 1.0'
+_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5("
+    "name, category, unit, description, tokenize='porter unicode61 remove_diacritics 2')",
+)
+_POSTGRES_DDL = (
+    'CREATE TABLE IF NOT EXISTS product_search ('
+    'product_id INTEGER PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE, '
+    'document TSVECTOR NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS idx_product_search_document ON product_search USING gin (document)',
+)
+_POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('english', p.name), 'A') || "
+    "setweight(to_tsvector('english', coalesce(p.category, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(p.unit, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(p.description, '')), 'D')"
+)
+
+_sqlite_index = sa.table('product_search', sa.column('rowid'))
+_postgres_index = sa.table('product_search', sa.column('product_id'), sa.column('document'))
+
+
+def _dialect():
+    name = db.session.get_bind().dialect.name
+    if name not in ('sqlite', 'postgresql'):
+        raise NotImplementedError(f'Product search is not supported on {name}')
+    return name
+
+
+def _exists():
+    return sa.inspect(db.session.get_bind()).has_table('product_search')
+
+
+def create_index():
+    """Create the search index if it is missing and fill it from existing products"""
+    if _exists():
+        return False
+    ddl = _SQLITE_DDL if _dialect() == 'sqlite' else _POSTGRES_DDL
+    for statement in ddl:
+        db.session.execute(sa.text(statement))
+    rebuild_index()
+    db.session.commit()
+    return True
+
+
+def rebuild_index():
+    """Re-index every product; the caller commits"""
+    db.session.execute(sa.text('DELETE FROM product_search'))
+    if _dialect() == 'sqlite':
+        db.session.execute(sa.text(
+            'INSERT INTO product_search (rowid, name, category, unit, description) '
+            'SELECT id, name, category, unit, description FROM products'
+        ))
+    else:
+        db.session.execute(sa.text(
+            f'INSERT INTO product_search (product_id, document) SELECT p.id, {_POSTGRES_DOCUMENT} FROM products p'
+        ))
+
+
+def index_products(product_ids):
+    """(Re-)index products by id; the caller commits"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    ids = sa.bindparam('ids', expanding=True)
+    if _dialect() == 'sqlite':
+        remove_products(product_ids)
+        statement = sa.text(
+            'INSERT INTO product_search (rowid, name, category, unit, description) '
+            'SELECT id, name, category, unit, description FROM products WHERE id IN :ids'
+        )
+    else:
+        statement = sa.text(
+            f'INSERT INTO product_search (product_id, document) SELECT p.id, {_POSTGRES_DOCUMENT} '
+            'FROM products p WHERE p.id IN :ids '
+            'ON CONFLICT (product_id) DO UPDATE SET document = excluded.document'
+        )
+    db.session.execute(statement.bindparams(ids), {'ids': product_ids})
+
+
+def remove_products(product_ids):
+    """Drop products from the index; the caller commits"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    key = 'rowid' if _dialect() == 'sqlite' else 'product_id'
+    db.session.execute(
+        sa.text(f'DELETE FROM product_search WHERE {key} IN :ids').bindparams(sa.bindparam('ids', expanding=True)),
+        {'ids': product_ids}
+    )
+
+
+def parse_terms(q):
+    """Words of a free-text query, so user input never reaches the match syntax"""
+    return re.findall(r'\w+', (q or '').lower())[:MAX_TERMS]
+
+
+def _matches(terms):
+    """
+    Subquery of (product_id, score) for products matching every term, by
+    prefix. bm25() only works in a plain query over the FTS table, so ranking
+    happens here and the caller joins products to it.
+    """
+    if _dialect() == 'sqlite':
+        return (
+            select(_sqlite_index.c.rowid.label('product_id'),
+                   sa.literal_column(f'-bm25(product_search, {_FTS5_WEIGHTS})').label('score'))
+            .select_from(_sqlite_index)
+            .where(sa.text('product_search MATCH :match').bindparams(
+                match=' '.join(f'"{term}"*' for term in terms)))
+            .subquery('matches')
+        )
+    query = func.to_tsquery('english', ' & '.join(f'{term}:*' for term in terms))
+    return (
+        select(_postgres_index.c.product_id, func.ts_rank_cd(_postgres_index.c.document, query).label('score'))
+        .where(_postgres_index.c.document.op('@@')(query))
+        .subquery('matches')
+    )
+
+
+def _price_bucket():
+    bounds = list(PRICE_BUCKETS)
+    return sa.case(
+        *[(Product.price < upper, lower) for lower, upper in zip(bounds, bounds[1:])],
+        else_=bounds[-1]
+    )
+
+
+def search(q, category=None, seller_id=None, min_price=None, max_price=None, page=1, per_page=20):
+    """
+    In-stock products matching every word of `q`, best match first.
+    Facets count the matches per category and price bucket, ignoring the
+    category and price filters so they can be used to change them.
+    """
+    terms = parse_terms(q)
+    if not terms:
+        return {'products': [], 'facets': {'category': [], 'price': []}, 'total': 0}
+
+    matches = _matches(terms)
+    conditions = [Product.quantity > 0]
+    if seller_id:
+        conditions.append(Product.seller_id == seller_id)
+
+    filters = list(conditions)
+    if category:
+        filters.append(Product.category == category)
+    if min_price is not None:
+        filters.append(Product.price >= min_price)
+    if max_price is not None:
+        filters.append(Product.price <= max_price)
+
+    matched = select(Product).join(matches, matches.c.product_id == Product.id).where(*filters)
+    rows = db.session.execute(
+        matched.add_columns(matches.c.score, func.count().over().label('total'))
+        .order_by(matches.c.score.desc(), Product.id)
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    ).all()
+    if rows:
+        total = rows[0].total
+    elif page > 1:
+        # A page past the end has no rows to carry the window count
+        total = db.session.execute(select(func.count()).select_from(matched.subquery())).scalar()
+    else:
+        total = 0
+
+    bucket = _price_bucket().label('bucket')
+    facet_rows = db.session.execute(
+        select(Product.category, bucket, func.count())
+        .join(matches, matches.c.product_id == Product.id)
+        .where(*conditions)
+        .group_by(Product.category, bucket)
+    ).all()
+
+    categories, prices = {}, dict.fromkeys(PRICE_BUCKETS, 0)
+    for facet_category, facet_bucket, count in facet_rows:
+        categories[facet_category] = categories.get(facet_category, 0) + count
+        prices[facet_bucket] += count
+    upper_bounds = PRICE_BUCKETS[1:] + (None,)
+
+    return {
+        'products': [dict(product.to_dict(), score=rank) for product, rank, _ in rows],
+        'facets': {
+            'category': [{'category': name, 'count': count}
+                         for name, count in sorted(categories.items(), key=lambda item: -item[1])],
+            'price': [{'min': lower, 'max': upper, 'count': prices[lower]}
+                      for lower, upper in zip(PRICE_BUCKETS, upper_bounds)],
+        },
+        'total': total,
+    }
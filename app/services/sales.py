@@ -0,0 +1,103 @@
+"""
+Seller sales rollups.
+
+Every order that becomes paid adds one upsert to sales_daily_rollups
+(product, day): orders, units and revenue. Seller dashboards read these
+small pre-aggregated rows instead of scanning and grouping raw orders on
+each request.
+"""
+from datetime import datetime
+from sqlalchemy import select, func
+from ..extensions import db
+from ..models.marketplace import Product, Order, SalesRollup
+from ..utils.sql import dialect_insert
+
+rollups = SalesRollup.__table__
+
+
+def record_sale(order_id, day=None):
+    """Add a newly paid order to its product's rollup for `day` (default: today, UTC)"""
+    order = db.session.execute(
+        select(Order.product_id, Order.quantity, Order.total_price, Product.seller_id)
+        .join(Product, Product.id == Order.product_id)
+        .where(Order.id == order_id)
+    ).first()
+    if order is None:
+        return
+    insert = dialect_insert(rollups).values(
+        seller_id=order.seller_id,
+        product_id=order.product_id,
+        day=day or datetime.utcnow().date(),
+        orders_count=1,
+        units_sold=order.quantity,
+        revenue=order.total_price
+    )
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=['product_id', 'day'],
+        set_={
+            'orders_count': rollups.c.orders_count + insert.excluded.orders_count,
+            'units_sold': rollups.c.units_sold + insert.excluded.units_sold,
+            'revenue': rollups.c.revenue + insert.excluded.revenue,
+        }
+    ))
+
+
+def seller_sales(seller_id, start, end):
+    """
+    Totals, revenue per day and revenue per product for a seller between two
+    dates (inclusive), from the rollup table
+    """
+    in_range = (rollups.c.seller_id == seller_id, rollups.c.day >= start, rollups.c.day <= end)
+    totals = (func.sum(rollups.c.orders_count), func.sum(rollups.c.units_sold), func.sum(rollups.c.revenue))
+
+    daily = db.session.execute(
+        select(rollups.c.day, *totals).where(*in_range).group_by(rollups.c.day).order_by(rollups.c.day)
+    ).all()
+    per_product = db.session.execute(
+        select(rollups.c.product_id, Product.name, *totals)
+        .join(Product, Product.id == rollups.c.product_id)
+        .where(*in_range)
+        .group_by(rollups.c.product_id, Product.name)
+        .order_by(func.sum(rollups.c.revenue).desc())
+    ).all()
+
+    return {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'totals': {
+            'orders': sum(row[1] for row in daily),
+            'units': sum(row[2] for row in daily),
+            'revenue': round(sum(row[3] for row in daily), 2),
+        },
+        'daily': [
+            {'day': day.isoformat(), 'orders': orders, 'units': units, 'revenue': round(revenue, 2)}
+            for day, orders, units, revenue in daily
+        ],
+        'products': [
+            {'product_id': product_id, 'name': name, 'orders': orders, 'units': units, 'revenue': round(revenue, 2)}
+            for product_id, name, orders, units, revenue in per_product
+        ],
+    }
+
+
+def seller_stock(seller_id, low_stock=5):
+    """Seller's products with available stock and units held by unpaid orders"""
+    reserved = (
+        select(Order.product_id, func.sum(Order.quantity).label('reserved'))
+        .join(Product, Product.id == Order.product_id)
+        .where(Product.seller_id == seller_id, Order.status == 'pending', Order.reserved_until.isnot(None))
+        .group_by(Order.product_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.quantity, Product.unit, Product.price,
+               func.coalesce(reserved.c.reserved, 0))
+        .outerjoin(reserved, reserved.c.product_id == Product.id)
+        .where(Product.seller_id == seller_id)
+        .order_by(Product.quantity, Product.id)
+    ).all()
+    return [
+        {'product_id': product_id, 'name': name, 'available': quantity, 'reserved': int(held),
+         'unit': unit, 'price': price, 'low_stock': quantity <= low_stock}
+        for product_id, name, quantity, unit, price, held in rows
+    ]
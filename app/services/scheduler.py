@@ -0,0 +1,125 @@
+"""
+Minimal in-process scheduler for periodic maintenance jobs.
+
+Jobs run sequentially on one daemon thread inside an application context.
+SCHEDULER_ENABLED may be set on every web worker: before each run a
+scheduler claims it in the scheduled_jobs table (a conditional upsert that
+only succeeds while the job is due and moves next_run_at one interval
+ahead), so each run happens in exactly one process. A run that takes longer
+than its interval can overlap the next one. `flask jobs run <name>` runs a
+job at once, without claiming it.
+"""
+from datetime import datetime, timedelta
+import logging
+import os
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, name, func, interval_key, description=''):
+        self.name = name
+        self.func = func
+        self.interval_key = interval_key
+        self.description = description
+        self.next_run = None
+        self.last_result = None
+        self.last_error = None
+
+
+class Scheduler:
+    def __init__(self):
+        self.app = None
+        self.jobs = {}
+        self._thread = None
+        self._stopping = threading.Event()
+        self.identity = f'{socket.gethostname()}:{os.getpid()}'
+
+    def init_app(self, app):
+        self.app = app
+        if app.config.get('SCHEDULER_ENABLED'):
+            self.start()
+
+    def job(self, name, interval_key, description=''):
+        """Register a job; its interval (seconds) is read from app.config[interval_key]"""
+        def decorator(func):
+            self.jobs[name] = Job(name, func, interval_key, description or (func.__doc__ or '').strip())
+            return func
+        return decorator
+
+    def run(self, name):
+        """Run a job once in the current application context"""
+        job = self.jobs[name]
+        try:
+            job.last_result = job.func()
+            job.last_error = None
+            return job.last_result
+        except Exception as e:
+            job.last_error = str(e)
+            raise
+
+    def claim(self, name, now=None):
+        """
+        Take the run of job `name` that is due for this process. Returns None
+        if claimed, else the time another process's claim makes it due again.
+        """
+        from ..extensions import db
+        from ..models.scheduled_job import scheduled_jobs as jobs
+        from ..utils.sql import dialect_insert
+
+        now = now or datetime.utcnow()
+        values = {'next_run_at': now + timedelta(seconds=self._interval(self.jobs[name])),
+                  'claimed_by': self.identity, 'claimed_at': now}
+        insert = dialect_insert(jobs).values(name=name, **values)
+        claimed = db.session.execute(
+            insert.on_conflict_do_update(index_elements=['name'], set_=values, where=jobs.c.next_run_at <= now)
+            .returning(jobs.c.name)
+        ).first()
+        db.session.commit()
+        if claimed:
+            return None
+        return db.session.scalar(db.select(jobs.c.next_run_at).where(jobs.c.name == name))
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        now = time.monotonic()
+        for job in self.jobs.values():
+            job.next_run = now + self._interval(job)
+        self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _interval(self, job):
+        return float(self.app.config[job.interval_key])
+
+    def _loop(self):
+        while not self._stopping.wait(1.0):
+            now = time.monotonic()
+            for job in list(self.jobs.values()):
+                if job.next_run is None or now < job.next_run:
+                    continue
+                try:
+                    with self.app.app_context():
+                        due_at = self.claim(job.name)
+                        if due_at is not None:
+                            # Another process has this run: look again when the job is next due
+                            job.next_run = time.monotonic() + max(1.0, (due_at - datetime.utcnow()).total_seconds())
+                            continue
+                        result = self.run(job.name)
+                    logger.info('Job %s finished: %s', job.name, result)
+                except Exception:
+                    logger.exception('Job %s failed', job.name)
+                job.next_run = time.monotonic() + self._interval(job)
+
+
+scheduler = Scheduler()
@@ -0,0 +1,117 @@
+"""
+Local stand-in for Cloudinary's upload API, for development and tests.
+
+Implements the image upload and destroy endpoints used by CloudinaryService
+and serves uploaded images back from the returned secure_url:
+
+    python -m app.utils.fake_cloudinary --port 8090
+    CLOUDINARY_CLOUD_NAME=demo CLOUDINARY_API_KEY=x CLOUDINARY_API_SECRET=y \\
+        CLOUDINARY_UPLOAD_PREFIX=http://localhost:8090 flask run
+
+In-process:
+
+    with FakeCloudinary(upload_delay=0.5) as cloud:
+        os.environ['CLOUDINARY_UPLOAD_PREFIX'] = cloud.url
+        ...
+        cloud.uploads, cloud.fail_next = 2
+
+`upload_delay` simulates a slow upload; `fail_next` makes that many uploads
+fail with a 500 error.
+"""
+import argparse
+import threading
+import time
+import uuid
+from flask import Flask, request, jsonify, Response
+from werkzeug.serving import make_server
+
+
+class FakeCloudinary:
+    def __init__(self, host='127.0.0.1', port=0, upload_delay=0.0):
+        self.upload_delay = upload_delay
+        self.fail_next = 0
+        self.uploads = []
+        self.destroyed = []
+        self.files = {}
+        self._lock = threading.Lock()
+        self.app = self._create_app()
+        self.server = make_server(host, port, self.app, threaded=True)
+        self.url = f'http://{host}:{self.server.server_port}'
+        self._thread = None
+
+    def _create_app(self):
+        app = Flask('fake_cloudinary')
+
+        @app.route('/v1_1/<cloud_name>/image/upload', methods=['POST'])
+        def upload(cloud_name):
+            if not request.form.get('api_key') or not request.form.get('signature'):
+                return jsonify({'error': {'message': 'Must supply api_key'}}), 401
+            file = request.files.get('file')
+            if file is None:
+                return jsonify({'error': {'message': 'Missing required parameter - file'}}), 400
+            if self.upload_delay:
+                time.sleep(self.upload_delay)
+            with self._lock:
+                if self.fail_next > 0:
+                    self.fail_next -= 1
+                    return jsonify({'error': {'message': 'Simulated server error'}}), 500
+
+            data = file.read()
+            folder = request.form.get('folder', '')
+            public_id = f"{folder}/{uuid.uuid4().hex[:20]}".lstrip('/')
+            extension = file.filename.rsplit('.', 1)[-1].lower() if '.' in (file.filename or '') else 'jpg'
+            path = f'{cloud_name}/image/upload/v1/{public_id}.{extension}'
+            with self._lock:
+                self.files[path] = (data, file.mimetype or 'application/octet-stream')
+                self.uploads.append({'public_id': public_id, 'folder': folder, 'bytes': len(data),
+                                     'params': request.form.to_dict()})
+            return jsonify({
+                'public_id': public_id,
+                'version': 1,
+                'format': extension,
+                'resource_type': 'image',
+                'bytes': len(data),
+                'url': f'{self.url}/{path}',
+                'secure_url': f'{self.url}/{path}',
+            })
+
+        @app.route('/v1_1/<cloud_name>/image/destroy', methods=['POST'])
+        def destroy(cloud_name):
+            public_id = request.form.get('public_id')
+            with self._lock:
+                self.destroyed.append(public_id)
+            return jsonify({'result': 'ok'})
+
+        @app.route('/<path:path>')
+        def serve(path):
+            if path not in self.files:
+                return jsonify({'error': {'message': 'Resource not found'}}), 404
+            data, mimetype = self.files[path]
+            return Response(data, mimetype=mimetype)
+
+        return app
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-cloudinary', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a fake Cloudinary upload API server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--upload-delay', type=float, default=0.0)
+    args = parser.parse_args()
+    cloud = FakeCloudinary(args.host, args.port, upload_delay=args.upload_delay)
+    print(f'Fake Cloudinary listening on {cloud.url}')
+    cloud.server.serve_forever()
@@ -0,0 +1,158 @@
+"""
+Local stand-in for Safaricom's Daraja API, for development and tests.
+
+Implements the OAuth token, STK push and STK query endpoints used by
+MpesaService and, unless disabled, answers each accepted push by POSTing a
+Daraja-style callback to its CallBackURL after `callback_delay` seconds:
+
+    python -m app.utils.fake_daraja --port 8089
+    MPESA_BASE_URL=http://localhost:8089 MPESA_CONSUMER_KEY=x MPESA_CONSUMER_SECRET=y \\
+        MPESA_CALLBACK_URL=http://localhost:5000/api/marketplace/payments/callback flask run
+
+In-process:
+
+    with FakeDaraja(callback_delay=None) as daraja:
+        os.environ['MPESA_BASE_URL'] = daraja.url
+        ...
+        daraja.pushes, daraja.token_requests
+
+Phone numbers ending in '0' are declined by the "customer" (ResultCode 1032).
+"""
+import argparse
+import itertools
+import threading
+import time
+import uuid
+import requests
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
+
+
+class FakeDaraja:
+    def __init__(self, host='127.0.0.1', port=0, token_ttl=3599, callback_delay=1.0, answer_queries=True):
+        self.token_ttl = token_ttl
+        self.callback_delay = callback_delay
+        # With callbacks disabled, STK queries report the final result only if answer_queries is set
+        self.answer_queries = answer_queries
+        self.token_requests = 0
+        self.pushes = []
+        self.tokens = set()
+        self._receipts = itertools.count(1)
+        self._lock = threading.Lock()
+        self.app = self._create_app()
+        self.server = make_server(host, port, self.app, threaded=True)
+        self.url = f'http://{host}:{self.server.server_port}'
+        self._thread = None
+
+    def _create_app(self):
+        app = Flask('fake_daraja')
+
+        @app.route('/oauth/v1/generate')
+        def generate_token():
+            if not request.headers.get('Authorization', '').startswith('Basic '):
+                return jsonify({'errorMessage': 'Invalid credentials'}), 400
+            token = uuid.uuid4().hex
+            with self._lock:
+                self.token_requests += 1
+                self.tokens.add(token)
+            return jsonify({'access_token': token, 'expires_in': str(self.token_ttl)})
+
+        @app.route('/mpesa/stkpush/v1/processrequest', methods=['POST'])
+        def stk_push():
+            token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+            if token not in self.tokens:
+                return jsonify({'errorCode': '404.001.03', 'errorMessage': 'Invalid Access Token'}), 401
+            data = request.get_json()
+            push = {
+                'MerchantRequestID': uuid.uuid4().hex[:12],
+                'CheckoutRequestID': f'ws_CO_{uuid.uuid4().hex[:16]}',
+                'request': data,
+            }
+            with self._lock:
+                self.pushes.append(push)
+            if self.callback_delay is not None and data.get('CallBackURL'):
+                timer = threading.Timer(self.callback_delay, self.send_callback, args=(push,))
+                timer.daemon = True
+                timer.start()
+            return jsonify({
+                'MerchantRequestID': push['MerchantRequestID'],
+                'CheckoutRequestID': push['CheckoutRequestID'],
+                'ResponseCode': '0',
+                'ResponseDescription': 'Success. Request accepted for processing',
+                'CustomerMessage': 'Success. Request accepted for processing',
+            })
+
+        @app.route('/mpesa/stkpushquery/v1/query', methods=['POST'])
+        def stk_query():
+            token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+            if token not in self.tokens:
+                return jsonify({'errorCode': '404.001.03', 'errorMessage': 'Invalid Access Token'}), 401
+            checkout_request_id = request.get_json().get('CheckoutRequestID')
+            push = next((p for p in self.pushes if p['CheckoutRequestID'] == checkout_request_id), None)
+            if push is None:
+                return jsonify({'errorCode': '400.002.02', 'errorMessage': 'Invalid CheckoutRequestID'}), 400
+            if self.callback_delay is None and not self.answer_queries:
+                return jsonify({'errorCode': '500.001.1001', 'errorMessage': 'The transaction is being processed'}), 500
+            body = self.callback_body(push)['Body']['stkCallback']
+            return jsonify({
+                'ResponseCode': '0',
+                'ResponseDescription': 'The service request has been accepted successsfully',
+                'MerchantRequestID': push['MerchantRequestID'],
+                'CheckoutRequestID': checkout_request_id,
+                'ResultCode': str(body['ResultCode']),
+                'ResultDesc': body['ResultDesc'],
+            })
+
+        return app
+
+    def callback_body(self, push):
+        data = push['request']
+        if str(data.get('PhoneNumber', '')).endswith('0'):
+            result = {'ResultCode': 1032, 'ResultDesc': 'Request cancelled by user'}
+        else:
+            result = {
+                'ResultCode': 0,
+                'ResultDesc': 'The service request is processed successfully.',
+                'CallbackMetadata': {'Item': [
+                    {'Name': 'MpesaReceiptNumber', 'Value': f'FAKE{next(self._receipts):06d}'},
+                    {'Name': 'Amount', 'Value': data.get('Amount')},
+                    {'Name': 'TransactionDate', 'Value': int(time.strftime('%Y%m%d%H%M%S'))},
+                    {'Name': 'PhoneNumber', 'Value': data.get('PhoneNumber')},
+                ]},
+            }
+        return {'Body': {'stkCallback': {
+            'MerchantRequestID': push['MerchantRequestID'],
+            'CheckoutRequestID': push['CheckoutRequestID'],
+            **result,
+        }}}
+
+    def send_callback(self, push):
+        try:
+            requests.post(push['request']['CallBackURL'], json=self.callback_body(push), timeout=5)
+        except requests.RequestException:
+            pass
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-daraja', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a fake Daraja (M-Pesa) API server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--callback-delay', type=float, default=1.0)
+    args = parser.parse_args()
+    daraja = FakeDaraja(args.host, args.port, callback_delay=args.callback_delay)
+    print(f'Fake Daraja listening on {daraja.url}')
+    daraja.server.serve_forever()
@@ -0,0 +1,40 @@
+"""
+Keyset (cursor) pagination helpers
+"""
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(*values):
+    """Encode sort-key values into an opaque URL-safe cursor string"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, *types):
+    """
+    Decode a cursor produced by encode_cursor.
+    `types` gives the expected type of each value (datetime, int, float, str).
+    Returns a tuple of values, or None if the cursor is missing or malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(values) != len(types):
+            return None
+        return tuple(
+            datetime.fromisoformat(v) if t is datetime else (None if v is None else t(v))
+            for v, t in zip(values, types)
+        )
+    except (ValueError, TypeError):
+        return None
+
+
+def get_limit(args, default=20, maximum=100):
+    """Read a `limit` query parameter clamped to [1, maximum]"""
+    limit = args.get('limit', type=int) or args.get('per_page', type=int) or default
+    return max(1, min(limit, maximum))
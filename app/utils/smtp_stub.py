@@ -0,0 +1,122 @@
+"""
+Minimal local SMTP server for development and tests.
+
+Accepts every message and keeps it in memory (and optionally prints it), so
+digests and password-reset emails can be exercised without a real mail
+provider:
+
+    python -m app.utils.smtp_stub --port 1025
+    MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=false flask jobs run notification-digests
+
+In-process:
+
+    with SMTPStub() as stub:
+        app.config.update(MAIL_SERVER=stub.host, MAIL_PORT=stub.port, MAIL_USE_TLS=False)
+        ...
+        stub.messages  # [{'sender', 'recipients', 'data', 'connection'}]
+"""
+import argparse
+import socketserver
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.connections += 1
+            connection = stub.connections
+        sender, recipients = None, []
+        self.reply('220 localhost SMTP stub ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                stub.deliver({
+                    'sender': sender,
+                    'recipients': recipients,
+                    'data': b''.join(lines).decode(errors='replace'),
+                    'connection': connection,
+                })
+                self.reply('250 OK: queued')
+            elif verb in ('RSET', 'NOOP'):
+                sender, recipients = (None, []) if verb == 'RSET' else (sender, recipients)
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPStub:
+    def __init__(self, host='127.0.0.1', port=0, echo=False):
+        self.server = _Server((host, port), _SMTPHandler)
+        self.server.stub = self
+        self.host, self.port = self.server.server_address
+        self.echo = echo
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self._thread = None
+
+    def deliver(self, message):
+        with self.lock:
+            self.messages.append(message)
+        if self.echo:
+            print(f"--- message from {message['sender']} to {', '.join(message['recipients'])}")
+            print(message['data'])
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='smtp-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a local SMTP server that prints every message.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    args = parser.parse_args()
+    stub = SMTPStub(args.host, args.port, echo=True)
+    print(f'SMTP stub listening on {stub.host}:{stub.port}')
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.server.server_close()
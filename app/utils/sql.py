@@ -0,0 +1,26 @@
+"""
+Dialect-aware SQL helpers
+"""
+from ..extensions import db
+
+
+def dialect_insert(table):
+    """
+    Return an INSERT construct for the bound database that supports
+    on_conflict_do_nothing / on_conflict_do_update (PostgreSQL and SQLite)
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f'Upserts are not supported on {dialect}')
+    return insert(table)
+
+
+def contains_pattern(text, escape='\\'):
+    """LIKE pattern matching `text` anywhere, with its own % and _ taken literally"""
+    for char in (escape, '%', '_'):
+        text = text.replace(char, escape + char)
+    return f'%{text}%'
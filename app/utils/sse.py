@@ -0,0 +1,44 @@
+"""
+Server-Sent Events helpers
+"""
+import json
+from flask import Response, stream_with_context
+
+
+def format_sse(data, event=None, event_id=None):
+    """Format a single SSE frame"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    payload = data if isinstance(data, str) else json.dumps(data)
+    lines.extend(f'data: {line}' for line in payload.splitlines() or [''])
+    return '\n'.join(lines) + '\n\n'
+
+
+def sse_response(subscription, heartbeat=15, initial=()):
+    """
+    Stream events from an event bus subscription as text/event-stream.
+    Events are dicts with `data` and optional `event` / `id` keys.
+    A comment line is sent every `heartbeat` seconds to keep proxies from
+    closing idle connections; the subscription is closed on disconnect.
+    """
+    def generate():
+        try:
+            for frame in initial:
+                yield frame
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield format_sse(event['data'], event.get('event'), event.get('id'))
+        finally:
+            subscription.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,115 @@
+"""
+Serving static assets and uploads.
+
+send_file_cached() wraps send_from_directory with what browsers and proxies
+need to avoid refetching files:
+
+- Cache-Control: files whose name is derived from their content (uploads
+  stored by hash, fingerprinted assets like app.3f9c2a1b.css) are cached
+  for a year as immutable; anything else for STATIC_MAX_AGE seconds, then
+  revalidated with its ETag (304).
+- Precompressed text assets: a sibling .br or .gz file is sent when the
+  client accepts that encoding. `flask static compress` writes the .gz files.
+- Conditional and byte-range (206) requests, handled by Werkzeug.
+- Offloading: with STATIC_ACCEL_PREFIX set, the response is an empty
+  X-Accel-Redirect to that internal nginx location and nginx sends the file;
+  USE_X_SENDFILE does the same for servers that support X-Sendfile.
+"""
+import gzip
+import mimetypes
+import os
+import re
+import shutil
+import click
+from flask import current_app, request, send_from_directory, abort
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = {'.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.html', '.xml'}
+# Preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_fingerprinted = re.compile(r'\.[0-9a-f]{8,}\.[a-z0-9]+$')
+
+static_cli = AppGroup('static', help='Manage static assets.')
+
+
+def is_fingerprinted(filename):
+    """Names like app.3f9c2a1b.css, whose content changes only with the name"""
+    return bool(_fingerprinted.search(filename))
+
+
+def _find_precompressed(directory, filename):
+    if os.path.splitext(filename)[1].lower() not in COMPRESSIBLE:
+        return None, None
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding]:
+            path = safe_join(directory, filename + suffix)
+            # A stale copy (older than its source) is ignored
+            if path and os.path.isfile(path) and \
+                    os.path.getmtime(path) >= os.path.getmtime(safe_join(directory, filename)):
+                return encoding, filename + suffix
+    return None, None
+
+
+def send_file_cached(directory, filename, location, immutable=False, max_age=None):
+    """
+    Send `filename` from `directory`. `location` names the directory under
+    STATIC_ACCEL_PREFIX when nginx serves it; `immutable` marks a file whose
+    content never changes under this name.
+    """
+    config = current_app.config
+    if max_age is None:
+        max_age = IMMUTABLE_MAX_AGE if immutable else config['STATIC_MAX_AGE']
+
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    if config['STATIC_ACCEL_PREFIX']:
+        # nginx does ranges, conditionals and gzip_static itself
+        response = current_app.response_class()
+        response.headers['X-Accel-Redirect'] = f"{config['STATIC_ACCEL_PREFIX'].rstrip('/')}/{location}/{filename}"
+        response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    else:
+        encoding, encoded = _find_precompressed(directory, filename)
+        if encoding:
+            response = send_from_directory(directory, encoded, max_age=max_age, conditional=True, etag=True,
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.content_encoding = encoding
+        else:
+            response = send_from_directory(directory, filename, max_age=max_age, conditional=True, etag=True)
+        response.headers['Accept-Ranges'] = 'bytes'
+
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    if os.path.splitext(filename)[1].lower() in COMPRESSIBLE:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+@static_cli.command('compress')
+@click.option('--min-size', default=1024, show_default=True, help='Skip files smaller than this many bytes.')
+def compress(min_size):
+    """Write a .gz next to each compressible file in app/static, for clients that accept gzip"""
+    root = os.path.join(current_app.root_path, 'static')
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            source = os.path.join(dirpath, name)
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE or os.path.getsize(source) < min_size:
+                continue
+            target = source + '.gz'
+            if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                continue
+            with open(source, 'rb') as src, gzip.open(target, 'wb', compresslevel=9) as dst:
+                shutil.copyfileobj(src, dst)
+            written += 1
+    click.echo(f'Compressed {written} file(s)')
+
+
+def init_app(app):
+    app.cli.add_command(static_cli)
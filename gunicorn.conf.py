@@ -0,0 +1,18 @@
+"""
+Gunicorn settings, read automatically by `gunicorn run:app`.
+
+Server-Sent Event streams (/api/v1/notifications/stream, community chat
+streams) stay open for minutes, so each worker serves requests from a
+thread pool: an open stream holds one thread, not the whole worker.
+SSE_MAX_CONNECTIONS (app/config.py) defaults to half of GUNICORN_THREADS so
+ordinary requests always have threads left.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+# gthread workers heartbeat from their main loop, so long streams are not killed by this
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+keepalive = 5
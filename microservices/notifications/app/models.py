@@ -1,10 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import os
 
 db = SQLAlchemy()
 
+# Set NOTIFICATIONS_TABLE (docker-compose.yml and render.yaml use
+# service_notifications) when sharing a database with the main API, which has
+# its own notifications table. Changing it on an existing deployment starts an
+# empty table: the old rows are not moved
+NOTIFICATIONS_TABLE = os.getenv('NOTIFICATIONS_TABLE', 'notifications')
+
 class Notification(db.Model):
-    __tablename__ = 'notifications'
+    __tablename__ = NOTIFICATIONS_TABLE
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, nullable=False, index=True)
@@ -17,6 +24,10 @@ class Notification(db.Model):
     actor_id = db.Column(db.Integer)  # User who triggered the notification
     actor_name = db.Column(db.String(100))
     actor_avatar = db.Column(db.String(500))
+
+    __table_args__ = (
+        db.Index(f'idx_{NOTIFICATIONS_TABLE}_user_timeline', 'user_id', 'created_at', 'id'),
+    )
     
     def to_dict(self):
         return {
@@ -0,0 +1,33 @@
+"""Add members_count to communities
+
+Revision ID: 3c9e1f2a7b41
+Revises: f1e827616431
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e1f2a7b41'
+down_revision = 'f1e827616431'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('communities', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('members_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from the membership table
+    op.execute(
+        "UPDATE communities SET members_count = ("
+        "SELECT COUNT(*) FROM community_members "
+        "WHERE community_members.community_id = communities.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('communities', schema=None) as batch_op:
+        batch_op.drop_column('members_count')
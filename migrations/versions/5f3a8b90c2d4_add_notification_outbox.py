@@ -0,0 +1,41 @@
+"""Add notification_outbox table
+
+Revision ID: 5f3a8b90c2d4
+Revises: e41a9c7d3b62
+Create Date: 2026-10-19 13:41:08.227514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f3a8b90c2d4'
+down_revision = 'e41a9c7d3b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('notification_outbox', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_notification_outbox_created_at'), ['created_at'], unique=False)
+        batch_op.create_index('idx_notification_outbox_due', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notification_outbox', schema=None) as batch_op:
+        batch_op.drop_index('idx_notification_outbox_due')
+        batch_op.drop_index(batch_op.f('ix_notification_outbox_created_at'))
+
+    op.drop_table('notification_outbox')
@@ -0,0 +1,26 @@
+"""Index community_members by community and join date
+
+Revision ID: 8d2b4e6f0a13
+Revises: 3c9e1f2a7b41
+Create Date: 2026-10-19 10:02:11.540927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2b4e6f0a13'
+down_revision = '3c9e1f2a7b41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("UPDATE community_members SET joined_at = CURRENT_TIMESTAMP WHERE joined_at IS NULL")
+    op.create_index('idx_community_members_joined', 'community_members',
+                    ['community_id', 'joined_at', 'user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_community_members_joined', table_name='community_members')
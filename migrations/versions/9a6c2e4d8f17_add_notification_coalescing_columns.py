@@ -0,0 +1,32 @@
+"""Add related_id and coalescing columns to notifications
+
+Revision ID: 9a6c2e4d8f17
+Revises: 5f3a8b90c2d4
+Create Date: 2026-10-19 14:30:19.775102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a6c2e4d8f17'
+down_revision = '5f3a8b90c2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('related_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('actor_count', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.add_column(sa.Column('actors', sa.JSON(), nullable=True))
+        batch_op.create_index('idx_notification_coalesce', ['user_id', 'type', 'related_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('idx_notification_coalesce')
+        batch_op.drop_column('actors')
+        batch_op.drop_column('actor_count')
+        batch_op.drop_column('related_id')
@@ -0,0 +1,47 @@
+"""Add media_uploads table
+
+Revision ID: a2c4e6f8b0d3
+Revises: f9c1e3a5b7d0
+Create Date: 2026-10-19 22:31:54.306817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2c4e6f8b0d3'
+down_revision = 'f9c1e3a5b7d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_uploads',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('folder', sa.String(length=100), nullable=False),
+    sa.Column('spool_path', sa.String(length=255), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(length=500), nullable=True),
+    sa.Column('public_id', sa.String(length=255), nullable=True),
+    sa.Column('error', sa.String(length=255), nullable=True),
+    sa.Column('target_type', sa.String(length=20), nullable=True),
+    sa.Column('target_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('media_uploads', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_media_uploads_created_at'), ['created_at'], unique=False)
+        batch_op.create_index('idx_media_uploads_status_updated', ['status', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('media_uploads', schema=None) as batch_op:
+        batch_op.drop_index('idx_media_uploads_status_updated')
+        batch_op.drop_index(batch_op.f('ix_media_uploads_created_at'))
+
+    op.drop_table('media_uploads')
@@ -0,0 +1,28 @@
+"""Add stock reservation deadline to orders
+
+Revision ID: a7d9f1b3c5e8
+Revises: f3c5e7a9b1d4
+Create Date: 2026-10-19 18:12:55.730164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d9f1b3c5e8'
+down_revision = 'f3c5e7a9b1d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reserved_until', sa.DateTime(), nullable=True))
+        batch_op.create_index('idx_orders_reservation_due', ['status', 'reserved_until'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('idx_orders_reservation_due')
+        batch_op.drop_column('reserved_until')
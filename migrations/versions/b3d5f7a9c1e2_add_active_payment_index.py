@@ -0,0 +1,33 @@
+"""Allow one payment in progress per order
+
+Revision ID: b3d5f7a9c1e2
+Revises: a2c4e6f8b0d3
+Create Date: 2026-10-20 09:12:40.518263
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d5f7a9c1e2'
+down_revision = 'a2c4e6f8b0d3'
+branch_labels = None
+depends_on = None
+
+ACTIVE = "status IN ('queued', 'sending', 'pending')"
+
+
+def upgrade():
+    # Orders may already have several payments in progress; keep the newest
+    op.execute(
+        "UPDATE payments SET status = 'failed', failure_reason = 'Superseded by a newer payment' "
+        f"WHERE {ACTIVE} AND id NOT IN ("
+        f"SELECT MAX(id) FROM payments WHERE {ACTIVE} GROUP BY order_id)"
+    )
+    op.create_index('uq_payments_order_active', 'payments', ['order_id'], unique=True,
+                    postgresql_where=sa.text(ACTIVE), sqlite_where=sa.text(ACTIVE))
+
+
+def downgrade():
+    op.drop_index('uq_payments_order_active', table_name='payments')
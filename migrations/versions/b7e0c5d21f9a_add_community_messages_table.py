@@ -0,0 +1,56 @@
+"""Move community chat into its own community_messages table
+
+Revision ID: b7e0c5d21f9a
+Revises: 8d2b4e6f0a13
+Create Date: 2026-10-19 11:20:37.064318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e0c5d21f9a'
+down_revision = '8d2b4e6f0a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('community_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('community_id', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.CheckConstraint('length(content) >= 1', name='community_message_content_not_empty'),
+    sa.ForeignKeyConstraint(['author_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['community_id'], ['communities.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('community_messages', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_community_messages_author_id'), ['author_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_community_messages_created_at'), ['created_at'], unique=False)
+        batch_op.create_index('idx_community_message_timeline', ['community_id', 'created_at', 'id'], unique=False)
+
+    # Chat messages used to be stored as comments without a post
+    op.execute(
+        "INSERT INTO community_messages (created_at, updated_at, community_id, author_id, content) "
+        "SELECT created_at, updated_at, community_id, author_id, content FROM comments "
+        "WHERE community_id IS NOT NULL AND post_id IS NULL ORDER BY created_at, id"
+    )
+    op.execute("DELETE FROM comments WHERE community_id IS NOT NULL AND post_id IS NULL")
+
+
+def downgrade():
+    op.execute(
+        "INSERT INTO comments (created_at, updated_at, community_id, author_id, content) "
+        "SELECT created_at, updated_at, community_id, author_id, content FROM community_messages"
+    )
+    with op.batch_alter_table('community_messages', schema=None) as batch_op:
+        batch_op.drop_index('idx_community_message_timeline')
+        batch_op.drop_index(batch_op.f('ix_community_messages_created_at'))
+        batch_op.drop_index(batch_op.f('ix_community_messages_author_id'))
+
+    op.drop_table('community_messages')
@@ -0,0 +1,30 @@
+"""Add failure reason and queue indexes to payments
+
+Revision ID: b9e1a3c5d7f0
+Revises: a7d9f1b3c5e8
+Create Date: 2026-10-19 18:47:10.264981
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e1a3c5d7f0'
+down_revision = 'a7d9f1b3c5e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('failure_reason', sa.String(length=255), nullable=True))
+        batch_op.create_index('idx_payments_status_updated', ['status', 'updated_at'], unique=False)
+        batch_op.create_index('idx_payments_order', ['order_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index('idx_payments_order')
+        batch_op.drop_index('idx_payments_status_updated')
+        batch_op.drop_column('failure_reason')
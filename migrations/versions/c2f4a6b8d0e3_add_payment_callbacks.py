@@ -0,0 +1,37 @@
+"""Add unique checkout_request_id index and payment_callbacks table
+
+Revision ID: c2f4a6b8d0e3
+Revises: b9e1a3c5d7f0
+Create Date: 2026-10-19 19:20:37.885402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2f4a6b8d0e3'
+down_revision = 'b9e1a3c5d7f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.create_index('uq_payments_checkout_request_id', ['checkout_request_id'], unique=True)
+
+    op.create_table('payment_callbacks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('checkout_request_id', sa.String(length=100), nullable=False),
+    sa.Column('result_code', sa.Integer(), nullable=True),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('checkout_request_id')
+    )
+
+
+def downgrade():
+    op.drop_table('payment_callbacks')
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index('uq_payments_checkout_request_id')
@@ -0,0 +1,60 @@
+"""Order notifications by last activity and record coalesced actors
+
+Revision ID: c5e7a9b1d3f4
+Revises: b3d5f7a9c1e2
+Create Date: 2026-10-20 10:05:21.730914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e7a9b1d3f4'
+down_revision = 'b3d5f7a9c1e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_activity_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE notifications SET last_activity_at = created_at')
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.alter_column('last_activity_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.drop_index('idx_notification_user_timeline')
+        batch_op.drop_index('idx_notification_user_unread')
+        batch_op.create_index('idx_notification_user_activity', ['user_id', 'last_activity_at', 'id'], unique=False)
+        batch_op.create_index('idx_notification_user_unread', ['user_id', 'is_read', 'last_activity_at'], unique=False)
+
+    notification_actors = op.create_table('notification_actors',
+    sa.Column('notification_id', sa.Integer(), nullable=False),
+    sa.Column('actor_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['notification_id'], ['notifications.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('notification_id', 'actor_id')
+    )
+
+    # Unread notifications may still be coalesced into: record the actors they list
+    notifications = sa.table('notifications', sa.column('id', sa.Integer), sa.column('actors', sa.JSON),
+                             sa.column('is_read', sa.Boolean), sa.column('related_id', sa.Integer))
+    rows = op.get_bind().execute(
+        sa.select(notifications.c.id, notifications.c.actors)
+        .where(notifications.c.is_read == sa.false(), notifications.c.related_id.isnot(None))
+    )
+    actors = [
+        {'notification_id': notification_id, 'actor_id': actor_id}
+        for notification_id, listed in rows
+        for actor_id in {a['id'] for a in (listed or []) if a.get('id') is not None}
+    ]
+    if actors:
+        op.bulk_insert(notification_actors, actors)
+
+
+def downgrade():
+    op.drop_table('notification_actors')
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('idx_notification_user_unread')
+        batch_op.drop_index('idx_notification_user_activity')
+        batch_op.create_index('idx_notification_user_unread', ['user_id', 'is_read', 'created_at'], unique=False)
+        batch_op.create_index('idx_notification_user_timeline', ['user_id', 'created_at', 'id'], unique=False)
+        batch_op.drop_column('last_activity_at')
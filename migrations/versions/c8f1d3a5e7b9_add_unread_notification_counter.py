@@ -0,0 +1,38 @@
+"""Add unread notification counter and composite notifications index
+
+Revision ID: c8f1d3a5e7b9
+Revises: 9a6c2e4d8f17
+Create Date: 2026-10-19 15:08:44.602381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f1d3a5e7b9'
+down_revision = '9a6c2e4d8f17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.create_index('idx_notification_user_unread', ['user_id', 'is_read', 'created_at'], unique=False)
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('unread_notifications_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.execute(
+        "UPDATE users SET unread_notifications_count = ("
+        "SELECT COUNT(*) FROM notifications "
+        "WHERE notifications.user_id = users.id AND notifications.is_read = false)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('unread_notifications_count')
+
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('idx_notification_user_unread')
@@ -0,0 +1,26 @@
+"""Add (user_id, created_at, id) index for notification cursor pagination
+
+Revision ID: d2e4f6a8b0c1
+Revises: c8f1d3a5e7b9
+Create Date: 2026-10-19 15:52:03.318650
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e4f6a8b0c1'
+down_revision = 'c8f1d3a5e7b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.create_index('idx_notification_user_timeline', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('idx_notification_user_timeline')
@@ -0,0 +1,57 @@
+"""Add seller sales rollups and order lookup indexes
+
+Revision ID: d4a6c8e0f2b5
+Revises: c2f4a6b8d0e3
+Create Date: 2026-10-19 19:58:12.417736
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a6c8e0f2b5'
+down_revision = 'c2f4a6b8d0e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('idx_orders_buyer_created', ['buyer_id', 'created_at'], unique=False)
+        batch_op.create_index('idx_orders_product_created', ['product_id', 'created_at', 'id'], unique=False)
+
+    op.create_table('sales_daily_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('orders_count', sa.Integer(), nullable=False),
+    sa.Column('units_sold', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['seller_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('product_id', 'day', name='uq_sales_rollup_product_day')
+    )
+    with op.batch_alter_table('sales_daily_rollups', schema=None) as batch_op:
+        batch_op.create_index('idx_sales_rollup_seller_day', ['seller_id', 'day'], unique=False)
+
+    # Backfill from orders already paid, dated by their last update
+    op.execute("""
+        INSERT INTO sales_daily_rollups (seller_id, product_id, day, orders_count, units_sold, revenue)
+        SELECT p.seller_id, o.product_id, date(o.updated_at), count(*), sum(o.quantity), sum(o.total_price)
+        FROM orders o JOIN products p ON p.id = o.product_id
+        WHERE o.status = 'paid'
+        GROUP BY p.seller_id, o.product_id, date(o.updated_at)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('sales_daily_rollups', schema=None) as batch_op:
+        batch_op.drop_index('idx_sales_rollup_seller_day')
+    op.drop_table('sales_daily_rollups')
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('idx_orders_product_created')
+        batch_op.drop_index('idx_orders_buyer_created')
@@ -0,0 +1,36 @@
+"""Add last_activity_at and ranking indexes to communities
+
+Revision ID: e41a9c7d3b62
+Revises: b7e0c5d21f9a
+Create Date: 2026-10-19 12:05:52.913470
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41a9c7d3b62'
+down_revision = 'b7e0c5d21f9a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('communities', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_activity_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_communities_last_activity_at'), ['last_activity_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_communities_members_count'), ['members_count'], unique=False)
+
+    op.execute(
+        "UPDATE communities SET last_activity_at = COALESCE(("
+        "SELECT MAX(community_messages.created_at) FROM community_messages "
+        "WHERE community_messages.community_id = communities.id), created_at)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('communities', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_communities_members_count'))
+        batch_op.drop_index(batch_op.f('ix_communities_last_activity_at'))
+        batch_op.drop_column('last_activity_at')
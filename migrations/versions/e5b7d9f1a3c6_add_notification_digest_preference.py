@@ -0,0 +1,34 @@
+"""Add notification digest preference to users
+
+Revision ID: e5b7d9f1a3c6
+Revises: d2e4f6a8b0c1
+Create Date: 2026-10-19 17:08:41.502217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b7d9f1a3c6'
+down_revision = 'd2e4f6a8b0c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('notification_digest', sa.String(length=10), nullable=False, server_default='off'))
+        batch_op.add_column(sa.Column('last_digest_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_users_notification_digest'), ['notification_digest'], unique=False)
+        batch_op.create_check_constraint(
+            'valid_notification_digest', "notification_digest IN ('off', 'hourly', 'daily')"
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_constraint('valid_notification_digest', type_='check')
+        batch_op.drop_index(batch_op.f('ix_users_notification_digest'))
+        batch_op.drop_column('last_digest_at')
+        batch_op.drop_column('notification_digest')
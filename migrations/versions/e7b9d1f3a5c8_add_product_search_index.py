@@ -0,0 +1,55 @@
+"""Add full-text product search index
+
+Revision ID: e7b9d1f3a5c8
+Revises: d4a6c8e0f2b5
+Create Date: 2026-10-19 21:03:47.528190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b9d1f3a5c8'
+down_revision = 'd4a6c8e0f2b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Kept in sync by app/services/product_search.py
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5("
+            "name, category, unit, description, tokenize='porter unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            'INSERT INTO product_search (rowid, name, category, unit, description) '
+            'SELECT id, name, category, unit, description FROM products'
+        )
+        return
+
+    op.create_table('product_search',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('document', postgresql.TSVECTOR(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_index('idx_product_search_document', 'product_search', ['document'], unique=False,
+                    postgresql_using='gin')
+    op.execute("""
+        INSERT INTO product_search (product_id, document)
+        SELECT p.id,
+               setweight(to_tsvector('english', p.name), 'A') ||
+               setweight(to_tsvector('english', coalesce(p.category, '')), 'B') ||
+               setweight(to_tsvector('english', coalesce(p.unit, '')), 'C') ||
+               setweight(to_tsvector('english', coalesce(p.description, '')), 'D')
+        FROM products p
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_index('idx_product_search_document', table_name='product_search')
+    op.drop_table('product_search')
@@ -0,0 +1,30 @@
+"""Claim periodic job runs across processes
+
+Revision ID: e9a1c3b5d7f2
+Revises: d7f9b1c3e5a6
+Create Date: 2026-10-20 14:05:31.642907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9a1c3b5d7f2'
+down_revision = 'd7f9b1c3e5a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scheduled_jobs',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('next_run_at', sa.DateTime(), nullable=False),
+    sa.Column('claimed_by', sa.String(length=100), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('scheduled_jobs')
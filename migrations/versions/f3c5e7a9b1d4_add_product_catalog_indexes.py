@@ -0,0 +1,34 @@
+"""Add product catalog browsing indexes
+
+Revision ID: f3c5e7a9b1d4
+Revises: e5b7d9f1a3c6
+Create Date: 2026-10-19 17:41:26.093318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c5e7a9b1d4'
+down_revision = 'e5b7d9f1a3c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('idx_products_created', ['created_at', 'id'], unique=False)
+        batch_op.create_index('idx_products_price', ['price', 'id'], unique=False)
+        batch_op.create_index('idx_products_category_created', ['category', 'created_at', 'id'], unique=False)
+        batch_op.create_index('idx_products_category_price', ['category', 'price', 'id'], unique=False)
+        batch_op.create_index('idx_products_seller_created', ['seller_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('idx_products_seller_created')
+        batch_op.drop_index('idx_products_category_price')
+        batch_op.drop_index('idx_products_category_created')
+        batch_op.drop_index('idx_products_price')
+        batch_op.drop_index('idx_products_created')
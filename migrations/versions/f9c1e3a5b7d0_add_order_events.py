@@ -0,0 +1,47 @@
+"""Add order status event log
+
+Revision ID: f9c1e3a5b7d0
+Revises: e7b9d1f3a5c8
+Create Date: 2026-10-19 21:46:09.184352
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f9c1e3a5b7d0'
+down_revision = 'e7b9d1f3a5c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('from_status', sa.String(length=20), nullable=True),
+    sa.Column('to_status', sa.String(length=20), nullable=False),
+    sa.Column('reason', sa.String(length=255), nullable=True),
+    sa.Column('actor_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['actor_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('order_events', schema=None) as batch_op:
+        batch_op.create_index('idx_order_events_order', ['order_id', 'id'], unique=False)
+
+    # Start each existing order's history from the status it has now
+    op.execute("""
+        INSERT INTO order_events (order_id, from_status, to_status, reason, created_at)
+        SELECT id, NULL, coalesce(status, 'pending'), 'Status before order events were recorded',
+               coalesce(updated_at, created_at)
+        FROM orders
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('order_events', schema=None) as batch_op:
+        batch_op.drop_index('idx_order_events_order')
+    op.drop_table('order_events')
@@ -0,0 +1,97 @@
+import os
+import pytest
+from flask_jwt_extended import create_access_token
+from app import create_app
+from app.config import TestConfig
+from app.extensions import db
+from app.services import http_client
+from app.services.mpesa_service import clear_token_cache
+from app.utils.fake_daraja import FakeDaraja
+
+
+@pytest.fixture
+def app(tmp_path):
+    class Config(TestConfig):
+        SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL') or f'sqlite:///{tmp_path / "test.db"}'
+        # Run queued work inline so tests see its outcome
+        NOTIFICATION_QUEUE_ENABLED = False
+        MPESA_QUEUE_ENABLED = False
+        MEDIA_QUEUE_ENABLED = False
+        IMAGE_QUEUE_ENABLED = False
+        SCHEDULER_ENABLED = False
+        MEDIA_SPOOL_FOLDER = str(tmp_path / 'spool')
+        MAIL_SUPPRESS_SEND = True
+
+    app = create_app(Config)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(autouse=True)
+def http_clients(monkeypatch):
+    """Fresh shared HTTP clients (and circuit breakers) for every test"""
+    monkeypatch.setattr(http_client, '_clients', {})
+    clear_token_cache()
+
+
+@pytest.fixture
+def daraja(monkeypatch):
+    """A fake Daraja API that accepts STK pushes; tests deliver the callbacks themselves"""
+    with FakeDaraja(callback_delay=None) as daraja:
+        monkeypatch.setenv('MPESA_BASE_URL', daraja.url)
+        monkeypatch.setenv('MPESA_CONSUMER_KEY', 'key')
+        monkeypatch.setenv('MPESA_CONSUMER_SECRET', 'secret')
+        monkeypatch.setenv('MPESA_SHORTCODE', '174379')
+        monkeypatch.setenv('MPESA_PASSKEY', 'passkey')
+        monkeypatch.setenv('MPESA_CALLBACK_URL', 'http://localhost/api/marketplace/payments/callback')
+        yield daraja
+
+
+@pytest.fixture
+def make_user(app):
+    from app.models import User
+
+    def make_user(**fields):
+        with app.app_context():
+            count = User.query.count()
+            user = User(email=f'user{count}@example.com', password='secret', first_name=f'User{count}',
+                        last_name='Test', **fields)
+            db.session.add(user)
+            db.session.commit()
+            return user.id, {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+    return make_user
+
+
+@pytest.fixture
+def seller(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def buyer(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def product(client, seller):
+    """Factory: create a product owned by `seller` and return its id"""
+    def product(quantity=5, price=100):
+        response = client.post('/api/marketplace/products',
+                               json={'name': 'Maize', 'price': price, 'quantity': quantity}, headers=seller[1])
+        assert response.status_code == 201, response.json
+        return response.json['id']
+    return product
+
+
+@pytest.fixture
+def order(client, buyer):
+    """Factory: place an order for `buyer` and return its id"""
+    def order(product_id, quantity=1, phone='254711000001'):
+        response = client.post('/api/marketplace/orders',
+                               json={'product_id': product_id, 'quantity': quantity, 'buyer_phone': phone},
+                               headers=buyer[1])
+        assert response.status_code == 201, response.json
+        return response.json['order_id']
+    return order
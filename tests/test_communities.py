@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.fixture
+def communities(client, seller):
+    for name, description in (('Maize 100% organic', 'No sprays'), ('Dairy_farmers', 'Milk'),
+                              ('Poultry', 'Layers and broilers')):
+        response = client.post('/api/v1/communities', headers=seller[1],
+                               json={'name': name, 'description': description, 'category': 'farming'})
+        assert response.status_code == 201, response.json
+
+
+@pytest.mark.parametrize('q, names', [
+    ('%', ['Maize 100% organic']),
+    ('_', ['Dairy_farmers']),
+    ('y_f', ['Dairy_farmers']),
+    ('100\\', []),
+    ('broil', ['Poultry']),
+])
+def test_search_matches_wildcards_literally(client, seller, communities, q, names):
+    response = client.get('/api/v1/communities', query_string={'q': q}, headers=seller[1])
+    assert response.status_code == 200
+    assert sorted(c['name'] for c in response.json['communities']) == names
+    assert response.json['facets']['category'] == ([{'category': 'farming', 'count': len(names)}] if names else [])
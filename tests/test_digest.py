@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+import pytest
+from app.extensions import db, mail
+from app.models import User
+from app.services.digest import send_due_digests
+from app.services.notification_store import get_notification_store
+from app.utils.smtp_stub import SMTPStub
+
+
+@pytest.fixture
+def smtp(app):
+    with SMTPStub() as stub:
+        app.config.update(MAIL_SERVER=stub.host, MAIL_PORT=stub.port, MAIL_USE_TLS=False,
+                          MAIL_SUPPRESS_SEND=False, NOTIFICATION_DIGEST_MAX_ITEMS=3)
+        mail.init_app(app)
+        yield stub
+
+
+def notify(user_id, count):
+    get_notification_store().add_many([
+        {'user_id': user_id, 'type': 'message', 'title': 'New message', 'message': f'Message {i}'}
+        for i in range(count)
+    ])
+
+
+def test_digest_lists_newest_items_and_counts_the_rest(app, smtp, make_user):
+    user_id, _ = make_user(notification_digest='hourly', last_digest_at=datetime.utcnow() - timedelta(hours=2))
+    notify(user_id, 5)
+
+    assert send_due_digests() == {'checked': 1, 'sent': 1, 'failed': 0}
+    [message] = smtp.messages
+    assert message['recipients'] == ['<user0@example.com>']
+    assert 'Subject: Agrikonnect - 5 unread notifications' in message['data']
+    assert '...and 2 more unread' in message['data']
+
+    # Not due again until the period has passed
+    assert send_due_digests()['sent'] == 0
+    assert len(smtp.messages) == 1
+
+
+def test_digests_share_one_smtp_connection(app, smtp, make_user):
+    due = datetime.utcnow() - timedelta(days=2)
+    users = [make_user(notification_digest=digest, last_digest_at=due)[0] for digest in ('hourly', 'daily', 'off')]
+    for user_id in users:
+        notify(user_id, 1)
+    quiet, _ = make_user(notification_digest='daily', last_digest_at=due)
+
+    assert send_due_digests()['sent'] == 2
+    assert len({message['connection'] for message in smtp.messages}) == 1
+    assert db.session.get(User, quiet).last_digest_at == due
+
+
+def test_nothing_due_does_not_connect(app, smtp, make_user):
+    read_up, _ = make_user(notification_digest='hourly', last_digest_at=datetime.utcnow() - timedelta(hours=2))
+    not_due, _ = make_user(notification_digest='daily', last_digest_at=datetime.utcnow())
+    notify(not_due, 1)
+
+    assert send_due_digests() == {'checked': 0, 'sent': 0, 'failed': 0}
+    assert smtp.connections == 0
@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from app.extensions import db
+from app.models.marketplace import Product, Order
+from app.services import inventory
+
+
+def quantity(product_id):
+    return db.session.scalar(select(Product.quantity).where(Product.id == product_id))
+
+
+def status(order_id):
+    return db.session.scalar(select(Order.status).where(Order.id == order_id))
+
+
+def in_threads(app, work, count):
+    def run(index):
+        with app.app_context():
+            result = work(index)
+            db.session.commit()
+            return result
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(run, range(count)))
+
+
+def expire(*order_ids):
+    db.session.execute(
+        update(Order).where(Order.id.in_(order_ids)).values(reserved_until=datetime.utcnow() - timedelta(seconds=1))
+    )
+    db.session.commit()
+    return inventory.release_expired()
+
+
+def test_concurrent_reservations_never_oversell(app, product):
+    product_id = product(quantity=5)
+    results = in_threads(app, lambda _: inventory.reserve(product_id, 1), 12)
+    assert results.count(True) == 5
+    assert quantity(product_id) == 0
+
+
+def test_concurrent_orders_take_the_last_units_once(app, product, buyer):
+    product_id = product(quantity=3)
+
+    def place(index):
+        return app.test_client().post('/api/marketplace/orders', headers=buyer[1], json={
+            'product_id': product_id, 'quantity': 1, 'buyer_phone': f'25471100000{index}'
+        }).status_code
+    assert sorted(in_threads(app, place, 6)) == [201] * 3 + [400] * 3
+    assert quantity(product_id) == 0
+    assert Order.query.filter_by(product_id=product_id).count() == 3
+
+
+def test_confirm_keeps_reserved_stock_and_is_idempotent(app, product, order):
+    product_id = product(quantity=2)
+    order_id = order(product_id)
+    assert inventory.confirm(order_id)
+    assert inventory.confirm(order_id)
+    db.session.commit()
+    assert status(order_id) == 'paid'
+    assert quantity(product_id) == 1
+
+
+def test_expired_reservations_return_stock(app, product, order):
+    product_id = product(quantity=2)
+    order_id = order(product_id, quantity=2)
+    assert expire(order_id) == 1
+    assert status(order_id) == 'expired'
+    assert quantity(product_id) == 2
+    # Released stock is not released again
+    assert expire(order_id) == 0
+    assert quantity(product_id) == 2
+
+
+def test_late_payments_race_for_released_stock(app, product, order):
+    product_id = product(quantity=2)
+    late = [order(product_id), order(product_id)]
+    expire(*late)
+    order(product_id)
+
+    results = in_threads(app, lambda index: inventory.confirm(late[index]), 2)
+    assert sorted(results) == [False, True]
+    assert sorted(status(order_id) for order_id in late) == ['expired', 'paid']
+    assert quantity(product_id) == 0
+
+
+def test_order_reclaims_stock_from_lapsed_reservations(app, product, order):
+    product_id = product(quantity=1)
+    lapsed = order(product_id)
+    db.session.execute(
+        update(Order).where(Order.id == lapsed).values(reserved_until=datetime.utcnow() - timedelta(seconds=1))
+    )
+    db.session.commit()
+
+    # The expiry sweep has not run, but the new order still gets the unit
+    order(product_id)
+    assert status(lapsed) == 'expired'
+    assert quantity(product_id) == 0
@@ -0,0 +1,94 @@
+import io
+import os
+import pytest
+import requests
+from app.extensions import db
+from app.models import Post
+from app.models.media_upload import MediaUpload
+from app.services import cloudinary_service, media_uploads
+from app.utils.fake_cloudinary import FakeCloudinary
+
+M = '/api/marketplace'
+
+
+@pytest.fixture
+def cloud(app, monkeypatch):
+    with FakeCloudinary() as cloud:
+        monkeypatch.setenv('CLOUDINARY_CLOUD_NAME', 'demo')
+        monkeypatch.setenv('CLOUDINARY_API_KEY', 'key')
+        monkeypatch.setenv('CLOUDINARY_API_SECRET', 'secret')
+        monkeypatch.setenv('CLOUDINARY_UPLOAD_PREFIX', cloud.url)
+        # Credentials are applied once per process; apply this server's
+        monkeypatch.setattr(cloudinary_service, '_configured', False)
+        app.config['MEDIA_UPLOAD_MAX_ATTEMPTS'] = 2
+        yield cloud
+
+
+def upload_image(client, headers, content=b'image bytes', filename='maize.jpg'):
+    return client.post(f'{M}/upload-image', data={'file': (io.BytesIO(content), filename)},
+                       headers=headers, content_type='multipart/form-data')
+
+
+def media(media_id):
+    db.session.commit()
+    return db.session.get(MediaUpload, media_id)
+
+
+def test_uploaded_image_is_set_on_the_product(client, cloud, seller):
+    response = upload_image(client, seller[1])
+    assert response.status_code == 202
+    media_id = response.json['media_id']
+    status = client.get(f'/api/v1/media/{media_id}', headers=seller[1]).json
+    assert status['status'] == 'done'
+    assert requests.get(status['url']).content == b'image bytes'
+    assert len(cloud.uploads) == 1
+
+    product_id = client.post(f'{M}/products', headers=seller[1],
+                             json={'name': 'Maize', 'price': 10, 'quantity': 1, 'media_id': media_id}).json['id']
+    assert client.get(f'{M}/products/{product_id}').json['image_url'] == status['url']
+    # An upload fills in one product only
+    response = client.post(f'{M}/products', headers=seller[1],
+                           json={'name': 'Beans', 'price': 10, 'quantity': 1, 'media_id': media_id})
+    assert response.status_code == 400
+
+
+def test_uploads_are_private_to_their_owner(client, cloud, seller, buyer):
+    media_id = upload_image(client, seller[1]).json['media_id']
+    assert client.get(f'/api/v1/media/{media_id}', headers=buyer[1]).status_code == 403
+    response = client.post(f'{M}/products', headers=buyer[1],
+                           json={'name': 'Maize', 'price': 10, 'quantity': 1, 'media_id': media_id})
+    assert response.status_code == 400
+
+
+def test_post_image_is_uploaded(client, cloud, seller):
+    response = client.post('/api/v1/posts', headers=seller[1], content_type='multipart/form-data', data={
+        'title': 'Harvest', 'content': 'Good season', 'image': (io.BytesIO(b'post image'), 'harvest.png')
+    })
+    assert response.status_code == 201
+    url = media(response.json['media']['id']).url
+    assert url.startswith(cloud.url)
+    assert db.session.get(Post, response.json['post']['id']).image_url == url
+
+
+def test_failed_upload_is_retried_then_given_up(client, cloud, seller):
+    cloud.fail_next = 1
+    media_id = upload_image(client, seller[1]).json['media_id']
+    assert media(media_id).status == 'queued'
+    # What the poller does once the lease has passed
+    media_uploads.upload(media_id)
+    assert media(media_id).status == 'done'
+
+    cloud.fail_next = 2
+    media_id = upload_image(client, seller[1]).json['media_id']
+    spool_path = media(media_id).spool_path
+    media_uploads.upload(media_id)
+    assert (media(media_id).status, media(media_id).attempts) == ('failed', 2)
+    assert not os.path.exists(spool_path)
+
+
+def test_hung_upload_times_out(app, client, cloud, seller):
+    app.config['CLOUDINARY_TIMEOUT'] = 0.5
+    cloud.upload_delay = 3
+    media_id = upload_image(client, seller[1]).json['media_id']
+    assert (media(media_id).status, media(media_id).attempts) == ('queued', 1)
+    assert 'Cloudinary upload failed' in media(media_id).error
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.extensions import db
+from app.models.marketplace import Order
+from app.services import inventory, order_states
+
+
+def statuses(order_ids):
+    db.session.commit()
+    return [db.session.get(Order, order_id).status for order_id in order_ids]
+
+
+def test_transition_follows_the_state_machine(app, product, order):
+    product_id = product()
+    paid, pending = order(product_id), order(product_id)
+    inventory.confirm(paid)
+
+    moved = order_states.transition('shipped', Order.id.in_([paid, pending]), reason='Shipped', actor_id=7)
+    assert [row.id for row in moved] == [paid]
+    assert statuses([paid, pending]) == ['shipped', 'pending']
+    assert [(e.from_status, e.to_status, e.reason) for e in order_states.history(paid)] == [
+        (None, 'pending', 'Order placed'), ('pending', 'paid', 'Payment received'), ('paid', 'shipped', 'Shipped')
+    ]
+    assert order_states.history(paid)[-1].actor_id == 7
+    assert len(order_states.history(pending)) == 1
+
+
+def test_transition_rejects_unknown_statuses(app):
+    with pytest.raises(order_states.InvalidTransition):
+        order_states.transition('refunded', Order.id == 1)
+
+
+def test_transition_honours_from_statuses(app, product, order):
+    order_id = order(product())
+    assert order_states.transition('paid', Order.id == order_id, from_statuses=('expired',)) == []
+    assert statuses([order_id]) == ['pending']
+
+
+def test_concurrent_transitions_move_an_order_once(app, product, order):
+    order_id = order(product())
+
+    def move(target):
+        with app.app_context():
+            moved = order_states.transition(target, Order.id == order_id, reason=f'To {target}')
+            db.session.commit()
+            return len(moved)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        assert sum(pool.map(move, ['paid', 'cancelled', 'expired'])) == 1
+    # One event for placing the order and one for the single move
+    assert len(order_states.history(order_id)) == 2
+
+
+def test_seller_batch_skips_other_sellers_and_invalid_moves(client, product, order, seller, make_user):
+    product_id = product()
+    paid, pending = order(product_id), order(product_id)
+    inventory.confirm(paid)
+    db.session.commit()
+    _, other_seller = make_user()
+
+    response = client.put('/api/marketplace/seller/orders/status', headers=other_seller,
+                          json={'order_ids': [paid], 'status': 'shipped'})
+    assert response.json['updated'] == []
+
+    response = client.put('/api/marketplace/seller/orders/status', headers=seller[1],
+                          json={'order_ids': [paid, pending], 'status': 'shipped'})
+    assert (response.json['updated'], response.json['skipped']) == ([paid], [pending])
+    assert statuses([paid, pending]) == ['shipped', 'pending']
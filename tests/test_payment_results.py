@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select, update
+from app.extensions import db
+from app.models.marketplace import Product, Order, OrderEvent, Payment, PaymentCallback
+from app.services import payments
+
+
+@pytest.fixture
+def pushed(client, daraja, product, order, buyer):
+    """Factory: place and pay for an order; returns (product id, order id, payment id, Daraja push)"""
+    def pushed(phone='254711000001'):
+        product_id = product(quantity=3)
+        order_id = order(product_id, phone=phone)
+        response = client.post('/api/marketplace/payments/initiate', json={'order_id': order_id}, headers=buyer[1])
+        return product_id, order_id, response.json['payment_id'], daraja.pushes[-1]
+    return pushed
+
+
+def callback(client, daraja, push):
+    return client.post('/api/marketplace/payments/callback', json=daraja.callback_body(push))
+
+
+def state(product_id, order_id, payment_id):
+    db.session.commit()
+    return (
+        db.session.scalar(select(Product.quantity).where(Product.id == product_id)),
+        db.session.scalar(select(Order.status).where(Order.id == order_id)),
+        db.session.scalar(select(Payment.status).where(Payment.id == payment_id)),
+    )
+
+
+def backdate(payment_id, seconds):
+    db.session.execute(
+        update(Payment).where(Payment.id == payment_id)
+        .values(updated_at=datetime.utcnow() - timedelta(seconds=seconds))
+    )
+    db.session.commit()
+
+
+def test_duplicate_callbacks_are_applied_once(client, daraja, pushed):
+    product_id, order_id, payment_id, push = pushed()
+    assert callback(client, daraja, push).json['message'] == 'Callback processed'
+    assert callback(client, daraja, push).json['message'] == 'Callback already processed'
+
+    assert state(product_id, order_id, payment_id) == (2, 'paid', 'completed')
+    assert db.session.get(Payment, payment_id).mpesa_receipt_number.startswith('FAKE')
+    assert OrderEvent.query.filter_by(order_id=order_id, to_status='paid').count() == 1
+
+
+def test_concurrent_callbacks_are_applied_once(app, daraja, pushed):
+    product_id, order_id, payment_id, push = pushed()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(lambda _: callback(app.test_client(), daraja, push), range(4)))
+    assert {response.status_code for response in responses} == {200}
+    assert [response.json['message'] for response in responses].count('Callback processed') == 1
+    assert PaymentCallback.query.count() == 1
+    assert state(product_id, order_id, payment_id) == (2, 'paid', 'completed')
+
+
+def test_declined_payment_releases_the_stock(client, daraja, pushed):
+    product_id, order_id, payment_id, push = pushed(phone='254711000010')
+    assert callback(client, daraja, push).status_code == 200
+    assert state(product_id, order_id, payment_id) == (3, 'cancelled', 'failed')
+
+
+def test_settle_applies_only_the_first_result(client, daraja, pushed):
+    product_id, order_id, payment_id, _ = pushed()
+    assert payments.settle(payment_id, 0, receipt='ABC123')
+    assert not payments.settle(payment_id, 1032, description='Request cancelled by user')
+    assert not payments.settle(payment_id, 0, receipt='ABC123')
+    assert state(product_id, order_id, payment_id) == (2, 'paid', 'completed')
+
+
+def test_reconcile_settles_overdue_payments_from_stk_query(app, daraja, pushed):
+    product_id, order_id, payment_id, _ = pushed()
+    backdate(payment_id, app.config['MPESA_RECONCILE_AFTER_SECONDS'] + 1)
+
+    stats = payments.reconcile_pending()
+    assert (stats['checked'], stats['settled']) == (1, 1)
+    assert state(product_id, order_id, payment_id) == (2, 'paid', 'completed')
+
+
+def test_stuck_sending_payment_is_failed_after_the_lease(app, daraja, pushed):
+    lease = app.config['MPESA_QUEUE_LEASE_SECONDS']
+    product_id, order_id, payment_id, _ = pushed()
+    # The worker claimed the payment and died before recording the push outcome
+    db.session.execute(update(Payment).where(Payment.id == payment_id).values(status='sending'))
+    backdate(payment_id, lease - 5)
+
+    assert payments.reconcile_pending()['settled'] == 0
+    assert state(product_id, order_id, payment_id) == (2, 'pending', 'sending')
+
+    backdate(payment_id, lease + 1)
+    assert payments.reconcile_pending()['settled'] == 1
+    assert state(product_id, order_id, payment_id) == (3, 'cancelled', 'failed')
+    assert db.session.get(Payment, payment_id).failure_reason == 'STK push outcome unknown'
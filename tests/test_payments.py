@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+from app.extensions import db
+from app.models.marketplace import Payment
+
+
+def initiate(client, order_id, headers):
+    return client.post('/api/marketplace/payments/initiate', json={'order_id': order_id}, headers=headers)
+
+
+def test_initiate_sends_one_stk_push(client, daraja, product, order, buyer):
+    order_id = order(product(price=250), quantity=2)
+    response = initiate(client, order_id, buyer[1])
+    assert response.status_code == 202
+
+    payment = client.get(f"/api/marketplace/payments/{response.json['payment_id']}", headers=buyer[1]).json
+    [push] = daraja.pushes
+    assert payment['status'] == 'pending'
+    assert payment['checkout_request_id'] == push['CheckoutRequestID']
+    assert push['request']['Amount'] == 500
+    assert push['request']['PhoneNumber'] == '254711000001'
+
+
+def test_initiate_again_returns_the_payment_in_progress(client, daraja, product, order, buyer):
+    order_id = order(product())
+    first = initiate(client, order_id, buyer[1]).json
+    second = initiate(client, order_id, buyer[1])
+    assert second.status_code == 202
+    assert second.json['payment_id'] == first['payment_id']
+    assert len(daraja.pushes) == 1
+
+
+def test_only_the_buyer_can_pay(client, daraja, product, order, seller):
+    order_id = order(product())
+    assert initiate(client, order_id, seller[1]).status_code == 403
+    assert daraja.pushes == []
+
+
+def test_concurrent_initiates_create_one_payment(app, daraja, product, order, buyer):
+    order_id = order(product())
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(lambda _: initiate(app.test_client(), order_id, buyer[1]), range(4)))
+    assert {response.status_code for response in responses} == {202}
+    assert len({response.json['payment_id'] for response in responses}) == 1
+    assert Payment.query.filter_by(order_id=order_id).count() == 1
+    assert len(daraja.pushes) == 1
+
+
+def test_token_is_cached_and_refreshed_when_revoked(client, daraja, product, order, buyer):
+    product_id = product()
+    for _ in range(2):
+        initiate(client, order(product_id), buyer[1])
+    assert daraja.token_requests == 1
+
+    daraja.tokens.clear()
+    payment_id = initiate(client, order(product_id), buyer[1]).json['payment_id']
+    assert db.session.get(Payment, payment_id).status == 'pending'
+    assert daraja.token_requests == 2
@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from app.services.scheduler import Scheduler
+
+
+def worker(app, name):
+    """A scheduler as one gunicorn worker would have it"""
+    scheduler = Scheduler()
+    scheduler.app = app
+    scheduler.identity = name
+    scheduler.job('sweep', 'ORDER_RESERVATION_SWEEP_SECONDS')(lambda: None)
+    return scheduler
+
+
+def test_each_run_is_claimed_by_one_process(app):
+    interval = app.config['ORDER_RESERVATION_SWEEP_SECONDS']
+    first, second = worker(app, 'web-1'), worker(app, 'web-2')
+    now = datetime.utcnow()
+
+    assert first.claim('sweep', now=now) is None
+    assert second.claim('sweep', now=now + timedelta(seconds=1)) == now + timedelta(seconds=interval)
+    assert first.claim('sweep', now=now + timedelta(seconds=1)) is not None
+    # Due again one interval later, for whichever process asks first
+    assert second.claim('sweep', now=now + timedelta(seconds=interval)) is None
+
+
+def test_concurrent_claims_run_a_job_once(app):
+    schedulers = [worker(app, f'web-{i}') for i in range(4)]
+
+    def claim(scheduler):
+        with app.app_context():
+            return scheduler.claim('sweep')
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(claim, schedulers))
+    assert results.count(None) == 1